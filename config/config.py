@@ -44,12 +44,32 @@ class Config:
     MAX_RETRIES = int(os.getenv("MAX_RETRIES", "3"))
     SHOW_TYPING_DELAY = float(os.getenv("SHOW_TYPING_DELAY", "1.0"))
     MAX_MESSAGE_LENGTH = int(os.getenv("MAX_MESSAGE_LENGTH", "4000"))
+    CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", "32"))  # 同时处理的聊天数（同一聊天的更新按顺序处理）
+    STATS_FLUSH_INTERVAL_MS = int(os.getenv("STATS_FLUSH_INTERVAL_MS", "1000"))  # 统计写缓冲刷新间隔（毫秒）
+    STATS_BUFFER_MAX_KEYS = int(os.getenv("STATS_BUFFER_MAX_KEYS", "5000"))  # 缓冲键数超过该值时立即刷新
+
+    # =============================================================================
+    # 优雅关闭
+    # =============================================================================
+    SHUTDOWN_DRAIN_TIMEOUT = float(os.getenv("SHUTDOWN_DRAIN_TIMEOUT", "15"))  # 等待在途请求（秒）
+    SHUTDOWN_FLUSH_TIMEOUT = float(os.getenv("SHUTDOWN_FLUSH_TIMEOUT", "5"))  # 每个存储刷新/关闭（秒）
 
     # =============================================================================
     # 速率限制
     # =============================================================================
     RATE_LIMIT_MESSAGES = int(os.getenv("RATE_LIMIT_MESSAGES", "20"))
     RATE_LIMIT_WINDOW = int(os.getenv("RATE_LIMIT_WINDOW", "60"))
+    RATE_LIMIT_TOKENS_PER_UNIT = int(os.getenv("RATE_LIMIT_TOKENS_PER_UNIT", "1000"))  # AI 请求的提示词每多少 token 计 1 次额度（短消息计 1 次）
+    RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()  # memory | redis（多副本部署时使用 redis）
+
+    # =============================================================================
+    # Redis 配置
+    # =============================================================================
+    REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+    REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "20"))
+    REDIS_PROBE_INTERVAL = float(os.getenv("REDIS_PROBE_INTERVAL", "5"))  # 健康探测/重连间隔（秒）
+    STATS_OFFLINE_MAX_KEYS = int(os.getenv("STATS_OFFLINE_MAX_KEYS", "50000"))  # 断线期间最多缓冲的键数
+    RETENTION_BITMAP_DAYS = int(os.getenv("RETENTION_BITMAP_DAYS", "90"))  # 每日活跃位图保留天数
 
     # =============================================================================
     # 管理员配置
@@ -58,12 +78,52 @@ class Config:
         int(x.strip()) for x in os.getenv("ADMIN_IDS", "").split(",")
         if x.strip().isdigit()
     ]
+    ADMIN_SNAPSHOT_INTERVAL = float(os.getenv("ADMIN_SNAPSHOT_INTERVAL", "5"))  # 管理面板快照刷新间隔（秒）
+    ADMIN_SNAPSHOT_IDLE = float(os.getenv("ADMIN_SNAPSHOT_IDLE", "300"))  # 无人查看超过该时长后暂停刷新（秒）
+
+    # =============================================================================
+    # 监控配置
+    # =============================================================================
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    METRICS_HOST = os.getenv("METRICS_HOST", "0.0.0.0")
+    METRICS_PORT = int(os.getenv("METRICS_PORT", "8000"))  # Prometheus 抓取 /metrics 的端口
+    SYSTEM_SAMPLER_ENABLED = os.getenv("SYSTEM_SAMPLER_ENABLED", "true").lower() == "true"  # 后台定时采样系统资源（关闭时查看面板才采样）
+    SYSTEM_SAMPLE_INTERVAL = float(os.getenv("SYSTEM_SAMPLE_INTERVAL", "5"))  # 系统资源采样间隔（秒）
+    SYSTEM_SAMPLE_HISTORY = int(os.getenv("SYSTEM_SAMPLE_HISTORY", "720"))  # 保留的采样数（默认 1 小时）
+    LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "true").lower() == "true"  # 监控事件循环调度延迟和阻塞回调
+    LOOP_MONITOR_TICK = float(os.getenv("LOOP_MONITOR_TICK", "0.1"))  # 事件循环延迟探测间隔（秒）
+    SLOW_CALLBACK_THRESHOLD = float(os.getenv("SLOW_CALLBACK_THRESHOLD", "0.1"))  # 回调阻塞超过该时长时记录调用栈（秒）
+    PROFILE_DEFAULT_SECONDS = float(os.getenv("PROFILE_DEFAULT_SECONDS", "10"))  # /profile 默认剖析时长（秒）
+    PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))  # 单次剖析的最长时长（秒）
+    PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "10"))  # 剖析采样间隔（毫秒）
+    MEMORY_DIAGNOSTICS_ENABLED = os.getenv("MEMORY_DIAGNOSTICS_ENABLED", "true").lower() == "true"  # 定时统计进程内结构大小（关闭时查看面板才统计，结果最多沿用一个统计间隔）
+    MEMORY_REPORT_INTERVAL = float(os.getenv("MEMORY_REPORT_INTERVAL", "300"))  # 内存结构大小统计间隔（秒）
+    TRACEMALLOC_FRAMES = int(os.getenv("TRACEMALLOC_FRAMES", "10"))  # tracemalloc 每次分配保留的调用栈层数
+    TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))  # 消息处理链路追踪的采样率（0 关闭）
+    TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "200"))  # 管理面板保留的最近追踪数
+    TRACE_EXPORT_FILE = os.getenv("TRACE_EXPORT_FILE", "")  # OTLP JSON 导出文件（为空时不导出），如 data/traces.jsonl
+    ANOMALY_ALERTS_ENABLED = os.getenv("ANOMALY_ALERTS_ENABLED", "true").lower() == "true"  # 性能异常时主动通知管理员
+    ANOMALY_CHECK_INTERVAL = float(os.getenv("ANOMALY_CHECK_INTERVAL", "60"))  # 异常检测间隔（秒）
+    ANOMALY_Z_THRESHOLD = float(os.getenv("ANOMALY_Z_THRESHOLD", "4"))  # 偏离基线多少个标准差算异常
+    ANOMALY_EWMA_ALPHA = float(os.getenv("ANOMALY_EWMA_ALPHA", "0.05"))  # 基线 EWMA 权重
+    ANOMALY_WARMUP = int(os.getenv("ANOMALY_WARMUP", "30"))  # 基线至少积累多少个周期才开始检测
+    ANOMALY_TRIGGER_COUNT = int(os.getenv("ANOMALY_TRIGGER_COUNT", "3"))  # 连续多少个周期异常才告警（恢复同理）
+    ANOMALY_MIN_SAMPLES = int(os.getenv("ANOMALY_MIN_SAMPLES", "20"))  # 每周期样本数低于该值时不检测延迟和比例
+    ANOMALY_REMINDER_INTERVAL = float(os.getenv("ANOMALY_REMINDER_INTERVAL", "3600"))  # 异常持续时重复提醒的间隔（秒）
+    ANOMALY_MAX_ALERTS_PER_HOUR = int(os.getenv("ANOMALY_MAX_ALERTS_PER_HOUR", "6"))  # 每小时最多发送的告警通知数
 
     # =============================================================================
     # 日志配置
     # =============================================================================
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
     LOG_FILE = os.getenv("LOG_FILE", "data/logs/bot.log")
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()  # 日志文件格式：text 或 json（每行一个 JSON 对象）
+    LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(50 * 1024 * 1024)))  # 日志文件超过该大小时轮转
+    LOG_ROTATE_INTERVAL = float(os.getenv("LOG_ROTATE_INTERVAL", "86400"))  # 按时间轮转的间隔（秒，0 关闭）
+    LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "10"))  # 保留的旧日志文件数
+    LOG_COMPRESS = os.getenv("LOG_COMPRESS", "true").lower() == "true"  # 旧日志文件用 gzip 压缩
+    LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))  # 日志队列长度，写入跟不上时丢弃新日志
+    LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")  # 按 logger 采样 INFO 及以下日志，如 httpx=0.01,user_action=0.1
 
     @classmethod
     def validate(cls):
@@ -4,15 +4,33 @@ Telegram AI 机器人核心类 - 增强版
 
 import logging
 import asyncio
+from functools import cached_property
+from typing import TYPE_CHECKING
+from telegram.constants import ParseMode
 from telegram.ext import Application
 from config.config import Config
 from .handlers.commands import CommandHandlers
 from .handlers.messages import MessageHandlers
 from .handlers.callbacks import CallbackHandlers
 from .handlers.media import MediaHandlers
-from services.user_service import UserService
-from services.system_monitor import SystemMonitor
-from services.realtime_stats import RealTimeStatsManager
+from .shutdown import ShutdownCoordinator
+from .update_processor import ChatOrderedUpdateProcessor
+from utils.filters import AddressedToBotFilter
+from utils.decorators import dump_rate_limits, load_rate_limits, sweep_rate_limiters, close_rate_limiters, rate_limiters
+from utils.startup import startup_timer
+from utils.tracing import Tracer
+
+# 服务模块在对应属性首次访问时才导入，未启用的监控组件不产生导入开销
+if TYPE_CHECKING:
+    from services.user_service import UserService
+    from services.system_monitor import SystemMonitor
+    from services.realtime_stats import RealTimeStatsManager
+    from services.admin_snapshots import AdminSnapshotService
+    from services.metrics_exporter import MetricsExporter
+    from services.loop_monitor import LoopMonitor
+    from services.profiler import SamplingProfiler
+    from services.memory_diagnostics import MemoryDiagnostics
+    from services.anomaly_detector import AnomalyDetector
 
 logger = logging.getLogger(__name__)
 
@@ -24,42 +42,219 @@ class TelegramAIBot:
         self.application = None
         self.bot_info = None
 
-        # 初始化监控和统计服务
-        self.system_monitor = SystemMonitor()
-        self.stats_manager = RealTimeStatsManager()
+        # 群组消息预过滤器（获取 bot_info 后激活）
+        self.group_filter = AddressedToBotFilter()
 
-        # 初始化其他服务
-        self.user_service = UserService()
+        # 优雅关闭协调器
+        self.shutdown = ShutdownCoordinator(
+            drain_timeout=self.config.SHUTDOWN_DRAIN_TIMEOUT,
+            flush_timeout=self.config.SHUTDOWN_FLUSH_TIMEOUT
+        )
+        self._background_task = None
+
+        # 服务在首次访问时才创建（见下方属性），核心服务在连接成功后预热
 
         # 初始化处理器
-        self.command_handlers = CommandHandlers(self)
-        self.message_handlers = MessageHandlers(self)
-        self.callback_handlers = CallbackHandlers(self)
-        self.media_handlers = MediaHandlers(self)
+        with startup_timer.phase("创建处理器"):
+            self.command_handlers = CommandHandlers(self)
+            self.message_handlers = MessageHandlers(self)
+            self.callback_handlers = CallbackHandlers(self)
+            self.media_handlers = MediaHandlers(self)
 
         logger.info("🤖 Telegram AI 机器人实例已创建")
 
+    @cached_property
+    def system_monitor(self) -> "SystemMonitor":
+        """系统监控器（运行时间从进程启动算起）"""
+        from services.system_monitor import SystemMonitor
+        return SystemMonitor(Config.SYSTEM_SAMPLE_INTERVAL, Config.SYSTEM_SAMPLE_HISTORY,
+                             start_time=startup_timer.started_at)
+
+    @cached_property
+    def loop_monitor(self) -> "LoopMonitor":
+        """事件循环延迟监控器"""
+        from services.loop_monitor import LoopMonitor
+        return LoopMonitor(Config.LOOP_MONITOR_TICK, Config.SLOW_CALLBACK_THRESHOLD)
+
+    @cached_property
+    def profiler(self) -> "SamplingProfiler":
+        """按需采样剖析器"""
+        from services.profiler import SamplingProfiler
+        return SamplingProfiler(
+            interval=Config.PROFILE_INTERVAL_MS / 1000,
+            max_duration=Config.PROFILE_MAX_SECONDS
+        )
+
+    @cached_property
+    def memory_diagnostics(self) -> "MemoryDiagnostics":
+        """内存诊断服务（创建时注册要统计的数据结构）"""
+        from services.memory_diagnostics import MemoryDiagnostics
+        diagnostics = MemoryDiagnostics(Config.MEMORY_REPORT_INTERVAL, Config.TRACEMALLOC_FRAMES)
+        self._register_memory_structures(diagnostics)
+        return diagnostics
+
+    @cached_property
+    def anomaly_detector(self) -> "AnomalyDetector":
+        """性能异常检测器"""
+        from services.anomaly_detector import AnomalyDetector
+        return AnomalyDetector(
+            self.system_monitor,
+            self.notify_admins,
+            interval=Config.ANOMALY_CHECK_INTERVAL,
+            z_threshold=Config.ANOMALY_Z_THRESHOLD,
+            alpha=Config.ANOMALY_EWMA_ALPHA,
+            warmup=Config.ANOMALY_WARMUP,
+            trigger_count=Config.ANOMALY_TRIGGER_COUNT,
+            min_samples=Config.ANOMALY_MIN_SAMPLES,
+            reminder_interval=Config.ANOMALY_REMINDER_INTERVAL,
+            max_alerts_per_hour=Config.ANOMALY_MAX_ALERTS_PER_HOUR
+        )
+
+    @cached_property
+    def stats_manager(self) -> "RealTimeStatsManager":
+        """实时统计管理器"""
+        from services.realtime_stats import RealTimeStatsManager
+        return RealTimeStatsManager(
+            Config.REDIS_URL,
+            flush_interval=Config.STATS_FLUSH_INTERVAL_MS / 1000,
+            max_buffer_keys=Config.STATS_BUFFER_MAX_KEYS,
+            max_connections=Config.REDIS_MAX_CONNECTIONS,
+            probe_interval=Config.REDIS_PROBE_INTERVAL,
+            max_offline_keys=Config.STATS_OFFLINE_MAX_KEYS,
+            retention_days=Config.RETENTION_BITMAP_DAYS
+        )
+
+    @cached_property
+    def admin_snapshots(self) -> "AdminSnapshotService":
+        """管理面板快照服务"""
+        from services.admin_snapshots import AdminSnapshotService
+        return AdminSnapshotService(self)
+
+    @cached_property
+    def metrics_exporter(self) -> "MetricsExporter":
+        """Prometheus 指标导出器"""
+        from services.metrics_exporter import MetricsExporter
+        return MetricsExporter(self, Config.METRICS_HOST, Config.METRICS_PORT)
+
+    @cached_property
+    def tracer(self) -> Tracer:
+        """消息处理链路追踪器"""
+        exporter = None
+        if Config.TRACE_EXPORT_FILE:
+            from services.trace_exporter import OTLPFileExporter
+            exporter = OTLPFileExporter(Config.TRACE_EXPORT_FILE)
+        return Tracer(Config.TRACE_SAMPLE_RATE, Config.TRACE_BUFFER_SIZE, exporter)
+
+    @cached_property
+    def user_service(self) -> "UserService":
+        """用户管理服务"""
+        from services.user_service import UserService
+        return UserService()
+
     async def setup_bot_info(self, application):
         """设置机器人信息和初始化监控服务"""
         try:
-            self.bot_info = await application.bot.get_me()
+            with startup_timer.phase("获取机器人信息"):
+                self.bot_info = await application.bot.get_me()
             logger.info(f"🤖 机器人信息: @{self.bot_info.username} ({self.bot_info.first_name})")
+            self.group_filter.set_bot(self.bot_info)
+
+            # 加载用户数据和速率限制状态
+            with startup_timer.phase("加载用户数据"):
+                user_count = await self.user_service.get_all_users_count()
+                load_rate_limits()
+            logger.info(f"👥 已加载 {user_count} 个用户")
 
             # 初始化实时统计管理器
-            await self.stats_manager.initialize()
+            with startup_timer.phase("初始化实时统计"):
+                await self.stats_manager.initialize()
 
             # 显示配置摘要
             logger.info(self.config.get_summary())
 
             # 启动后台任务
-            asyncio.create_task(self._background_tasks())
+            with startup_timer.phase("启动后台任务"):
+                self._background_task = asyncio.create_task(self._background_tasks())
+                self.admin_snapshots.start()
+                if self.config.SYSTEM_SAMPLER_ENABLED:
+                    self.system_monitor.sampler.start()
+                if self.config.LOOP_MONITOR_ENABLED:
+                    self.loop_monitor.start()
+                if self.config.MEMORY_DIAGNOSTICS_ENABLED:
+                    self.memory_diagnostics.start()
+                if self.config.ANOMALY_ALERTS_ENABLED:
+                    self.anomaly_detector.start()
+                if self.tracer.exporter is not None:
+                    self.tracer.exporter.start()
+                if self.config.METRICS_ENABLED:
+                    await self.metrics_exporter.start()
+
+            self._register_shutdown_hooks()
 
             logger.info("✅ 机器人初始化完成，所有服务已启动")
+            startup_timer.report()
 
         except Exception as e:
             logger.error(f"❌ 机器人初始化失败: {e}")
             raise
 
+    def _register_memory_structures(self, memory: "MemoryDiagnostics"):
+        """注册内存诊断统计的进程内数据结构"""
+        users = self.user_service
+        stats = self.stats_manager
+
+        memory.register("users_data", lambda: users.users_data)
+        memory.register("conversation_history", lambda: users.conversation_history)
+        memory.register("stats_fallback", lambda: stats.fallback_stats)
+        memory.register("stats_buffer", lambda: stats.buffer)
+        memory.register("stats_presence", lambda: stats.presence)
+        memory.register("stats_hll", lambda: (stats.all_users_hll, stats.daily_hll, stats.hourly_hll))
+        memory.register("stats_timeseries", lambda: stats.timeseries.local)
+        memory.register("stats_leaderboards", lambda: stats.leaderboards)
+        memory.register("retention_bitmaps", lambda: stats.retention.local)
+        memory.register("retention_index", lambda: (stats.retention.local_index, stats.retention.redis_index))
+        memory.register("rate_limiters", lambda: [limiter.memory_structures() for limiter in rate_limiters().values()])
+        memory.register("latency_histograms", lambda: (self.system_monitor.latency, self.system_monitor.latency_totals))
+        memory.register("monitor_buckets", lambda: (self.system_monitor.minutes, self.system_monitor.hours))
+        memory.register("system_samples", lambda: self.system_monitor.sampler.samples)
+        memory.register("traces", lambda: self.tracer.traces)
+
+    def _register_shutdown_hooks(self):
+        """注册关闭时需要刷新的存储和需要释放的资源"""
+        # 文件写入是阻塞操作，放到线程中才能与其他存储并发刷新，超时也才能生效
+        users = self.user_service
+        self.shutdown.register_store("users", lambda: asyncio.to_thread(users.dump_users_data))
+        self.shutdown.register_store("history", lambda: asyncio.to_thread(users.dump_conversation_history))
+        self.shutdown.register_store("stats", self.stats_manager.flush)
+        self.shutdown.register_store("rate_limits", lambda: asyncio.to_thread(dump_rate_limits))
+
+        self.shutdown.register_closer("background", self._stop_background_tasks)
+        self.shutdown.register_closer("snapshots", self.admin_snapshots.stop)
+        if self.config.LOOP_MONITOR_ENABLED:
+            self.shutdown.register_closer("loop_monitor", self.loop_monitor.stop)
+        if self.config.MEMORY_DIAGNOSTICS_ENABLED:
+            self.shutdown.register_closer("memory", self.memory_diagnostics.stop)
+        if self.config.ANOMALY_ALERTS_ENABLED:
+            self.shutdown.register_closer("anomaly", self.anomaly_detector.stop)
+        if self.config.SYSTEM_SAMPLER_ENABLED:
+            self.shutdown.register_closer("sampler", lambda: asyncio.to_thread(self.system_monitor.sampler.stop))
+        if self.config.METRICS_ENABLED:
+            self.shutdown.register_closer("metrics", self.metrics_exporter.stop)
+        if self.tracer.exporter is not None:
+            self.shutdown.register_closer("tracing", self.tracer.exporter.stop)
+        self.shutdown.register_closer("redis", self.stats_manager.close)
+        self.shutdown.register_closer("rate_limiter", close_rate_limiters)
+        self.shutdown.register_closer("openai", self.message_handlers.openai_service.close_session)
+
+    async def _stop_background_tasks(self):
+        """停止后台任务"""
+        if self._background_task and not self._background_task.done():
+            self._background_task.cancel()
+            try:
+                await self._background_task
+            except asyncio.CancelledError:
+                pass
+
     async def _background_tasks(self):
         """后台任务"""
         while True:
@@ -67,6 +262,7 @@ class TelegramAIBot:
                 # 每小时清理一次过期数据
                 await asyncio.sleep(3600)  # 1小时
                 await self.stats_manager.cleanup_old_data()
+                sweep_rate_limiters()
                 logger.info("🧹 定期清理任务完成")
 
             except Exception as e:
@@ -92,25 +288,34 @@ class TelegramAIBot:
     async def start(self):
         """启动机器人"""
         try:
-            # 创建应用
-            self.application = (
-                Application.builder()
-                .token(self.config.TELEGRAM_TOKEN)
-                .build()
-            )
-
-            # 设置机器人信息回调
-            self.application.post_init = self.setup_bot_info
+            # 创建应用（不同聊天的更新并发处理、同一聊天按顺序处理，关闭时在途处理器可以被单独等待或取消）
+            with startup_timer.phase("创建应用"):
+                self.application = (
+                    Application.builder()
+                    .token(self.config.TELEGRAM_TOKEN)
+                    .concurrent_updates(ChatOrderedUpdateProcessor(self.config.CONCURRENT_UPDATES))
+                    .build()
+                )
 
             # 注册处理器
-            self.setup_handlers()
+            with startup_timer.phase("注册处理器"):
+                self.setup_handlers()
+
+            # 已在运行的事件循环中，手动管理应用生命周期
+            async with self.application:
+                await self.setup_bot_info(self.application)
+                await self.application.start()
+
+                # 启动轮询
+                logger.info("🚀 开始轮询...")
+                await self.application.updater.start_polling(
+                    drop_pending_updates=True,
+                    allowed_updates=["message", "callback_query", "inline_query"]
+                )
 
-            # 启动轮询
-            logger.info("🚀 开始轮询...")
-            await self.application.run_polling(
-                drop_pending_updates=True,
-                allowed_updates=["message", "callback_query", "inline_query"]
-            )
+                self.shutdown.install_signal_handlers()
+                await self.shutdown.wait_for_stop()
+                await self.shutdown.shutdown(self.application)
 
         except Exception as e:
             logger.error(f"❌ 启动机器人失败: {e}")
@@ -120,10 +325,9 @@ class TelegramAIBot:
             await self._cleanup()
 
     async def _cleanup(self):
-        """清理资源"""
+        """清理资源（异常退出时也执行关闭流程）"""
         try:
-            if self.stats_manager.redis:
-                await self.stats_manager.redis.close()
+            await self.shutdown.shutdown(self.application)
             logger.info("🧹 资源清理完成")
         except Exception as e:
             logger.error(f"清理资源时出错: {e}")
@@ -132,30 +336,17 @@ class TelegramAIBot:
         """检查用户是否为管理员"""
         return user_id in self.config.ADMIN_IDS
 
+    async def notify_admins(self, text: str):
+        """向所有管理员发送通知（单个管理员发送失败不影响其他人）"""
+        for admin_id in self.config.ADMIN_IDS:
+            try:
+                await self.application.bot.send_message(admin_id, text, parse_mode=ParseMode.MARKDOWN)
+            except Exception as e:
+                logger.error(f"发送管理员通知失败 ({admin_id}): {e}")
+
     def should_respond_in_group(self, update) -> bool:
         """判断在群组中是否应该响应"""
-        if not self.bot_info:
-            return False
-
-        message = update.message
-        if not message or not message.text:
-            return False
-
-        # 检查@机器人
-        if message.entities:
-            for entity in message.entities:
-                if entity.type == "mention":
-                    mention_text = message.text[entity.offset:entity.offset + entity.length]
-                    if mention_text.lower() == f"@{self.bot_info.username.lower()}":
-                        return True
-
-        # 检查是否回复了机器人
-        if (message.reply_to_message and
-            message.reply_to_message.from_user and
-            message.reply_to_message.from_user.id == self.bot_info.id):
-            return True
-
-        return False
+        return self.group_filter.is_addressed(update.message)
 
     async def get_system_status_summary(self) -> str:
         """获取系统状态摘要"""
@@ -169,7 +360,7 @@ class TelegramAIBot:
 {system_stats.get('status_emoji', '🔍')} **服务状态:** {system_stats.get('status', '未知')}
 💬 **今日消息:** {realtime_stats.get('today_messages', 0)}
 👥 **在线用户:** {realtime_stats.get('online_users', 0)}
-⚡ **响应时间:** {system_stats.get('avg_response_time', 0):.2f}秒
+⚡ **响应时间:** {system_stats.get('avg_response_time', 0):.2f}秒 (P99 {system_stats.get('p99_response_time', 0):.2f}秒)
 🔧 **运行时间:** {system_stats.get('uptime', '未知')}
             """.strip()
 
@@ -3,59 +3,110 @@
 """
 
 import logging
+from collections import OrderedDict
+from typing import NamedTuple, Optional
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
 from telegram.ext import CallbackQueryHandler, ContextTypes
 from telegram.constants import ParseMode
+from utils.callback_router import CallbackRouter
+from utils.decorators import track_inflight, monitor_performance
 
 logger = logging.getLogger(__name__)
 
 
+class Menu(NamedTuple):
+    """预构建的菜单（文本 + 键盘）"""
+    text: str
+    reply_markup: InlineKeyboardMarkup
+    parse_mode: Optional[str] = ParseMode.MARKDOWN
+
+
 class CallbackHandlers:
     """回调处理器类"""
 
+    # 记录已渲染内容指纹的消息数量上限
+    RENDER_CACHE_SIZE = 1024
+
     def __init__(self, bot):
         self.bot = bot
         self.config = bot.config
 
-    def register_handlers(self, application):
-        """注册回调处理器"""
-        application.add_handler(CallbackQueryHandler(self.handle_callback))
-        logger.info("✅ 回调处理器已注册")
-
-    async def handle_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """处理所有回调查询"""
-        query = update.callback_query
-        await query.answer()
-
-        data = query.data
-        user_id = query.from_user.id
+        # 静态菜单和键盘在启动时一次性构建，点击时直接复用
+        self.menus = self._build_static_menus()
+        self.help_pages = self._build_help_pages()
+        self.settings_markup = InlineKeyboardMarkup([
+            [InlineKeyboardButton("🌍 语言设置", callback_data="setting_language")],
+            [InlineKeyboardButton("🤖 聊天模式", callback_data="setting_mode")],
+            [InlineKeyboardButton("🔔 通知设置", callback_data="setting_notifications")],
+            [InlineKeyboardButton("📊 数据管理", callback_data="setting_data")],
+            [InlineKeyboardButton("« 返回", callback_data="back_to_main")]
+        ])
+        self.admin_status_markup = InlineKeyboardMarkup([
+            [InlineKeyboardButton("🔄 刷新", callback_data="admin_status")],
+            [InlineKeyboardButton("📈 性能趋势", callback_data="admin_performance")],
+            [InlineKeyboardButton("🔍 链路追踪", callback_data="admin_traces")],
+            [InlineKeyboardButton("🧠 内存诊断", callback_data="admin_memory")],
+            [InlineKeyboardButton("« 返回管理", callback_data="admin")]
+        ])
+        self.admin_memory_markup = InlineKeyboardMarkup([
+            [
+                InlineKeyboardButton("📸 拍摄快照", callback_data="admin_memory_snapshot"),
+                InlineKeyboardButton("🔬 对比快照", callback_data="admin_memory_diff")
+            ],
+            [InlineKeyboardButton("🛑 停止追踪", callback_data="admin_memory_stop")],
+            [InlineKeyboardButton("🔄 刷新", callback_data="admin_memory")],
+            [InlineKeyboardButton("« 返回状态", callback_data="admin_status")]
+        ])
+        self.admin_traces_markup = InlineKeyboardMarkup([
+            [InlineKeyboardButton("🔄 刷新", callback_data="admin_traces")],
+            [InlineKeyboardButton("« 返回状态", callback_data="admin_status")]
+        ])
+        self.admin_users_markup = InlineKeyboardMarkup([
+            [InlineKeyboardButton("🔄 刷新", callback_data="admin_users")],
+            [InlineKeyboardButton("📊 详细报告", callback_data="admin_detailed_stats")],
+            [InlineKeyboardButton("« 返回管理", callback_data="admin")]
+        ])
+
+        # 路由表
+        self.router = CallbackRouter()
+        self.router.exact("start_chat", self.handle_start_chat)
+        self.router.exact("settings", self.handle_settings)
+        self.router.exact("features", self.handle_features)
+        self.router.exact("help", self.handle_help_menu)
+        self.router.prefix("help", self.handle_help_category)
+        self.router.prefix("setting", self.handle_setting_option)
+        self.router.prefix("admin", self.handle_admin_action)
+
+        self.setting_routes = {
+            "language": self.handle_language_setting,
+        }
+        self.admin_routes = {
+            "status": self.show_system_status,
+            "users": self.show_user_statistics,
+            "traces": self.show_traces,
+            "profile": self.start_profile,
+            "memory": self.show_memory,
+            "memory_snapshot": self.take_memory_snapshot,
+            "memory_diff": self.show_memory_diff,
+            "memory_stop": self.stop_memory_tracing,
+        }
+        self.admin_placeholders = {
+            "broadcast": "📢 广播功能开发中...",
+            "settings": "🔧 系统设置开发中...",
+        }
 
-        try:
-            # 根据回调数据路由到相应处理函数
-            if data == "start_chat":
-                await self.handle_start_chat(query)
-            elif data == "settings":
-                await self.handle_settings(query)
-            elif data == "features":
-                await self.handle_features(query)
-            elif data == "help":
-                await self.handle_help_menu(query)
-            elif data.startswith("help_"):
-                await self.handle_help_category(query, data.split("_", 1)[1])
-            elif data.startswith("setting_"):
-                await self.handle_setting_option(query, data.split("_", 1)[1])
-            elif data.startswith("admin_"):
-                await self.handle_admin_action(query, data.split("_", 1)[1])
-            else:
-                await query.edit_message_text("❓ 未知的操作")
+        # 每条消息最近一次渲染内容的指纹: (chat_id, message_id) -> fingerprint
+        self._rendered = OrderedDict()
 
-        except Exception as e:
-            logger.error(f"处理回调出错: {e}")
-            await query.edit_message_text("❌ 处理请求时出现错误")
+    def _build_static_menus(self) -> dict:
+        """构建静态菜单"""
+        back_to_main = InlineKeyboardMarkup([
+            [InlineKeyboardButton("« 返回主菜单", callback_data="back_to_main")]
+        ])
 
-    async def handle_start_chat(self, query):
-        """处理开始聊天"""
-        text = """
+        return {
+            "start_chat": Menu("""
 🚀 **对话模式已启动！**
 
 现在你可以：
@@ -71,52 +122,8 @@ class CallbackHandlers:
 • `/help` - 查看帮助
 
 开始聊天吧！有什么想聊的？ 😊
-        """
-
-        keyboard = [[InlineKeyboardButton("« 返回主菜单", callback_data="back_to_main")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-
-        await query.edit_message_text(
-            text,
-            reply_markup=reply_markup,
-            parse_mode=ParseMode.MARKDOWN
-        )
-
-    async def handle_settings(self, query):
-        """处理设置菜单"""
-        user_id = query.from_user.id
-        user_data = await self.bot.user_service.get_user_data(user_id)
-
-        keyboard = [
-            [InlineKeyboardButton("🌍 语言设置", callback_data="setting_language")],
-            [InlineKeyboardButton("🤖 聊天模式", callback_data="setting_mode")],
-            [InlineKeyboardButton("🔔 通知设置", callback_data="setting_notifications")],
-            [InlineKeyboardButton("📊 数据管理", callback_data="setting_data")],
-            [InlineKeyboardButton("« 返回", callback_data="back_to_main")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-
-        settings_text = f"""
-⚙️ **个人设置**
-
-**当前配置:**
-• 🌍 语言: {user_data.get('language', 'zh').upper()}
-• 🤖 模式: {user_data.get('mode', 'chat').title()}
-• 🔔 通知: {'开启' if user_data.get('notifications', True) else '关闭'}
-• 📊 消息数: {user_data.get('total_messages', 0)}
-
-选择要修改的设置项：
-        """
-
-        await query.edit_message_text(
-            settings_text,
-            reply_markup=reply_markup,
-            parse_mode=ParseMode.MARKDOWN
-        )
-
-    async def handle_features(self, query):
-        """处理功能介绍"""
-        features_text = """
+        """, back_to_main),
+            "features": Menu("""
 🌟 **功能特色展示**
 
 **💬 智能对话**
@@ -147,33 +154,8 @@ class CallbackHandlers:
 • 🛡️ 数据加密存储
 • 🔒 隐私信息保护
 • 🗑️ 数据清除选项
-        """
-
-        keyboard = [[InlineKeyboardButton("« 返回主菜单", callback_data="back_to_main")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-
-        await query.edit_message_text(
-            features_text,
-            reply_markup=reply_markup,
-            parse_mode=ParseMode.MARKDOWN
-        )
-
-    async def handle_help_menu(self, query):
-        """处理帮助菜单"""
-        keyboard = [
-            [
-                InlineKeyboardButton("💬 聊天功能", callback_data="help_chat"),
-                InlineKeyboardButton("🛠️ 工具功能", callback_data="help_tools")
-            ],
-            [
-                InlineKeyboardButton("⚙️ 设置帮助", callback_data="help_settings"),
-                InlineKeyboardButton("❓ 常见问题", callback_data="help_faq")
-            ],
-            [InlineKeyboardButton("« 返回主菜单", callback_data="back_to_main")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-
-        help_text = """
+        """, back_to_main),
+            "help": Menu("""
 📖 **帮助中心**
 
 选择你需要了解的功能分类：
@@ -182,16 +164,28 @@ class CallbackHandlers:
 • **🛠️ 工具功能** - 实用工具使用
 • **⚙️ 设置帮助** - 个性化配置
 • **❓ 常见问题** - 疑问解答
-        """
-
-        await query.edit_message_text(
-            help_text,
-            reply_markup=reply_markup,
-            parse_mode=ParseMode.MARKDOWN
-        )
+        """, InlineKeyboardMarkup([
+                [
+                    InlineKeyboardButton("💬 聊天功能", callback_data="help_chat"),
+                    InlineKeyboardButton("🛠️ 工具功能", callback_data="help_tools")
+                ],
+                [
+                    InlineKeyboardButton("⚙️ 设置帮助", callback_data="help_settings"),
+                    InlineKeyboardButton("❓ 常见问题", callback_data="help_faq")
+                ],
+                [InlineKeyboardButton("« 返回主菜单", callback_data="back_to_main")]
+            ])),
+            "language": Menu("🌍 **选择语言 / Choose Language**", InlineKeyboardMarkup([
+                [
+                    InlineKeyboardButton("🇨🇳 中文", callback_data="set_lang_zh"),
+                    InlineKeyboardButton("🇺🇸 English", callback_data="set_lang_en")
+                ],
+                [InlineKeyboardButton("« 返回设置", callback_data="settings")]
+            ]), parse_mode=None),
+        }
 
-    async def handle_help_category(self, query, category: str):
-        """处理帮助分类"""
+    def _build_help_pages(self) -> dict:
+        """构建帮助分类页面"""
         help_content = {
             "chat": """
 💬 **聊天功能帮助**
@@ -273,206 +267,183 @@ A: 所有数据本地存储，可随时删除个人信息。
             """
         }
 
-        content = help_content.get(category, "❓ 帮助内容未找到")
-
-        keyboard = [
+        keyboard = InlineKeyboardMarkup([
             [InlineKeyboardButton("« 返回帮助", callback_data="help")],
             [InlineKeyboardButton("🏠 主菜单", callback_data="back_to_main")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        ])
 
-        await query.edit_message_text(
-            content,
-            reply_markup=reply_markup,
-            parse_mode=ParseMode.MARKDOWN
-        )
+        pages = {category: Menu(content, keyboard) for category, content in help_content.items()}
+        pages[None] = Menu("❓ 帮助内容未找到", keyboard)
+        return pages
 
-    async def handle_setting_option(self, query, option: str):
-        """处理设置选项"""
-        if option == "language":
-            await self.handle_language_setting(query)
-        elif option == "mode":
-            await self.handle_mode_setting(query)
-        elif option == "notifications":
-            await self.handle_notification_setting(query)
-        elif option == "data":
-            await self.handle_data_setting(query)
+    def register_handlers(self, application):
+        """注册回调处理器"""
+        application.add_handler(CallbackQueryHandler(self.handle_callback))
+        logger.info("✅ 回调处理器已注册")
 
-    async def handle_language_setting(self, query):
-        """处理语言设置"""
-        keyboard = [
-            [
-                InlineKeyboardButton("🇨🇳 中文", callback_data="set_lang_zh"),
-                InlineKeyboardButton("🇺🇸 English", callback_data="set_lang_en")
-            ],
-            [InlineKeyboardButton("« 返回设置", callback_data="settings")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+    @track_inflight
+    @monitor_performance
+    async def handle_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """处理所有回调查询"""
+        query = update.callback_query
+        await query.answer()
 
-        await query.edit_message_text(
-            "🌍 **选择语言 / Choose Language**",
-            reply_markup=reply_markup
-        )
+        try:
+            # 根据回调数据路由到相应处理函数
+            handler, args = self.router.resolve(query.data or "")
+            if handler is None:
+                await self.edit_message(query, "❓ 未知的操作")
+                return
 
-    async def handle_admin_action(self, query, action: str):
-        """处理管理员操作"""
-        user_id = query.from_user.id
+            await handler(query, *args)
 
-        if not self.bot.is_admin(user_id):
-            await query.edit_message_text("❌ 权限不足")
-            return
+        except Exception as e:
+            logger.error(f"处理回调出错: {e}")
+            await self.edit_message(query, "❌ 处理请求时出现错误")
 
-        if action == "status":
-            await self.show_system_status(query)
-        elif action == "users":
-            await self.show_user_statistics(query)
-        elif action == "broadcast":
-            await query.edit_message_text("📢 广播功能开发中...")
-        elif action == "settings":
-            await query.edit_message_text("🔧 系统设置开发中...")
+    async def edit_message(self, query, text: str, reply_markup: Optional[InlineKeyboardMarkup] = None,
+                           parse_mode: Optional[str] = None, skip_unchanged: bool = False,
+                           content_key=None):
+        """编辑回调消息
 
-    async def show_system_status(self, query):
-        """显示真实的系统状态"""
-        if not self.bot.is_admin(query.from_user.id):
-            await query.edit_message_text("❌ 权限不足")
+        所有编辑都经过这里记录内容指纹；skip_unchanged=True 时，
+        内容与消息当前显示的一致就直接跳过，避免 "message is not modified" 往返。
+        content_key 可替代文本参与指纹计算（例如快照版本号）。
+        """
+        message = query.message
+        key = (message.chat_id, message.message_id) if message else None
+        content = content_key if content_key is not None else hash(text)
+        fingerprint = (content, id(reply_markup), parse_mode)
+
+        if skip_unchanged and key is not None and self._rendered.get(key) == fingerprint:
             return
 
         try:
-            # 获取真实系统状态
-            system_stats = self.bot.system_monitor.get_real_system_status()
-            realtime_stats = await self.bot.stats_manager.get_real_time_stats()
-            performance_metrics = await self.bot.stats_manager.get_performance_metrics()
-
-            # 生成状态文本
-            status_text = f"""
-    📊 **实时系统状态**
-
-    {system_stats.get('status_emoji', '🔍')} **系统状态:** {system_stats.get('status', '未知')}
-
-    💻 **系统资源:**
-    • CPU使用: {system_stats.get('cpu_percent', 0):.1f}%
-    • 内存使用: {system_stats.get('memory_percent', 0):.1f}% ({system_stats.get('memory_used_gb', 0):.1f}GB/{system_stats.get('memory_total_gb', 0):.1f}GB)
-    • 磁盘使用: {system_stats.get('disk_percent', 0):.1f}% (剩余 {system_stats.get('disk_free_gb', 0):.1f}GB)
-
-    📊 **实时统计:**
-    • 今日消息: {realtime_stats.get('today_messages', 0):,}
-    • 今日用户: {realtime_stats.get('today_active_users', 0):,}
-    • 当前小时: {realtime_stats.get('current_hour_messages', 0):,}
-    • 在线用户: {realtime_stats.get('online_users', 0):,}
-
-    ⚡ **性能指标:**
-    • 总请求数: {system_stats.get('total_requests', 0):,}
-    • API调用: {system_stats.get('api_calls', 0):,}
-    • 错误次数: {system_stats.get('error_count', 0):,}
-    • 错误率: {system_stats.get('error_rate', 0):.2f}%
-    • 平均响应: {system_stats.get('avg_response_time', 0):.2f}秒
-
-    🔧 **服务信息:**
-    • 运行时间: {system_stats.get('uptime', '未知')}
-    • 最后错误: {system_stats.get('last_error_time', '无')}
-    • 数据源: {realtime_stats.get('data_source', '未知')}
-
-    🕐 **更新时间:** {system_stats.get('current_time', '未知')}
-            """
+            await query.edit_message_text(text, reply_markup=reply_markup, parse_mode=parse_mode)
+        except BadRequest as e:
+            if "not modified" not in str(e).lower():
+                raise
 
-            # 如果有错误信息，添加到状态中
-            if 'error' in system_stats:
-                status_text += f"\n⚠️ **监控错误:** {system_stats['error']}"
-
-            keyboard = [
-                [InlineKeyboardButton("🔄 刷新", callback_data="admin_status")],
-                [InlineKeyboardButton("📈 性能趋势", callback_data="admin_performance")],
-                [InlineKeyboardButton("« 返回管理", callback_data="admin")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-
-            await query.edit_message_text(
-                status_text,
-                reply_markup=reply_markup,
-                parse_mode=ParseMode.MARKDOWN
-            )
+        if key is not None:
+            self._rendered[key] = fingerprint
+            self._rendered.move_to_end(key)
+            if len(self._rendered) > self.RENDER_CACHE_SIZE:
+                self._rendered.popitem(last=False)
 
-        except Exception as e:
-            logger.error(f"显示系统状态失败: {e}")
-            await query.edit_message_text(f"❌ 获取系统状态失败: {e}")
+    async def edit_menu(self, query, menu: Menu, skip_unchanged: bool = False):
+        """使用预构建菜单编辑消息"""
+        await self.edit_message(query, menu.text, menu.reply_markup, menu.parse_mode, skip_unchanged)
 
-    async def show_user_statistics(self, query):
-        """显示用户统计"""
-        if not self.bot.is_admin(query.from_user.id):
-            await query.edit_message_text("❌ 权限不足")
-            return
+    async def handle_start_chat(self, query):
+        """处理开始聊天"""
+        await self.edit_menu(query, self.menus["start_chat"])
 
-        try:
-            realtime_stats = await self.bot.stats_manager.get_real_time_stats()
-            user_stats = await self.bot.stats_manager.get_user_statistics()
+    async def handle_settings(self, query):
+        """处理设置菜单"""
+        user_id = query.from_user.id
+        user_data = await self.bot.user_service.get_user_data(user_id)
 
-            # 生成动作类型分布
-            action_types = realtime_stats.get('today_action_types', {})
-            action_text = "\n".join([
-                f"• {action}: {count}"
-                for action, count in sorted(action_types.items(), key=lambda x: int(x[1]), reverse=True)[:5]
-            ]) or "暂无数据"
+        settings_text = f"""
+⚙️ **个人设置**
 
-            stats_text = f"""
-    👥 **用户统计数据**
+**当前配置:**
+• 🌍 语言: {user_data.get('language', 'zh').upper()}
+• 🤖 模式: {user_data.get('mode', 'chat').title()}
+• 🔔 通知: {'开启' if user_data.get('notifications', True) else '关闭'}
+• 📊 消息数: {user_data.get('total_messages', 0)}
 
-    📊 **今日活跃:**
-    • 活跃用户: {realtime_stats.get('today_active_users', 0):,}
-    • 消息总数: {realtime_stats.get('today_messages', 0):,}
-    • 当前在线: {realtime_stats.get('online_users', 0):,}
+选择要修改的设置项：
+        """
 
-    💬 **聊天类型分布:**
-    {self._format_chat_types(realtime_stats.get('chat_types', {}))}
+        await self.edit_message(query, settings_text, self.settings_markup, ParseMode.MARKDOWN)
 
-    🎯 **热门功能 (今日):**
-    {action_text}
+    async def handle_features(self, query):
+        """处理功能介绍"""
+        await self.edit_menu(query, self.menus["features"])
 
-    📈 **总体数据:**
-    • 注册用户: {user_stats.get('total_registered_users', 0):,}
-    • 数据源: {realtime_stats.get('data_source', '未知')}
+    async def handle_help_menu(self, query):
+        """处理帮助菜单"""
+        await self.edit_menu(query, self.menus["help"])
 
-    🕐 **更新时间:** {realtime_stats.get('last_updated', '未知')}
-            """
+    async def handle_help_category(self, query, category: str):
+        """处理帮助分类"""
+        page = self.help_pages.get(category) or self.help_pages[None]
+        await self.edit_menu(query, page)
+
+    async def handle_setting_option(self, query, option: str):
+        """处理设置选项"""
+        handler = self.setting_routes.get(option)
+        if handler is None:
+            await self.edit_message(query, "🔧 该设置开发中...")
+            return
+
+        await handler(query)
+
+    async def handle_language_setting(self, query):
+        """处理语言设置"""
+        await self.edit_menu(query, self.menus["language"])
 
-            keyboard = [
-                [InlineKeyboardButton("🔄 刷新", callback_data="admin_users")],
-                [InlineKeyboardButton("📊 详细报告", callback_data="admin_detailed_stats")],
-                [InlineKeyboardButton("« 返回管理", callback_data="admin")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-
-            await query.edit_message_text(
-                stats_text,
-                reply_markup=reply_markup,
-                parse_mode=ParseMode.MARKDOWN
+    async def handle_admin_action(self, query, action: str):
+        """处理管理员操作"""
+        user_id = query.from_user.id
+
+        if not self.bot.is_admin(user_id):
+            await self.edit_message(query, "❌ 权限不足")
+            return
+
+        handler = self.admin_routes.get(action)
+        if handler is not None:
+            await handler(query)
+        else:
+            text = self.admin_placeholders.get(action, "🔧 功能开发中...")
+            await self.edit_message(query, text, skip_unchanged=True)
+
+    async def show_system_status(self, query):
+        """显示系统状态（来自后台快照）"""
+        await self.show_admin_snapshot(query, "status", self.admin_status_markup)
+
+    async def show_user_statistics(self, query):
+        """显示用户统计（来自后台快照）"""
+        await self.show_admin_snapshot(query, "users", self.admin_users_markup)
+
+    async def show_traces(self, query):
+        """显示最近的链路追踪（来自后台快照）"""
+        await self.show_admin_snapshot(query, "traces", self.admin_traces_markup)
+
+    async def start_profile(self, query):
+        """开始限时采样剖析，结果作为文件发送到当前聊天"""
+        await self.bot.command_handlers.send_profile(query.message, self.config.PROFILE_DEFAULT_SECONDS)
+
+    async def show_memory(self, query):
+        """显示内存诊断（来自后台快照）"""
+        await self.show_admin_snapshot(query, "memory", self.admin_memory_markup)
+
+    async def take_memory_snapshot(self, query):
+        """拍摄 tracemalloc 快照"""
+        await self.bot.memory_diagnostics.take_snapshot()
+        await self.bot.admin_snapshots.refresh("memory")
+        await self.show_memory(query)
+
+    async def show_memory_diff(self, query):
+        """对比最近两次 tracemalloc 快照"""
+        text = await self.bot.admin_snapshots.render_memory_diff()
+        await self.edit_message(query, text, self.admin_memory_markup, ParseMode.MARKDOWN)
+
+    async def stop_memory_tracing(self, query):
+        """关闭 tracemalloc"""
+        self.bot.memory_diagnostics.stop_tracing()
+        await self.bot.admin_snapshots.refresh("memory")
+        await self.show_memory(query)
+
+    async def show_admin_snapshot(self, query, panel: str, reply_markup: InlineKeyboardMarkup):
+        """显示管理面板快照，快照内容和显示的数据年龄都未变化时跳过编辑"""
+        try:
+            snapshot = await self.bot.admin_snapshots.get(panel)
+            await self.edit_message(
+                query, snapshot.render(), reply_markup, ParseMode.MARKDOWN,
+                skip_unchanged=True, content_key=(panel, *snapshot.content_key)
             )
 
         except Exception as e:
-            logger.error(f"显示用户统计失败: {e}")
-            await query.edit_message_text(f"❌ 获取用户统计失败: {e}")
-
-    def _format_chat_types(self, chat_types: dict) -> str:
-        """格式化聊天类型统计"""
-        if not chat_types:
-            return "暂无数据"
-
-        total = sum(int(count) for count in chat_types.values())
-        if total == 0:
-            return "暂无数据"
-
-        formatted = []
-        for chat_type, count in chat_types.items():
-            percentage = (int(count) / total) * 100
-            emoji = "💬" if chat_type == "private" else "👥"
-            formatted.append(f"{emoji} {chat_type}: {count} ({percentage:.1f}%)")
-
-        return "\n".join(formatted)
-
-        keyboard = [[InlineKeyboardButton("« 返回管理", callback_data="admin")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-
-        await query.edit_message_text(
-            status_text,
-            reply_markup=reply_markup,
-            parse_mode=ParseMode.MARKDOWN
-        )
\ No newline at end of file
+            logger.error(f"显示管理面板 {panel} 失败: {e}")
+            await self.edit_message(query, f"❌ 获取面板数据失败: {e}")
\ No newline at end of file
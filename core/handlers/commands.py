@@ -6,7 +6,7 @@ import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import CommandHandler, ContextTypes
 from telegram.constants import ParseMode
-from utils.decorators import rate_limit, log_user_action
+from utils.decorators import rate_limit, log_user_action, track_inflight, monitor_performance, admin_required
 
 logger = logging.getLogger(__name__)
 
@@ -25,10 +25,13 @@ class CommandHandlers:
         application.add_handler(CommandHandler("settings", self.settings_command))
         application.add_handler(CommandHandler("stats", self.stats_command))
         application.add_handler(CommandHandler("admin", self.admin_command))
+        application.add_handler(CommandHandler("profile", self.profile_command))
 
         logger.info("✅ 命令处理器已注册")
 
-    @rate_limit
+    @track_inflight
+    @rate_limit(cost=0.25)
+    @monitor_performance
     @log_user_action
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """处理 /start 命令"""
@@ -73,7 +76,9 @@ class CommandHandlers:
             parse_mode=ParseMode.MARKDOWN
         )
 
-    @rate_limit
+    @track_inflight
+    @rate_limit(cost=0.25)
+    @monitor_performance
     @log_user_action
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """处理 /help 命令"""
@@ -106,7 +111,9 @@ class CommandHandlers:
             parse_mode=ParseMode.MARKDOWN
         )
 
-    @rate_limit
+    @track_inflight
+    @rate_limit(cost=0.25)
+    @monitor_performance
     @log_user_action
     async def settings_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """处理 /settings 命令"""
@@ -139,7 +146,9 @@ class CommandHandlers:
             parse_mode=ParseMode.MARKDOWN
         )
 
-    @rate_limit
+    @track_inflight
+    @rate_limit(cost=0.25)
+    @monitor_performance
     @log_user_action
     async def stats_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """处理 /stats 命令"""
@@ -164,6 +173,8 @@ class CommandHandlers:
 
         await update.message.reply_text(stats_text, parse_mode=ParseMode.MARKDOWN)
 
+    @track_inflight
+    @monitor_performance
     @log_user_action
     async def admin_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """管理员命令"""
@@ -181,7 +192,8 @@ class CommandHandlers:
             [
                 InlineKeyboardButton("📢 发送广播", callback_data="admin_broadcast"),
                 InlineKeyboardButton("🔧 系统设置", callback_data="admin_settings")
-            ]
+            ],
+            [InlineKeyboardButton("🔥 性能剖析", callback_data="admin_profile")]
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
 
@@ -193,10 +205,50 @@ class CommandHandlers:
 • **用户统计** - 用户数据分析
 • **发送广播** - 群发消息
 • **系统设置** - 修改配置
-        """
+• **性能剖析** - 采样 {seconds:.0f} 秒生成火焰图数据（或 /profile 秒数）
+        """.format(seconds=self.config.PROFILE_DEFAULT_SECONDS)
 
         await update.message.reply_text(
             admin_text,
             reply_markup=reply_markup,
             parse_mode=ParseMode.MARKDOWN
-        )
\ No newline at end of file
+        )
+
+    @track_inflight
+    @monitor_performance
+    @admin_required
+    async def profile_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """管理员命令：/profile [秒数] 剖析运行中的进程"""
+        try:
+            seconds = float(context.args[0]) if context.args else self.config.PROFILE_DEFAULT_SECONDS
+        except ValueError:
+            await update.message.reply_text("用法: /profile [秒数]")
+            return
+
+        await self.send_profile(update.message, seconds)
+
+    async def send_profile(self, message, seconds: float):
+        """采样剖析并把折叠栈文件发送到 message 所在的聊天（调用方负责权限检查）"""
+        profiler = self.bot.profiler
+        if profiler.running:
+            await message.reply_text("⏳ 已有剖析任务正在运行，请稍后再试")
+            return
+
+        seconds = min(seconds, profiler.max_duration)
+        await message.reply_text(f"🔥 开始采样剖析 {seconds:.0f} 秒...")
+
+        try:
+            result = await profiler.profile(seconds)
+        except Exception as e:
+            logger.error(f"性能剖析失败: {e}")
+            await message.reply_text(f"❌ 性能剖析失败: {e}")
+            return
+
+        top = "\n".join(f"• {name}: {count}" for name, count in result.top) or "无"
+        caption = (
+            f"🔥 性能剖析完成（{result.duration:.0f}秒，{result.samples:,} 个样本，{result.stacks:,} 个调用栈）\n"
+            f"自身耗时最多:\n{top}\n\n"
+            f"折叠栈格式，可用 flamegraph.pl 或 speedscope 生成火焰图"
+        )
+        with open(result.path, 'rb') as f:
+            await message.reply_document(f, filename=result.path.name, caption=caption[:1024])
\ No newline at end of file
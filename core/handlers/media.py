@@ -3,9 +3,10 @@
 """
 
 import logging
+from functools import cached_property
 from telegram import Update
 from telegram.ext import MessageHandler, filters, ContextTypes
-from services.media_service import MediaService
+from utils.decorators import rate_limit, track_inflight, monitor_performance
 
 logger = logging.getLogger(__name__)
 
@@ -16,26 +17,33 @@ class MediaHandlers:
     def __init__(self, bot):
         self.bot = bot
         self.config = bot.config
-        self.media_service = MediaService()
+
+    @cached_property
+    def media_service(self):
+        """媒体处理服务（首次处理媒体消息时才导入和创建）"""
+        from services.media_service import MediaService
+        return MediaService()
 
     def register_handlers(self, application):
         """注册媒体处理器"""
+        # 私聊始终响应，群组中只处理@机器人或回复机器人的消息
+        addressed = filters.ChatType.PRIVATE | self.bot.group_filter
+
         if self.config.ENABLE_VOICE:
-            application.add_handler(MessageHandler(filters.VOICE, self.handle_voice))
+            application.add_handler(MessageHandler(filters.VOICE & addressed, self.handle_voice))
 
         if self.config.ENABLE_IMAGE:
-            application.add_handler(MessageHandler(filters.PHOTO, self.handle_photo))
+            application.add_handler(MessageHandler(filters.PHOTO & addressed, self.handle_photo))
 
-        application.add_handler(MessageHandler(filters.Document.ALL, self.handle_document))
+        application.add_handler(MessageHandler(filters.Document.ALL & addressed, self.handle_document))
 
         logger.info("✅ 媒体处理器已注册")
 
+    @track_inflight
+    @rate_limit(cost=3)
+    @monitor_performance
     async def handle_voice(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """处理语音消息"""
-        # 检查是否需要响应
-        if not await self.should_respond(update):
-            return
-
         await update.message.reply_text("🎧 正在处理语音消息...")
 
         try:
@@ -52,12 +60,11 @@ class MediaHandlers:
             logger.error(f"语音处理出错: {e}")
             await update.message.reply_text("🎤 语音处理出现问题，请稍后重试")
 
+    @track_inflight
+    @rate_limit(cost=5)
+    @monitor_performance
     async def handle_photo(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """处理图片消息"""
-        # 检查是否需要响应
-        if not await self.should_respond(update):
-            return
-
         await update.message.reply_text("🔍 正在分析图片...")
 
         try:
@@ -82,12 +89,11 @@ class MediaHandlers:
             logger.error(f"图片处理出错: {e}")
             await update.message.reply_text("🖼️ 图片处理出现问题，请稍后重试")
 
+    @track_inflight
+    @rate_limit(cost=0.5)
+    @monitor_performance
     async def handle_document(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """处理文档消息"""
-        # 检查是否需要响应
-        if not await self.should_respond(update):
-            return
-
         document = update.message.document
         file_name = document.file_name
         file_size = document.file_size
@@ -97,15 +103,4 @@ class MediaHandlers:
             await update.message.reply_text("📄 文件太大，请发送小于20MB的文件")
             return
 
-        await update.message.reply_text(f"📄 收到文档: {file_name}\n文档处理功能开发中...")
-
-    async def should_respond(self, update: Update) -> bool:
-        """判断是否应该响应媒体消息"""
-        chat = update.effective_chat
-
-        # 私聊始终响应
-        if chat.type == "private":
-            return True
-
-        # 群组中检查是否@机器人或回复机器人
-        return self.bot.should_respond_in_group(update)
\ No newline at end of file
+        await update.message.reply_text(f"📄 收到文档: {file_name}\n文档处理功能开发中...")
\ No newline at end of file
@@ -5,12 +5,14 @@
 import logging
 import asyncio
 import random
+from functools import cached_property
 from telegram import Update
 from telegram.ext import MessageHandler, filters, ContextTypes
 from telegram.constants import ChatAction, ParseMode
 from services.openai_service import OpenAIService
-from utils.decorators import rate_limit, log_user_action
+from utils.decorators import rate_limit, log_user_action, track_inflight, monitor_performance, ai_request_cost, trace_request
 from utils.helpers import split_long_message
+from utils.tracing import span
 
 logger = logging.getLogger(__name__)
 
@@ -21,39 +23,34 @@ class MessageHandlers:
     def __init__(self, bot):
         self.bot = bot
         self.config = bot.config
-        self.openai_service = OpenAIService()
 
         # 表情反应池
         self.reactions = ["👍", "❤️", "🔥", "🎉", "😊", "🤔", "👏", "💯"]
 
+    @cached_property
+    def openai_service(self) -> OpenAIService:
+        """AI 服务（上游延迟记录到系统监控器）"""
+        return OpenAIService(self.bot.system_monitor)
+
     def register_handlers(self, application):
         """注册消息处理器"""
-        # 文本消息处理器
+        # 文本消息处理器（群组消息在过滤器层面预筛，无关消息不进入处理器）
         application.add_handler(
-            MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_text_message)
+            MessageHandler(
+                filters.TEXT & ~filters.COMMAND & (filters.ChatType.PRIVATE | self.bot.group_filter),
+                self.handle_text_message
+            )
         )
 
         logger.info("✅ 消息处理器已注册")
 
-    async def should_respond(self, update: Update) -> bool:
-        """判断是否应该响应消息"""
-        chat = update.effective_chat
-
-        # 私聊始终响应
-        if chat.type == "private":
-            return True
-
-        # 群组中检查是否@机器人或回复机器人
-        return self.bot.should_respond_in_group(update)
-
-    @rate_limit
+    @track_inflight
+    @trace_request
+    @rate_limit(cost=ai_request_cost)
+    @monitor_performance
     @log_user_action
     async def handle_text_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """处理文本消息"""
-        # 检查是否需要响应
-        if not await self.should_respond(update):
-            return
-
         user = update.effective_user
         chat = update.effective_chat
         message = update.message
@@ -67,7 +64,8 @@ class MessageHandlers:
             await self.bot.user_service.update_user_activity(user.id)
 
             # 检查特殊命令模式
-            response = await self.process_special_commands(text)
+            with span("special_commands"):
+                response = await self.process_special_commands(text)
 
             if not response:
                 # 普通AI对话
@@ -157,41 +155,50 @@ class MessageHandlers:
 
     async def process_ai_chat(self, user_id: int, text: str) -> str:
         """处理AI对话"""
-        # 获取用户对话历史
-        context_messages = await self.bot.user_service.get_conversation_context(user_id)
+        with span("context") as stage:
+            # 获取用户对话历史
+            context_messages = await self.bot.user_service.get_conversation_context(user_id)
 
-        # 构建完整上下文
-        if context_messages:
-            full_context = '\n'.join(context_messages[-10:]) + '\n' + f"用户: {text}"
-        else:
-            full_context = f"用户: {text}"
+            # 构建完整上下文
+            if context_messages:
+                full_context = '\n'.join(context_messages[-10:]) + '\n' + f"用户: {text}"
+            else:
+                full_context = f"用户: {text}"
+            stage.set("context.messages", len(context_messages[-10:]))
+            stage.set("context.chars", len(full_context))
 
         # 调用AI服务
         response = await self.openai_service.get_chat_response(full_context)
 
         # 保存对话历史
-        await self.bot.user_service.add_to_conversation_history(
-            user_id, f"用户: {text}", f"助手: {response}"
-        )
+        with span("history"):
+            await self.bot.user_service.add_to_conversation_history(
+                user_id, f"用户: {text}", f"助手: {response}"
+            )
 
         return response
 
     async def show_typing_with_delay(self, context: ContextTypes.DEFAULT_TYPE, chat_id: int):
         """显示正在输入状态并延迟"""
-        await context.bot.send_chat_action(chat_id=chat_id, action=ChatAction.TYPING)
-        await asyncio.sleep(self.config.SHOW_TYPING_DELAY)
+        with span("typing"):
+            await context.bot.send_chat_action(chat_id=chat_id, action=ChatAction.TYPING)
+        with span("typing_delay"):
+            await asyncio.sleep(self.config.SHOW_TYPING_DELAY)
 
     async def send_smart_reply(self, update: Update, response: str):
         """智能发送回复（处理长消息分割）"""
-        if len(response) <= self.config.MAX_MESSAGE_LENGTH:
-            await update.message.reply_text(response, parse_mode=ParseMode.MARKDOWN)
-        else:
-            # 分割长消息
-            parts = split_long_message(response, self.config.MAX_MESSAGE_LENGTH)
-            for i, part in enumerate(parts):
-                if i > 0:
-                    await asyncio.sleep(0.5)  # 避免消息发送过快
-                await update.message.reply_text(part, parse_mode=ParseMode.MARKDOWN)
+        with span("telegram.send") as stage:
+            if len(response) <= self.config.MAX_MESSAGE_LENGTH:
+                stage.set("message.parts", 1)
+                await update.message.reply_text(response, parse_mode=ParseMode.MARKDOWN)
+            else:
+                # 分割长消息
+                parts = split_long_message(response, self.config.MAX_MESSAGE_LENGTH)
+                stage.set("message.parts", len(parts))
+                for i, part in enumerate(parts):
+                    if i > 0:
+                        await asyncio.sleep(0.5)  # 避免消息发送过快
+                    await update.message.reply_text(part, parse_mode=ParseMode.MARKDOWN)
 
     async def add_random_reaction(self, message):
         """添加随机表情反应"""
@@ -1,4 +1,6 @@
 """核心模块"""
 from .bot import TelegramAIBot
+from .shutdown import ShutdownCoordinator
+from .update_processor import ChatOrderedUpdateProcessor
 
-__all__ = ['TelegramAIBot']
\ No newline at end of file
+__all__ = ['TelegramAIBot', 'ShutdownCoordinator', 'ChatOrderedUpdateProcessor']
\ No newline at end of file
@@ -0,0 +1,180 @@
+"""
+优雅关闭协调器
+"""
+
+import time
+import signal
+import asyncio
+import logging
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, Set
+
+logger = logging.getLogger(__name__)
+
+AsyncCallback = Callable[[], Awaitable]
+
+
+class ShutdownCoordinator:
+    """关闭协调器
+
+    关闭顺序：
+    1. 停止接收新更新（停止轮询，之后到达处理器的更新直接丢弃并计数）
+    2. 等待在途处理器完成，超过期限的取消
+    3. 并发刷新所有已注册的存储（用户、对话历史、统计缓冲等）
+    4. 关闭所有连接池
+    5. 输出关闭报告（丢弃了什么、哪些刷新失败）
+    """
+
+    def __init__(self, drain_timeout: float = 10.0, flush_timeout: float = 5.0):
+        self.drain_timeout = drain_timeout
+        self.flush_timeout = flush_timeout
+
+        self.accepting = True
+        self.stores: Dict[str, AsyncCallback] = {}
+        self.closers: Dict[str, AsyncCallback] = {}
+
+        self._inflight: Set[asyncio.Task] = set()
+        self._stop_event = asyncio.Event()
+        self._report: Dict = {}
+
+        # 关闭期间被拒绝的更新数
+        self.rejected_updates = 0
+
+    def register_store(self, name: str, flush: AsyncCallback):
+        """注册需要在关闭时刷新的存储
+
+        flush 失败时应抛出异常，报告中才会记为失败；阻塞的文件写入要用
+        asyncio.to_thread 包装，否则各存储会在事件循环上依次执行，超时也无法生效。
+        """
+        self.stores[name] = flush
+
+    def register_closer(self, name: str, close: AsyncCallback):
+        """注册需要在关闭时释放的资源（连接池、后台任务等）"""
+        self.closers[name] = close
+
+    @contextmanager
+    def track(self):
+        """跟踪一个在途处理器"""
+        task = asyncio.current_task()
+        self._inflight.add(task)
+        try:
+            yield
+        finally:
+            self._inflight.discard(task)
+
+    def record_rejected(self):
+        """记录一次关闭期间被拒绝的更新"""
+        self.rejected_updates += 1
+
+    @property
+    def inflight_count(self) -> int:
+        """在途处理器数量"""
+        return len(self._inflight)
+
+    def install_signal_handlers(self):
+        """安装 SIGINT/SIGTERM 处理器"""
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.request_stop)
+            except (NotImplementedError, RuntimeError):
+                # Windows 不支持 add_signal_handler，依赖 KeyboardInterrupt
+                pass
+
+    def request_stop(self):
+        """请求关闭（信号处理器调用）"""
+        if not self._stop_event.is_set():
+            logger.info("🛑 收到停止信号，开始优雅关闭...")
+            self.accepting = False
+            self._stop_event.set()
+
+    async def wait_for_stop(self):
+        """等待停止信号"""
+        await self._stop_event.wait()
+
+    async def shutdown(self, application=None) -> Dict:
+        """执行完整的关闭流程，重复调用直接返回第一次的报告"""
+        if self._report:
+            return self._report
+
+        self.accepting = False
+        start = time.perf_counter()
+
+        # 1. 停止拉取新更新
+        if application is not None and application.updater and application.updater.running:
+            await application.updater.stop()
+
+        # 2. 等待在途处理器
+        drained, cancelled = await self._drain()
+
+        # 3. 停止应用（队列中剩余的更新会被直接丢弃）
+        if application is not None and application.running:
+            await application.stop()
+
+        # 4. 并发刷新存储
+        flush_results = await self._run_all(self.stores)
+
+        # 5. 关闭连接池
+        close_results = await self._run_all(self.closers)
+
+        self._report = {
+            'drained_handlers': drained,
+            'cancelled_handlers': cancelled,
+            'rejected_updates': self.rejected_updates,
+            'stores': flush_results,
+            'closers': close_results,
+            'duration': time.perf_counter() - start
+        }
+        self._log_report()
+        return self._report
+
+    async def _drain(self):
+        """等待在途处理器完成，超时后取消剩余的"""
+        pending = {task for task in self._inflight if not task.done()}
+        if not pending:
+            return 0, 0
+
+        logger.info(f"⏳ 等待 {len(pending)} 个在途处理器完成（最长 {self.drain_timeout}s）")
+        done, pending = await asyncio.wait(pending, timeout=self.drain_timeout)
+
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending, timeout=1.0)
+
+        return len(done), len(pending)
+
+    async def _run_all(self, callbacks: Dict[str, AsyncCallback]) -> Dict[str, str]:
+        """并发执行回调，每个回调有独立超时"""
+        async def run(name: str, callback: AsyncCallback) -> str:
+            try:
+                await asyncio.wait_for(callback(), timeout=self.flush_timeout)
+                return "ok"
+            except asyncio.TimeoutError:
+                logger.error(f"关闭步骤 {name} 超时")
+                return "timeout"
+            except Exception as e:
+                logger.error(f"关闭步骤 {name} 失败: {e}")
+                return f"error: {e}"
+
+        names = list(callbacks)
+        results = await asyncio.gather(*(run(name, callbacks[name]) for name in names))
+        return dict(zip(names, results))
+
+    def _log_report(self):
+        """输出关闭报告"""
+        report = self._report
+        failed = [
+            f"{name}({result})"
+            for name, result in {**report['stores'], **report['closers']}.items()
+            if result != "ok"
+        ]
+
+        logger.info(
+            f"👋 优雅关闭完成，耗时 {report['duration']:.2f}s\n"
+            f"  • 完成的在途处理器: {report['drained_handlers']}\n"
+            f"  • 超时取消的处理器: {report['cancelled_handlers']}\n"
+            f"  • 丢弃的新更新: {report['rejected_updates']}\n"
+            f"  • 已刷新存储: {', '.join(name for name, result in report['stores'].items() if result == 'ok') or '无'}\n"
+            f"  • 失败步骤: {', '.join(failed) or '无'}"
+        )
\ No newline at end of file
@@ -0,0 +1,79 @@
+"""
+按聊天保序的更新处理器
+"""
+
+import logging
+from collections import deque
+from typing import Any, Awaitable, Deque, Dict, Hashable, Optional
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """按聊天保序的并发更新处理器
+
+    不同聊天的更新并发处理（最多 max_concurrent_updates 个），同一聊天的更新
+    按到达顺序逐个处理。聊天已有更新在处理时，新到的更新排进该聊天的队列，
+    由正在处理的任务依次执行，自己立即返回并释放并发名额。这样同一用户的
+    对话历史和用户记录不会被并发的处理器读改写覆盖，一个刷屏的聊天最多
+    也只占用一个并发名额。
+    """
+
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(max_concurrent_updates)
+        self._queues: Dict[Hashable, Deque[Awaitable[Any]]] = {}
+
+    @staticmethod
+    def _key(update: object) -> Optional[Hashable]:
+        """保序的键：聊天 ID，没有聊天时为用户 ID（如内联查询）"""
+        if not isinstance(update, Update):
+            return None
+        if update.effective_chat is not None:
+            return update.effective_chat.id
+        if update.effective_user is not None:
+            return ("user", update.effective_user.id)
+        return None
+
+    @property
+    def queued_count(self) -> int:
+        """排队等待同一聊天前面的更新处理完的更新数"""
+        return sum(len(queue) for queue in self._queues.values())
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]):
+        key = self._key(update)
+        if key is None:
+            await coroutine
+            return
+
+        queue = self._queues.get(key)
+        if queue is not None:
+            queue.append(coroutine)
+            return
+
+        # 本聊天当前没有更新在处理：由本任务依次处理本条和之后排队的更新
+        queue = self._queues[key] = deque()
+        try:
+            await self._run(coroutine)
+            while queue:
+                await self._run(queue.popleft())
+        finally:
+            del self._queues[key]
+            # 被取消时（关闭超时）丢弃尚未开始的更新
+            for pending in queue:
+                pending.close()
+
+    @staticmethod
+    async def _run(coroutine: Awaitable[Any]):
+        """处理一条更新，出错不影响同一聊天后面的更新"""
+        try:
+            await coroutine
+        except Exception as e:
+            logger.error(f"处理更新出错: {e}")
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
@@ -12,24 +12,15 @@ from pathlib import Path
 project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
 
-from core.bot import TelegramAIBot
+from utils.startup import startup_timer
+from utils.log_pipeline import log_pipeline
 from config.config import Config
 
 
 # 配置日志
 def setup_logging():
-    """设置日志配置"""
-    log_dir = Path("data/logs")
-    log_dir.mkdir(parents=True, exist_ok=True)
-
-    logging.basicConfig(
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        level=getattr(logging, Config.LOG_LEVEL),
-        handlers=[
-            logging.FileHandler(Config.LOG_FILE, encoding='utf-8'),
-            logging.StreamHandler(sys.stdout)
-        ]
-    )
+    """设置日志配置（日志在后台线程中写出，文件按大小和时间轮转）"""
+    log_pipeline.start(Config)
 
 
 async def main():
@@ -40,11 +31,17 @@ async def main():
         logger = logging.getLogger(__name__)
 
         # 验证配置
-        Config.validate()
+        with startup_timer.phase("配置验证"):
+            Config.validate()
         logger.info("配置验证通过")
 
+        # 核心模块在日志就绪后再导入，便于记录导入耗时
+        with startup_timer.phase("导入核心模块"):
+            from core.bot import TelegramAIBot
+
         # 创建并启动机器人
-        bot = TelegramAIBot()
+        with startup_timer.phase("创建机器人实例"):
+            bot = TelegramAIBot()
         logger.info("🚀 启动 Telegram AI 机器人...")
         await bot.start()
 
@@ -53,6 +50,9 @@ async def main():
     except Exception as e:
         logger.error(f"❌ 启动机器人时出错: {e}")
         sys.exit(1)
+    finally:
+        # 写出队列中剩余的日志
+        log_pipeline.stop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+性能历史记录基准测试
+
+对比最初的"按小时字符串分桶的字典 + 每次记录都扫描清理"与预分配环形数组的
+单次记录耗时，以及查询最近 24 小时逐小时统计的耗时。
+"""
+
+import sys
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# 添加项目路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.bucket_ring import TimeBucketRing
+
+
+class LegacyHourlyStats:
+    """最初的实现：'%Y-%m-%d-%H' 字符串为键的字典，每次记录后扫描清理 25 小时前的键"""
+
+    def __init__(self):
+        self.hourly_stats = {}
+
+    def record(self, seconds: float, is_error: bool, now: float):
+        current_hour = datetime.fromtimestamp(now).strftime('%Y-%m-%d-%H')
+        if current_hour not in self.hourly_stats:
+            self.hourly_stats[current_hour] = {'requests': 0, 'errors': 0, 'total_response_time': 0}
+        self.hourly_stats[current_hour]['requests'] += 1
+        self.hourly_stats[current_hour]['total_response_time'] += seconds
+        if is_error:
+            self.hourly_stats[current_hour]['errors'] += 1
+
+        cutoff_key = (datetime.fromtimestamp(now) - timedelta(hours=25)).strftime('%Y-%m-%d-%H')
+        for key in [key for key in self.hourly_stats if key < cutoff_key]:
+            del self.hourly_stats[key]
+
+    def hourly(self, now: float):
+        stats = {}
+        for i in range(24):
+            hour_key = (datetime.fromtimestamp(now) - timedelta(hours=i)).strftime('%Y-%m-%d-%H')
+            data = self.hourly_stats.get(hour_key, {'requests': 0, 'errors': 0, 'total_response_time': 0})
+            stats[hour_key] = data['total_response_time'] / max(data['requests'], 1)
+        return stats
+
+
+class RingHistory:
+    """新版实现：分钟/小时两个预分配环形数组"""
+
+    def __init__(self):
+        self.minutes = TimeBucketRing(60, 24 * 60, 0)
+        self.hours = TimeBucketRing(3600, 32 * 24, 0)
+
+    def record(self, seconds: float, is_error: bool, now: float):
+        self.minutes.record(seconds, is_error, now)
+        self.hours.record(seconds, is_error, now)
+
+    def hourly(self, now: float):
+        return self.hours.series(24, now)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="性能历史记录基准测试")
+    parser.add_argument("--requests", type=int, default=300_000, help="请求数")
+    parser.add_argument("--rate", type=int, default=5, help="每秒请求数（决定覆盖的时间跨度）")
+    parser.add_argument("--queries", type=int, default=1_000, help="逐小时统计查询次数")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    samples = [(rng.lognormvariate(-1.5, 0.8), rng.random() < 0.02) for _ in range(args.requests)]
+    start = 1_000_000_000.0
+    end = start + args.requests / args.rate
+
+    print(f"📨 请求数: {args.requests:,}  ({args.rate} 次/秒，跨度 {(end - start) / 3600:.1f} 小时)")
+    for name, history in (("字符串字典", LegacyHourlyStats()), ("环形数组", RingHistory())):
+        begin = time.perf_counter()
+        for i, (seconds, is_error) in enumerate(samples):
+            history.record(seconds, is_error, start + i / args.rate)
+        record_elapsed = time.perf_counter() - begin
+
+        begin = time.perf_counter()
+        for _ in range(args.queries):
+            history.hourly(end)
+        query_elapsed = time.perf_counter() - begin
+
+        print(f"⏱️ {name}: 记录 {record_elapsed / args.requests * 1e9:.0f}ns/次，"
+              f"24 小时逐小时查询 {query_elapsed / args.queries * 1e6:.0f}us/次")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+回调路由基准测试
+
+对比旧版 if/elif + startswith 链与 CallbackRouter 表驱动路由的分发开销。
+"""
+
+import sys
+import time
+import random
+import argparse
+from pathlib import Path
+
+# 添加项目路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.callback_router import CallbackRouter
+
+CALLBACK_DATA = [
+    "start_chat", "settings", "features", "help",
+    "help_chat", "help_tools", "help_settings", "help_faq",
+    "setting_language", "setting_mode", "setting_notifications",
+    "admin_status", "admin_users", "admin_broadcast", "admin_detailed_stats",
+    "back_to_main", "set_lang_zh",
+]
+
+
+def legacy_route(data: str):
+    """旧版 if/elif 路由"""
+    if data == "start_chat":
+        return "start_chat", None
+    elif data == "settings":
+        return "settings", None
+    elif data == "features":
+        return "features", None
+    elif data == "help":
+        return "help", None
+    elif data.startswith("help_"):
+        return "help_category", data.split("_", 1)[1]
+    elif data.startswith("setting_"):
+        return "setting_option", data.split("_", 1)[1]
+    elif data.startswith("admin_"):
+        return "admin_action", data.split("_", 1)[1]
+    return None, None
+
+
+def build_router() -> CallbackRouter:
+    """构建与 CallbackHandlers 相同的路由表"""
+    router = CallbackRouter()
+    for name in ("start_chat", "settings", "features", "help"):
+        router.exact(name, name)
+    router.prefix("help", "help_category")
+    router.prefix("setting", "setting_option")
+    router.prefix("admin", "admin_action")
+    return router
+
+
+def bench(func, stream: list) -> float:
+    """执行一轮路由并返回耗时"""
+    start = time.perf_counter()
+    for data in stream:
+        func(data)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回调路由基准测试")
+    parser.add_argument("--clicks", type=int, default=1_000_000, help="模拟点击次数")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    stream = [rng.choice(CALLBACK_DATA) for _ in range(args.clicks)]
+    router = build_router()
+
+    # 校验两种路由结果一致
+    for data in CALLBACK_DATA:
+        legacy_name, legacy_arg = legacy_route(data)
+        handler, route_args = router.resolve(data)
+        assert legacy_name == handler and (legacy_arg,) == (route_args or (None,)), data
+
+    legacy_elapsed = bench(legacy_route, stream)
+    router_elapsed = bench(router.resolve, stream)
+
+    print(f"🖱️ 点击次数: {args.clicks:,}")
+    print(f"🐢 if/elif 链: {legacy_elapsed:.3f}s  ({legacy_elapsed / args.clicks * 1e9:.0f}ns/次)")
+    print(f"🚀 路由表:     {router_elapsed:.3f}s  ({router_elapsed / args.clicks * 1e9:.0f}ns/次)")
+    print(f"⚡ 加速比: {legacy_elapsed / max(router_elapsed, 1e-9):.2f}x")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
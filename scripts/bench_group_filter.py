@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+群组预过滤器基准测试
+
+模拟一个繁忙群组的消息流（绝大多数消息与机器人无关），对比：
+- 旧路径：每条消息都经过 rate_limit + log_user_action，再由 should_respond 丢弃
+- 新路径：AddressedToBotFilter 在过滤器层面直接丢弃无关消息
+"""
+
+import sys
+import time
+import random
+import logging
+import argparse
+import tempfile
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+# 添加项目路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from telegram import Chat, Message, MessageEntity, Update, User
+from telegram.ext import filters
+
+from utils.filters import AddressedToBotFilter
+
+BOT = User(id=999, first_name="AI", is_bot=True, username="My_AI_Bot")
+GROUP = Chat(id=-100123, type=Chat.SUPERGROUP)
+
+
+def build_stream(count: int, addressed_ratio: float, seed: int = 42) -> list:
+    """生成合成的群组消息流"""
+    rng = random.Random(seed)
+    users = [User(id=1000 + i, first_name=f"u{i}", is_bot=False) for i in range(200)]
+    bot_message = Message(message_id=1, date=datetime.now(), chat=GROUP, from_user=BOT, text="hi")
+    updates = []
+
+    for i in range(count):
+        sender = rng.choice(users)
+        roll = rng.random()
+        entities = ()
+        reply_to = None
+
+        if roll < addressed_ratio / 2:
+            text = "@my_ai_bot 今天天气怎么样"
+            entities = (MessageEntity(MessageEntity.MENTION, 0, 10),)
+        elif roll < addressed_ratio:
+            text = "继续说说"
+            reply_to = bot_message
+        elif roll < addressed_ratio + 0.05:
+            text = "@someone_else 你看这个"
+            entities = (MessageEntity(MessageEntity.MENTION, 0, 13),)
+        else:
+            text = rng.choice(["哈哈哈", "今晚吃什么", "有人在吗？", "好的 👍", "明天见"])
+
+        message = Message(
+            message_id=i + 2, date=datetime.now(), chat=GROUP, from_user=sender,
+            text=text, entities=entities, reply_to_message=reply_to
+        )
+        updates.append(Update(update_id=i, message=message))
+
+    return updates
+
+
+def legacy_should_respond(message: Message, mention: str) -> bool:
+    """旧版 should_respond_in_group 的判断逻辑"""
+    if message.entities:
+        for entity in message.entities:
+            if entity.type == "mention":
+                if message.text[entity.offset:entity.offset + entity.length].lower() == mention:
+                    return True
+
+    reply = message.reply_to_message
+    return bool(reply and reply.from_user and reply.from_user.id == BOT.id)
+
+
+def legacy_path(updates: list, log_file: str) -> int:
+    """旧路径：装饰器先执行，随后在处理器内丢弃"""
+    logger = logging.getLogger("bench.legacy")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    handler = logging.FileHandler(log_file, encoding='utf-8')
+    logger.addHandler(handler)
+
+    storage = defaultdict(list)
+    base = filters.TEXT & ~filters.COMMAND
+    mention = f"@{BOT.username.lower()}"
+    answered = 0
+
+    for update in updates:
+        if not base.check_update(update):
+            continue
+
+        # rate_limit
+        user_id = update.effective_user.id
+        now = time.time()
+        storage[user_id] = [t for t in storage[user_id] if now - t < 60]
+        storage[user_id].append(now)
+
+        # log_user_action
+        logger.info(f"👤 用户 {user_id} ({update.effective_user.first_name}) 执行: handle_text_message")
+
+        # should_respond_in_group
+        if legacy_should_respond(update.message, mention):
+            answered += 1
+
+    logger.removeHandler(handler)
+    handler.close()
+    return answered
+
+
+def filter_path(updates: list, group_filter: AddressedToBotFilter) -> int:
+    """新路径：过滤器层面预筛"""
+    combined = filters.TEXT & ~filters.COMMAND & (filters.ChatType.PRIVATE | group_filter)
+    return sum(1 for update in updates if combined.check_update(update))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="群组预过滤器基准测试")
+    parser.add_argument("--messages", type=int, default=100_000, help="消息数量")
+    parser.add_argument("--addressed", type=float, default=0.02, help="@机器人或回复机器人的比例")
+    args = parser.parse_args()
+
+    updates = build_stream(args.messages, args.addressed)
+    group_filter = AddressedToBotFilter()
+    group_filter.set_bot(BOT)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        legacy_answered = legacy_path(updates, str(Path(tmp) / "bench.log"))
+        legacy_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    filter_answered = filter_path(updates, group_filter)
+    filter_elapsed = time.perf_counter() - start
+
+    stats = group_filter.get_stats()
+    print(f"📨 消息数: {args.messages:,}  (目标消息比例 {args.addressed:.0%})")
+    print(f"🐢 旧路径: {legacy_elapsed:.3f}s  ({legacy_elapsed / args.messages * 1e6:.2f}µs/条)  响应 {legacy_answered:,}")
+    print(f"🚀 过滤器: {filter_elapsed:.3f}s  ({filter_elapsed / args.messages * 1e6:.2f}µs/条)  响应 {filter_answered:,}")
+    print(f"📉 过滤统计: 检查 {stats['checked']:,} / 放行 {stats['passed']:,} / 丢弃 {stats['filtered']:,} ({stats['filter_rate']:.1f}%)")
+    print(f"⚡ 加速比: {legacy_elapsed / max(filter_elapsed, 1e-9):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
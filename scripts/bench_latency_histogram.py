@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+延迟直方图基准测试
+
+对比旧版"响应时间列表（超过 1000 条重新切片）"与对数分桶滑动窗口直方图的
+单次记录耗时、分位数查询耗时和分位数精度。
+"""
+
+import sys
+import time
+import random
+import argparse
+import statistics
+from pathlib import Path
+
+# 添加项目路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.system_monitor import LATENCY_WINDOWS
+from utils.histogram import RollingHistogram
+
+
+class LegacyResponseTimes:
+    """旧版实现：追加到列表，超过 1000 条时切片，只能算最近 1000 次的分位数"""
+
+    def __init__(self):
+        self.response_times = []
+
+    def record(self, seconds: float, now: float):
+        self.response_times.append(seconds)
+        if len(self.response_times) > 1000:
+            self.response_times = self.response_times[-1000:]
+
+    def percentiles(self):
+        values = sorted(self.response_times)
+        return {q: values[min(int(q * len(values)), len(values) - 1)] for q in (0.5, 0.95, 0.99)}
+
+
+class WindowedHistograms:
+    """新版实现：每个窗口一个滑动直方图"""
+
+    def __init__(self):
+        self.windows = [RollingHistogram(seconds, slots) for seconds, slots in LATENCY_WINDOWS.values()]
+
+    def record(self, seconds: float, now: float):
+        index = self.windows[0].window.index_of(seconds)
+        for histogram in self.windows:
+            histogram.record(seconds, now, index)
+
+    def percentiles(self):
+        return self.windows[1].snapshot(self.now).percentiles([0.5, 0.95, 0.99])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="延迟直方图基准测试")
+    parser.add_argument("--requests", type=int, default=300_000, help="请求数")
+    parser.add_argument("--rate", type=int, default=200, help="每秒请求数")
+    parser.add_argument("--queries", type=int, default=1_000, help="分位数查询次数")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    latencies = [rng.lognormvariate(-1.5, 0.8) for _ in range(args.requests)]
+    start = 1_000_000.0
+
+    # 5 分钟窗口内的真实分位数
+    window = latencies[-LATENCY_WINDOWS["5m"][0] * args.rate:]
+    exact = statistics.quantiles(window, n=100)
+
+    print(f"📨 请求数: {args.requests:,}  ({args.rate} 次/秒)")
+    for name, recorder in (("列表切片", LegacyResponseTimes()), ("滑动直方图", WindowedHistograms())):
+        begin = time.perf_counter()
+        for i, seconds in enumerate(latencies):
+            recorder.record(seconds, start + i / args.rate)
+        record_elapsed = time.perf_counter() - begin
+
+        recorder.now = start + args.requests / args.rate
+        begin = time.perf_counter()
+        for _ in range(args.queries):
+            result = recorder.percentiles()
+        query_elapsed = time.perf_counter() - begin
+
+        print(f"⏱️ {name}: 记录 {record_elapsed / args.requests * 1e9:.0f}ns/次，"
+              f"分位数查询 {query_elapsed / args.queries * 1e6:.0f}us/次，"
+              f"P50/P95/P99 = {result[0.5]:.3f}/{result[0.95]:.3f}/{result[0.99]:.3f}s")
+
+    print(f"🎯 最近5分钟真实值: P50/P95/P99 = {exact[49]:.3f}/{exact[94]:.3f}/{exact[98]:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
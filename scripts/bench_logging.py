@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+日志管道基准测试
+
+对比旧版"根 logger 上同步挂 FileHandler + StreamHandler"与队列日志管道在
+调用方（事件循环）一侧的单次 log_user_action 耗时，以及开启采样后的耗时。
+控制台输出重定向到 /dev/null，只比较格式化、写文件和入队的开销。
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+# 添加项目路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.log_pipeline import TEXT_FORMAT, LogPipeline
+
+
+def log_user_actions(count: int) -> float:
+    """模拟 log_user_action：返回调用方平均耗时（秒）"""
+    action_logger = logging.getLogger("user_action")
+    begin = time.perf_counter()
+    for i in range(count):
+        action_logger.info("👤 用户 %s (%s) 执行: %s", i, "测试用户", "handle_text_message",
+                           extra={'user_id': i, 'chat_type': 'private', 'action': 'handle_text_message'})
+    return (time.perf_counter() - begin) / count
+
+
+def run_legacy(count: int, log_file: str) -> float:
+    root = logging.getLogger()
+    handlers = [logging.FileHandler(log_file, encoding='utf-8'), logging.StreamHandler(open(os.devnull, 'w'))]
+    for handler in handlers:
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+        root.addHandler(handler)
+    root.setLevel(logging.INFO)
+    try:
+        return log_user_actions(count)
+    finally:
+        for handler in handlers:
+            root.removeHandler(handler)
+            handler.close()
+
+
+def run_pipeline(count: int, log_file: str, log_format: str, sample_rates: str, batch: int) -> tuple:
+    config = SimpleNamespace(
+        LOG_LEVEL="INFO", LOG_FILE=log_file, LOG_FORMAT=log_format, LOG_MAX_BYTES=50 * 1024 * 1024,
+        LOG_ROTATE_INTERVAL=0, LOG_BACKUP_COUNT=2, LOG_COMPRESS=True, LOG_QUEUE_SIZE=batch * 2,
+        LOG_SAMPLE_RATES=sample_rates
+    )
+    stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')
+    pipeline = LogPipeline()
+    pipeline.start(config)
+    try:
+        # 分批记录并在批次之间等待写入线程清空队列，模拟日志穿插在网络 I/O 之间的真实负载
+        elapsed = 0.0
+        for _ in range(count // batch):
+            elapsed += log_user_actions(batch) * batch
+            while pipeline.queue.qsize():
+                time.sleep(0.001)
+        stats = pipeline.get_stats()
+    finally:
+        pipeline.stop()
+        sys.stdout.close()
+        sys.stdout = stdout
+    return elapsed / count, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="日志管道基准测试")
+    parser.add_argument("--count", type=int, default=50_000, help="日志条数")
+    parser.add_argument("--batch", type=int, default=100, help="每批连续记录的条数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = run_legacy(args.count, os.path.join(tmp, "legacy.log"))
+        print(f"📝 日志条数: {args.count:,}（每批 {args.batch} 条）")
+        print(f"⏱️ 同步 FileHandler: {legacy * 1e6:.1f}us/次")
+
+        for name, log_format, rates in (("队列管道 (text)", "text", ""), ("队列管道 (json)", "json", ""),
+                                         ("队列管道 (json, user_action 采样 10%)", "json", "user_action=0.1")):
+            elapsed, stats = run_pipeline(args.count, os.path.join(tmp, f"{log_format}.log"), log_format, rates,
+                                          args.batch)
+            dropped = sum(stats['sampled_out'].values())
+            print(f"⏱️ {name}: {elapsed * 1e6:.1f}us/次，采样丢弃 {dropped:,} 条，队列溢出 {stats['overflowed']:,} 条")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
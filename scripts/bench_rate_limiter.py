@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+速率限制基准测试
+
+模拟大量不同用户各发一条消息，对比旧版"每用户时间戳列表"与 GCRA 限制器的
+单次调用耗时和内存占用，并演示空闲用户被时间轮淘汰后内存回落。
+"""
+
+import sys
+import time
+import argparse
+import tracemalloc
+from collections import defaultdict
+from pathlib import Path
+
+# 添加项目路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.rate_limiter import GCRARateLimiter
+
+
+class LegacyRateLimiter:
+    """旧版实现：每个用户保存窗口内所有请求时间戳，从不删除用户"""
+
+    def __init__(self, max_requests: int, window_seconds: float):
+        self.max_requests = max_requests
+        self.window = window_seconds
+        self.storage = defaultdict(list)
+
+    def allow(self, key, now: float) -> bool:
+        self.storage[key] = [t for t in self.storage[key] if now - t < self.window]
+        if len(self.storage[key]) >= self.max_requests:
+            return False
+        self.storage[key].append(now)
+        return True
+
+
+def run(limiter, users: int, start: float, spread: float):
+    """每个用户发送一次请求，时间在 spread 秒内均匀分布"""
+    step = spread / users
+    allow = limiter.allow
+    begin = time.perf_counter()
+    for user_id in range(users):
+        allow(user_id, now=start + user_id * step)
+    return time.perf_counter() - begin
+
+
+def measure(factory, users: int, start: float, spread: float):
+    """分别测量耗时（不开 tracemalloc）和内存占用"""
+    elapsed = run(factory(), users, start, spread)
+
+    tracemalloc.start()
+    limiter = factory()
+    run(limiter, users, start, spread)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return elapsed, memory, limiter
+
+
+def main():
+    parser = argparse.ArgumentParser(description="速率限制基准测试")
+    parser.add_argument("--users", type=int, default=1_000_000, help="不同用户数")
+    parser.add_argument("--max-requests", type=int, default=20, help="窗口内最大请求数")
+    parser.add_argument("--window", type=float, default=60, help="窗口秒数")
+    args = parser.parse_args()
+
+    # 用固定的假时钟，所有请求落在一个窗口内
+    start = 1_000_000.0
+    spread = args.window
+
+    legacy_elapsed, legacy_memory, _ = measure(
+        lambda: LegacyRateLimiter(args.max_requests, args.window), args.users, start, spread
+    )
+    gcra_elapsed, gcra_memory, gcra = measure(
+        lambda: GCRARateLimiter(args.max_requests, args.window), args.users, start, spread
+    )
+
+    print(f"👥 用户数: {args.users:,}  (限制 {args.max_requests} 次/{args.window:.0f}s)")
+    print(f"🐢 时间戳列表: {legacy_elapsed / args.users * 1e9:.0f}ns/次，内存 {legacy_memory / 1024 / 1024:.1f}MB")
+    print(f"🚀 GCRA:       {gcra_elapsed / args.users * 1e9:.0f}ns/次，内存 {gcra_memory / 1024 / 1024:.1f}MB")
+    print(f"💾 内存节省: {(1 - gcra_memory / max(legacy_memory, 1)) * 100:.1f}%")
+
+    # 空闲淘汰：一个窗口之后所有用户的 TAT 都已过期
+    tracked = len(gcra)
+    gcra.sweep(now=start + spread + args.window + 2)
+    print(f"🧹 空闲淘汰: {tracked:,} -> {len(gcra):,} 个用户（旧版实现永远保留 {args.users:,} 个）")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
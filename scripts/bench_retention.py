@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+留存位图基准测试
+
+生成若干天、每天随机一部分用户活跃的数据，测量内存位图（Redis 不可用时的 NumPy
+实现）的写入速度、每天占用的内存，以及日活/周活/月活、留存和同期群报表的耗时。
+"""
+
+import sys
+import time
+import asyncio
+import argparse
+from datetime import date, timedelta
+from pathlib import Path
+
+# 添加项目路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from services.retention import RetentionTracker
+
+
+def fill(tracker: RetentionTracker, users: int, days: int, active_ratio: float, today: date):
+    """每天随机 active_ratio 比例的用户活跃，用户按序号逐步注册"""
+    rng = np.random.default_rng(42)
+    records = 0
+    begin = time.perf_counter()
+    for offset in range(days - 1, -1, -1):
+        day = (today - timedelta(days=offset)).isoformat()
+        registered = users * (days - offset) // days
+        active = rng.choice(registered, size=int(registered * active_ratio), replace=False)
+        for user_id in active.tolist():
+            tracker.record(user_id, day)
+        records += len(active)
+    return records, time.perf_counter() - begin
+
+
+async def timed(coro):
+    begin = time.perf_counter()
+    result = await coro
+    return result, time.perf_counter() - begin
+
+
+def main():
+    parser = argparse.ArgumentParser(description="留存位图基准测试")
+    parser.add_argument("--users", type=int, default=2_000_000, help="用户总数")
+    parser.add_argument("--days", type=int, default=32, help="天数")
+    parser.add_argument("--active", type=float, default=0.2, help="每天活跃用户比例")
+    args = parser.parse_args()
+
+    today = date.today()
+    tracker = RetentionTracker(retention_days=args.days, max_local_users=args.users)
+    records, elapsed = fill(tracker, args.users, args.days, args.active, today)
+
+    per_day = max(bitmap.nbytes for bitmap in tracker.local["active"].values())
+    print(f"👥 用户数: {args.users:,}  ({args.days} 天，每天 {args.active:.0%} 活跃)")
+    print(f"✍️ 写入: {records:,} 次，{elapsed / records * 1e9:.0f}ns/次")
+    print(f"💾 内存: 每天 {per_day / 1024 / 1024:.2f}MB，总计 {tracker.memory_usage() / 1024 / 1024:.1f}MB")
+
+    report, elapsed = asyncio.run(timed(tracker.report(today=today)))
+    print(f"📊 日活/周活/月活: {report['dau']:,} / {report['wau']:,} / {report['mau']:,}")
+    for n, item in report['retention'].items():
+        print(f"🔁 {n}日留存: {item['rate'] * 100:.1f}% ({item['retained']:,}/{item['cohort_size']:,})")
+    print(f"⏱️ 报表耗时: {elapsed * 1000:.1f}ms")
+
+    table, elapsed = asyncio.run(timed(tracker.cohorts(7, 7, today=today)))
+    print(f"⏱️ 7x7 同期群表耗时: {elapsed * 1000:.1f}ms（{sum(len(row['retained']) + 1 for row in table)} 个统计量）")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+统计写缓冲基准测试
+
+统计 update_user_activity 在逐条写入和缓冲批量写入两种方式下发往 Redis 的命令数。
+使用只计数不联网的管道，不需要真实的 Redis。
+"""
+
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+from pathlib import Path
+
+# 添加项目路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.realtime_stats import RealTimeStatsManager
+
+# 旧版每条消息在独立管道中发送的命令数
+LEGACY_COMMANDS_PER_MESSAGE = 15
+
+
+class CountingPipeline:
+    """只记录命令数的管道"""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = 0
+
+    def __getattr__(self, name):
+        def command(*args, **kwargs):
+            self.commands += 1
+        return command
+
+    async def execute(self):
+        self.redis.commands += self.commands
+        self.redis.round_trips += 1
+
+
+class CountingRedis:
+    """只记录命令数和往返次数的 Redis 客户端"""
+
+    def __init__(self):
+        self.commands = 0
+        self.round_trips = 0
+
+    def pipeline(self, transaction: bool = True):
+        return CountingPipeline(self)
+
+    def register_script(self, script: str):
+        """位图序号分配脚本：每次调用计一条命令、一次往返"""
+        assigned = {}
+
+        async def run(keys, args):
+            self.commands += 1
+            self.round_trips += 1
+            return [assigned.setdefault(user_id, len(assigned)) for user_id in args[1::2]]
+        return run
+
+
+async def run(messages: int, users: int, rate: int, interval: float):
+    # 使用临时文件，避免读取并删除真实的未写入缓冲
+    pending_file = Path(tempfile.gettempdir()) / "bench_stats_pending.json"
+    manager = RealTimeStatsManager(pending_file=str(pending_file), flush_interval=interval)
+    redis = CountingRedis()
+    manager.redis = redis
+    manager.redis_available = True
+
+    rng = random.Random(42)
+    actions = ["handle_text_message", "start_command", "help_command", "handle_photo"]
+
+    # 按消息速率切分刷新周期
+    per_interval = max(1, int(rate * interval))
+    begin = time.perf_counter()
+    for i in range(messages):
+        await manager.update_user_activity(rng.randrange(users), rng.choice(actions))
+        if (i + 1) % per_interval == 0:
+            await manager.flush_buffer()
+    await manager.flush_buffer()
+    elapsed = time.perf_counter() - begin
+
+    return redis, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="统计写缓冲基准测试")
+    parser.add_argument("--messages", type=int, default=100_000, help="消息数")
+    parser.add_argument("--users", type=int, default=2_000, help="不同用户数")
+    parser.add_argument("--rate", type=int, default=300, help="每秒消息数")
+    parser.add_argument("--interval", type=float, default=1.0, help="刷新间隔（秒）")
+    args = parser.parse_args()
+
+    redis, elapsed = asyncio.run(run(args.messages, args.users, args.rate, args.interval))
+    legacy = args.messages * LEGACY_COMMANDS_PER_MESSAGE
+    seconds = args.messages / args.rate
+
+    print(f"📨 消息数: {args.messages:,}  ({args.rate} 条/秒，{args.users:,} 个用户，刷新间隔 {args.interval}s)")
+    print(f"🐢 逐条写入: {legacy:,} 条命令，{args.messages:,} 次往返，约 {legacy / seconds:,.0f} ops/s")
+    print(f"🚀 批量写入: {redis.commands:,} 条命令，{redis.round_trips:,} 次往返，约 {redis.commands / seconds:,.0f} ops/s")
+    print(f"⚡ Redis 命令减少: {legacy / max(redis.commands, 1):.1f}x  (缓冲开销 {elapsed / args.messages * 1e6:.1f}us/条)")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
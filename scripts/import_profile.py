@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+导入耗时分析脚本
+
+使用 `python -X importtime` 在子进程中导入启动模块，汇总最耗时的导入项，
+并把结果追加到 data/import_profile.jsonl，方便跟踪导入开销随时间的变化。
+"""
+
+import sys
+import json
+import argparse
+import subprocess
+from datetime import datetime
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+HISTORY_FILE = PROJECT_ROOT / "data" / "import_profile.jsonl"
+
+
+def run_importtime(modules: list) -> list:
+    """在子进程中导入模块并解析 -X importtime 输出"""
+    code = "; ".join(f"import {module}" for module in modules)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=PROJECT_ROOT, capture_output=True, text=True
+    )
+
+    if result.returncode != 0:
+        raise RuntimeError(f"导入失败:\n{result.stderr.strip().splitlines()[-1]}")
+
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        entries.append({
+            'module': name.strip(),
+            'depth': (len(name) - len(name.lstrip())) // 2,
+            'self_us': int(self_us),
+            'cumulative_us': int(cumulative_us)
+        })
+
+    return entries
+
+
+def build_report(entries: list, modules: list, top: int) -> dict:
+    """生成报告"""
+    top_level = [e for e in entries if e['depth'] == 0]
+    total_us = sum(e['cumulative_us'] for e in top_level)
+
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'modules': modules,
+        'total_ms': round(total_us / 1000, 1),
+        'module_count': len(entries),
+        'top_cumulative': [
+            {'module': e['module'], 'ms': round(e['cumulative_us'] / 1000, 1)}
+            for e in sorted(top_level, key=lambda e: e['cumulative_us'], reverse=True)[:top]
+        ],
+        'top_self': [
+            {'module': e['module'], 'ms': round(e['self_us'] / 1000, 1)}
+            for e in sorted(entries, key=lambda e: e['self_us'], reverse=True)[:top]
+        ]
+    }
+
+
+def load_previous() -> dict:
+    """读取上一次的报告"""
+    if not HISTORY_FILE.exists():
+        return {}
+
+    lines = HISTORY_FILE.read_text(encoding='utf-8').strip().splitlines()
+    return json.loads(lines[-1]) if lines else {}
+
+
+def print_report(report: dict, previous: dict):
+    """打印报告"""
+    print(f"📦 导入模块: {', '.join(report['modules'])}  (Python {report['python']})")
+
+    delta = ""
+    if previous.get('modules') == report['modules']:
+        diff = report['total_ms'] - previous['total_ms']
+        delta = f"  (较上次 {previous['timestamp']}: {diff:+.1f}ms)"
+    print(f"⏱️ 总导入耗时: {report['total_ms']:.1f}ms，共 {report['module_count']} 个模块{delta}\n")
+
+    print("🔝 顶层导入（累计耗时）:")
+    for entry in report['top_cumulative']:
+        print(f"  {entry['ms']:>8.1f}ms  {entry['module']}")
+
+    print("\n🔝 单模块自身耗时:")
+    for entry in report['top_self']:
+        print(f"  {entry['ms']:>8.1f}ms  {entry['module']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导入耗时分析")
+    parser.add_argument("modules", nargs="*", default=["main", "core.bot"], help="要导入的模块")
+    parser.add_argument("--top", type=int, default=15, help="显示前 N 项")
+    parser.add_argument("--no-save", action="store_true", help="不写入历史记录")
+    args = parser.parse_args()
+
+    try:
+        entries = run_importtime(args.modules)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    report = build_report(entries, args.modules, args.top)
+    print_report(report, load_previous())
+
+    if not args.no_save:
+        HISTORY_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with open(HISTORY_FILE, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(report, ensure_ascii=False) + "\n")
+        print(f"\n💾 已记录到 {HISTORY_FILE.relative_to(PROJECT_ROOT)}")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,439 @@
+"""
+管理面板快照服务
+"""
+
+import time
+import asyncio
+import logging
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, NamedTuple, Optional
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class Snapshot(NamedTuple):
+    """渲染好的面板快照"""
+    text: str
+    version: int
+    created_at: float
+
+    # 数据年龄的显示粒度（秒），年龄换档时面板才需要重新编辑
+    AGE_STEP = 10
+
+    @property
+    def age(self) -> float:
+        """数据年龄（秒）"""
+        return max(time.time() - self.created_at, 0.0)
+
+    @property
+    def age_bucket(self) -> int:
+        """按显示粒度取整的数据年龄档位"""
+        return int(self.age // self.AGE_STEP)
+
+    @property
+    def content_key(self) -> tuple:
+        """渲染结果的内容键：文本版本、采集时间或年龄档位变化时才变化"""
+        return (self.version, self.created_at, self.age_bucket)
+
+    def age_line(self) -> str:
+        """数据年龄提示"""
+        created = datetime.fromtimestamp(self.created_at).strftime('%H:%M:%S')
+        if self.age < self.AGE_STEP:
+            return f"🕐 **数据时间:** {created}（刚刚）"
+        return f"🕐 **数据时间:** {created}（约{self.age_bucket * self.AGE_STEP}秒前）"
+
+    def render(self) -> str:
+        """面板文本 + 数据年龄"""
+        return f"{self.text.rstrip()}\n\n    {self.age_line()}"
+
+
+class AdminSnapshotService:
+    """管理面板快照服务
+
+    后台任务每隔几秒重新采集并渲染系统状态、用户统计面板，点击时直接返回缓存，
+    多个管理员同时刷新也不会放大采集开销。面板内容变化时版本号递增。
+    """
+
+    def __init__(self, bot, interval: float = None, idle_timeout: float = None):
+        self.bot = bot
+        self.interval = interval or Config.ADMIN_SNAPSHOT_INTERVAL
+        self.idle_timeout = idle_timeout or Config.ADMIN_SNAPSHOT_IDLE
+
+        self.renderers: Dict[str, Callable[[], Awaitable[str]]] = {
+            "status": self.render_system_status,
+            "users": self.render_user_statistics,
+            "traces": self.render_traces,
+            "memory": self.render_memory,
+        }
+        self.snapshots: Dict[str, Snapshot] = {}
+        self._locks = {name: asyncio.Lock() for name in self.renderers}
+        self._task: Optional[asyncio.Task] = None
+        self.last_access = 0.0
+
+        # 缓存统计
+        self.hits = 0
+        self.misses = 0
+
+    def start(self):
+        """启动后台刷新任务"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._refresh_loop())
+            logger.info(f"📸 管理面板快照服务已启动 (间隔 {self.interval}s)")
+
+    async def stop(self):
+        """停止后台刷新任务"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def _refresh_loop(self):
+        """后台刷新循环（长时间无人查看时暂停）"""
+        while True:
+            await asyncio.sleep(self.interval)
+            if time.time() - self.last_access > self.idle_timeout:
+                continue
+
+            for name in self.renderers:
+                try:
+                    await self.refresh(name)
+                except Exception as e:
+                    logger.error(f"刷新面板快照 {name} 失败: {e}")
+
+    async def refresh(self, name: str) -> Snapshot:
+        """重新渲染指定面板"""
+        async with self._locks[name]:
+            text = await self.renderers[name]()
+            previous = self.snapshots.get(name)
+
+            if previous is not None and previous.text == text:
+                version = previous.version
+            else:
+                version = (previous.version if previous else 0) + 1
+
+            snapshot = Snapshot(text, version, time.time())
+            self.snapshots[name] = snapshot
+            return snapshot
+
+    async def get(self, name: str) -> Snapshot:
+        """获取面板快照（常数时间，首次访问时同步渲染一次）"""
+        self.last_access = time.time()
+
+        snapshot = self.snapshots.get(name)
+        if snapshot is not None and snapshot.age <= self.interval * 2:
+            self.hits += 1
+            return snapshot
+
+        # 首次访问或刷新暂停后同步渲染一次；并发请求在锁上等待同一次结果
+        self.misses += 1
+        lock = self._locks[name]
+        if lock.locked():
+            async with lock:
+                pass
+            if name in self.snapshots:
+                return self.snapshots[name]
+        return await self.refresh(name)
+
+    async def render_system_status(self) -> str:
+        """渲染系统状态面板"""
+        system_stats = self.bot.system_monitor.get_real_system_status()
+        realtime_stats = await self.bot.stats_manager.get_real_time_stats()
+        message_series = await self.bot.stats_manager.get_message_series(hours=6, step=1800)
+        redis_metrics = self.bot.stats_manager.get_connection_metrics()
+        group_filter = self.bot.group_filter.get_stats()
+
+        # 生成状态文本
+        status_text = f"""
+    📊 **实时系统状态**
+
+    {system_stats.get('status_emoji', '🔍')} **系统状态:** {system_stats.get('status', '未知')}
+
+    💻 **系统资源:**
+    • CPU使用: {system_stats.get('cpu_percent', 0):.1f}%
+    • 内存使用: {system_stats.get('memory_percent', 0):.1f}% ({system_stats.get('memory_used_gb', 0):.1f}GB/{system_stats.get('memory_total_gb', 0):.1f}GB)
+    • 磁盘使用: {system_stats.get('disk_percent', 0):.1f}% (剩余 {system_stats.get('disk_free_gb', 0):.1f}GB)
+    • 网络: ↑{system_stats.get('network_sent_rate_kb', 0):.1f}KB/s ↓{system_stats.get('network_recv_rate_kb', 0):.1f}KB/s
+    • 本进程: {system_stats.get('process_rss_mb', 0):.0f}MB, CPU {system_stats.get('process_cpu_percent', 0):.1f}%, {system_stats.get('process_threads', 0)} 线程, {system_stats.get('process_fds', 0)} 文件描述符
+
+    📊 **实时统计:**
+    • 今日消息: {realtime_stats.get('today_messages', 0):,}
+    • 今日用户: {realtime_stats.get('today_active_users', 0):,}
+    • 当前小时: {realtime_stats.get('current_hour_messages', 0):,}
+    • 在线用户: {realtime_stats.get('online_users', 0):,}
+    • 近6小时: {self._format_sparkline(message_series)}
+
+    ⚡ **性能指标:**
+    • 总请求数: {system_stats.get('total_requests', 0):,}
+    • API调用: {system_stats.get('api_calls', 0):,}
+    • 错误次数: {system_stats.get('error_count', 0):,}
+    • 错误率: {system_stats.get('error_rate', 0):.2f}%
+    • 平均响应: {system_stats.get('avg_response_time', 0):.2f}秒
+    • P95/P99: {system_stats.get('p95_response_time', 0):.2f}秒 / {system_stats.get('p99_response_time', 0):.2f}秒
+    • 群组过滤: {group_filter['filtered']:,} / {group_filter['checked']:,} 条 ({group_filter['filter_rate']:.1f}%)
+
+    🐢 **最慢处理 (5分钟 P99):**
+    {self._format_latency(self.bot.system_monitor.get_latency_report("5m"))}
+
+    🔄 **事件循环 (5分钟):**
+    {self._format_loop_lag()}
+
+    🚨 **异常检测:**
+    {self._format_anomalies()}
+
+    🔧 **服务信息:**
+    • 运行时间: {system_stats.get('uptime', '未知')}
+    • 最后错误: {system_stats.get('last_error_time', '无')}
+    • 数据源: {realtime_stats.get('data_source', '未知')}
+    • Redis: {self._format_redis_state(redis_metrics)}
+        """
+
+        # 如果有错误信息，添加到状态中
+        if 'error' in system_stats:
+            status_text += f"\n⚠️ **监控错误:** {system_stats['error']}"
+
+        return status_text
+
+    async def render_user_statistics(self) -> str:
+        """渲染用户统计面板"""
+        realtime_stats = await self.bot.stats_manager.get_real_time_stats()
+        user_stats = await self.bot.stats_manager.get_user_statistics(limit=5)
+        retention = await self.bot.stats_manager.get_retention_report()
+        leaderboards = user_stats.get('leaderboards', {})
+
+        # 生成排行榜
+        action_text = self._format_leaderboard(leaderboards.get('actions_day', []))
+        top_users_today = self._format_leaderboard(leaderboards.get('users_day', []), self._user_name)
+        top_users_week = self._format_leaderboard(leaderboards.get('users_week', []), self._user_name)
+        top_chats_week = self._format_leaderboard(leaderboards.get('chats_week', []))
+
+        stats_text = f"""
+    👥 **用户统计数据**
+
+    📊 **今日活跃:**
+    • 活跃用户: {realtime_stats.get('today_active_users', 0):,}
+    • 消息总数: {realtime_stats.get('today_messages', 0):,}
+    • 当前在线: {realtime_stats.get('online_users', 0):,}
+
+    📅 **周期活跃:**
+    • 近7天: {realtime_stats.get('week_active_users', 0):,}
+    • 近30天: {realtime_stats.get('month_active_users', 0):,}
+
+    🔁 **留存 (位图精确值):**
+    • 日活/周活/月活: {retention.get('dau', 0):,} / {retention.get('wau', 0):,} / {retention.get('mau', 0):,}
+    {self._format_retention(retention.get('retention', {}))}
+
+    💬 **聊天类型分布:**
+    {self._format_chat_types(realtime_stats.get('chat_types', {}))}
+
+    🏆 **最活跃用户 (今日):**
+    {top_users_today}
+
+    🏆 **最活跃用户 (本周):**
+    {top_users_week}
+
+    👥 **最活跃群组 (本周):**
+    {top_chats_week}
+
+    🎯 **热门功能 (今日):**
+    {action_text}
+
+    📈 **总体数据:**
+    • 注册用户: {user_stats.get('total_registered_users', 0):,}
+    • 数据源: {realtime_stats.get('data_source', '未知')}
+        """
+
+        return stats_text
+
+    async def render_traces(self) -> str:
+        """渲染链路追踪面板"""
+        tracer = self.bot.tracer
+        stats = tracer.get_stats()
+
+        traces_text = f"""
+    🔍 **消息处理链路追踪**
+
+    • 采样率: {stats['sample_rate'] * 100:g}%
+    • 已采样: {stats['sampled']:,} / {stats['started']:,} 次请求
+    • 缓冲: 最近 {stats['buffered']} 条
+
+    ⏱️ **阶段耗时 (P50 / P95 / 占比):**
+    {self._format_stages(tracer.stage_summary())}
+
+    🐢 **最慢请求:**
+    {self._format_slow_traces(tracer.slowest(5))}
+        """
+
+        return traces_text
+
+    async def render_memory(self) -> str:
+        """渲染内存诊断面板"""
+        diagnostics = self.bot.memory_diagnostics
+        await diagnostics.ensure_measured()
+        stats = diagnostics.get_stats()
+        system_stats = self.bot.system_monitor.get_real_system_status()
+        measured = datetime.fromtimestamp(stats['measured_at']).strftime('%H:%M:%S')
+
+        if stats['tracing']:
+            tracing_text = (f"🟢 追踪中，已追踪 {stats['traced_bytes'] / 1024 ** 2:.1f}MB "
+                            f"(峰值 {stats['traced_peak_bytes'] / 1024 ** 2:.1f}MB)，快照 {stats['snapshots']} 个")
+        else:
+            tracing_text = "⚪ 未开启（拍摄快照时自动开启）"
+
+        memory_text = f"""
+    🧠 **内存诊断**
+
+    • 进程常驻内存: {system_stats.get('process_rss_mb', 0):.0f}MB
+
+    📦 **进程内结构 ({measured} 统计，耗时 {stats['measure_seconds'] * 1000:.0f}ms):**
+    {self._format_structures(diagnostics.sizes)}
+
+    🔬 **tracemalloc:**
+    {tracing_text}
+        """
+
+        return memory_text
+
+    async def render_memory_diff(self) -> str:
+        """渲染最近两次 tracemalloc 快照的对比"""
+        diagnostics = self.bot.memory_diagnostics
+        if diagnostics.get_stats()['snapshots'] < 2:
+            return "🔬 至少需要两次快照才能对比，请先拍摄快照"
+
+        lines = [
+            f"• `{item['location']}`: {item['size_diff'] / 1024:+.1f}KB ({item['count_diff']:+,} 个对象)"
+            for item in await diagnostics.diff()
+        ]
+        return "🔬 **快照对比 (按分配位置):**\n\n" + ("\n".join(lines) or "两次快照之间没有变化")
+
+    def _format_structures(self, sizes: list) -> str:
+        """格式化各结构的大小和条目数"""
+        lines = [
+            f"• {item.name}: {item.bytes / 1024:,.0f}KB" + (f" ({item.entries:,} 条)" if item.entries is not None else "")
+            + (" ⚠️ 未更新" if item.stale else "")
+            for item in sizes
+        ]
+        return "\n".join(lines) or "暂无数据"
+
+    def _format_stages(self, summary: list, limit: int = 10) -> str:
+        """格式化各阶段耗时分布"""
+        lines = [
+            f"• {item['name']}: {item['p50'] * 1000:.0f}ms / {item['p95'] * 1000:.0f}ms / {item['share'] * 100:.0f}%"
+            for item in summary[:limit]
+        ]
+        return "\n".join(lines) or "暂无数据"
+
+    def _format_slow_traces(self, traces: list) -> str:
+        """格式化最慢的几次请求（每条列出耗时最长的三个阶段）"""
+        if not traces:
+            return "暂无数据"
+
+        lines = []
+        for trace in traces:
+            started = datetime.fromtimestamp(trace.root.start_ns / 1e9).strftime('%H:%M:%S')
+            stages = sorted(trace.stages(), key=lambda stage: stage.duration, reverse=True)[:3]
+            breakdown = ", ".join(f"{stage.name} {stage.duration * 1000:.0f}ms" for stage in stages)
+            error = " ❌" if trace.error else ""
+            lines.append(f"• {trace.duration * 1000:.0f}ms {started}{error} — {breakdown or '无阶段'}")
+        return "\n".join(lines)
+
+    def _format_retention(self, retention: dict) -> str:
+        """格式化第 N 日留存"""
+        if not retention:
+            return "暂无数据"
+
+        return "\n".join(
+            f"• {n}日留存: {item['rate'] * 100:.1f}% ({item['retained']:,}/{item['cohort_size']:,})"
+            for n, item in retention.items()
+        )
+
+    def _format_leaderboard(self, entries: list, label=None) -> str:
+        """格式化排行榜，label 用于把成员 ID 转换为显示名称"""
+        if not entries:
+            return "暂无数据"
+
+        return "\n".join(
+            f"{rank}. {label(member) if label else member}: {count:,}"
+            for rank, (member, count) in enumerate(entries, 1)
+        )
+
+    def _user_name(self, user_id: str) -> str:
+        """用户显示名称（未注册的用户显示 ID）"""
+        user = self.bot.user_service.users_data.get(str(user_id), {})
+        return user.get('first_name') or user.get('username') or str(user_id)
+
+    def _format_chat_types(self, chat_types: dict) -> str:
+        """格式化聊天类型统计"""
+        if not chat_types:
+            return "暂无数据"
+
+        total = sum(int(count) for count in chat_types.values())
+        if total == 0:
+            return "暂无数据"
+
+        formatted = []
+        for chat_type, count in chat_types.items():
+            percentage = (int(count) / total) * 100
+            emoji = "💬" if chat_type == "private" else "👥"
+            formatted.append(f"{emoji} {chat_type}: {count} ({percentage:.1f}%)")
+
+        return "\n".join(formatted)
+
+    def _format_latency(self, report: dict, limit: int = 5) -> str:
+        """格式化各处理器/上游的延迟分位数"""
+        lines = [
+            f"• {name}: P50 {stats['p50']:.2f}s / P99 {stats['p99']:.2f}s ({stats['count']:,}次)"
+            for name, stats in report.items() if name != "all"
+        ][:limit]
+        return "\n".join(lines) or "暂无数据"
+
+    def _format_loop_lag(self, limit: int = 3) -> str:
+        """格式化事件循环调度延迟和最近的阻塞"""
+        if not Config.LOOP_MONITOR_ENABLED:
+            return "未启用"
+        stats = self.bot.loop_monitor.get_stats("5m")
+        lines = [
+            f"• 调度延迟: P50 {stats['p50'] * 1000:.1f}ms / P99 {stats['p99'] * 1000:.1f}ms / 最大 {stats['max'] * 1000:.0f}ms",
+            f"• 阻塞次数: {stats['slow_count']:,}"
+        ]
+        lines += [
+            f"• {item['time']} 阻塞 {item['duration'] * 1000:.0f}ms: `{item['location']}`"
+            for item in stats['recent_slow'][:limit]
+        ]
+        return "\n".join(lines)
+
+    def _format_anomalies(self) -> str:
+        """格式化各指标的当前值与基线"""
+        if not Config.ANOMALY_ALERTS_ENABLED:
+            return "未启用"
+        stats = self.bot.anomaly_detector.get_stats()
+        lines = [
+            f"• {'🔴' if item['active'] else '🟢'} {item['label']}: {item['value']}（基线 {item['expected']}）"
+            for item in stats['signals']
+        ]
+        lines.append(f"• 累计告警: {stats['alerts_fired']:,} 次")
+        return "\n".join(lines)
+
+    def _format_redis_state(self, metrics: dict) -> str:
+        """格式化 Redis 连接状态"""
+        state = metrics.get('redis_state')
+        if state == 'connected':
+            return f"🟢 已连接（累计中断 {metrics.get('redis_outage_count', 0)} 次）"
+        if state == 'disconnected':
+            return (f"🔴 已断开 {metrics.get('redis_outage_seconds', 0):.0f}秒，"
+                    f"缓冲 {metrics.get('buffered_keys', 0):,} 个键待回放")
+        return "⚪ 未启用"
+
+    def _format_sparkline(self, series: list) -> str:
+        """把时间序列格式化为迷你趋势图"""
+        values = [value for _, value in series]
+        if not values or not any(values):
+            return "暂无数据"
+
+        bars = "▁▂▃▄▅▆▇█"
+        peak = max(values)
+        line = "".join(bars[min(int(value / peak * (len(bars) - 1) + 0.5), len(bars) - 1)] for value in values)
+        return f"{line} (峰值 {int(peak):,}/30分钟)"
\ No newline at end of file
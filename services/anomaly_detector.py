@@ -0,0 +1,302 @@
+"""
+性能异常检测与告警服务
+"""
+
+import math
+import time
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Signal(NamedTuple):
+    """一个被检测的指标"""
+    name: str
+    label: str
+    fmt: str
+    direction: str  # up 只检测升高，both 升高和下降都检测
+    min_delta: float  # 偏离基线的最小绝对值，避免基线很平稳时微小波动触发告警
+    min_ratio: float  # 偏离基线的最小比例
+    seasonal: bool = False  # 是否按一天中的小时维护季节性基线
+
+
+SIGNALS = (
+    Signal("request_rate", "请求速率", "{:.0f}次/分钟", "both", 5.0, 0.5, seasonal=True),
+    Signal("p95_latency", "P95 延迟", "{:.2f}秒", "up", 0.5, 0.5),
+    Signal("error_rate", "错误率", "{:.1%}", "up", 0.05, 0.0),
+    Signal("upstream_429_rate", "上游 429 比例", "{:.1%}", "up", 0.05, 0.0),
+)
+
+
+class Ewma:
+    """指数加权移动平均和方差"""
+
+    __slots__ = ("mean", "var", "count")
+
+    def __init__(self):
+        self.mean = 0.0
+        self.var = 0.0
+        self.count = 0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.var)
+
+    def update(self, value: float, alpha: float):
+        if self.count == 0:
+            self.mean = value
+        else:
+            diff = value - self.mean
+            increment = alpha * diff
+            self.mean += increment
+            self.var = (1 - alpha) * (self.var + diff * increment)
+        self.count += 1
+
+
+class SignalState:
+    """单个指标的基线和告警状态"""
+
+    def __init__(self, signal: Signal):
+        self.signal = signal
+        self.baseline = Ewma()
+        self.hourly = [Ewma() for _ in range(24)] if signal.seasonal else None
+
+        self.value: Optional[float] = None
+        self.expected: Optional[float] = None
+        self.zscore = 0.0
+        self.breaches = 0  # 连续异常次数
+        self.normals = 0  # 连续正常次数
+        self.active = False
+        self.since = 0.0
+        self.notified_at = 0.0
+
+    def baseline_for(self, hour: int, warmup: int) -> Optional[Ewma]:
+        """可用的基线：季节性基线积累足够后优先使用，否则用全局基线，都不够时为 None"""
+        if self.hourly is not None and self.hourly[hour].count >= warmup:
+            return self.hourly[hour]
+        return self.baseline if self.baseline.count >= warmup else None
+
+    def update(self, value: float, hour: int, alpha: float):
+        self.baseline.update(value, alpha)
+        if self.hourly is not None:
+            self.hourly[hour].update(value, alpha)
+
+
+class AnomalyDetector:
+    """请求速率、P95 延迟、错误率、上游 429 比例的异常检测
+
+    后台任务每隔 interval 秒从 SystemMonitor 的累计计数器取差值得到本周期的指标，
+    与 EWMA 基线比较（请求速率另外按一天中的小时维护季节性基线），偏离超过
+    z_threshold 个标准差且超过最小偏离量时记为一次异常。连续 trigger_count 次
+    异常才告警、连续 trigger_count 次正常才恢复；告警期间基线以 1/10 的权重更新，
+    异常值不会迅速污染基线，持续的水平变化最终也会被接受。
+
+    同一指标告警期间不重复通知，只每隔 reminder_interval 秒提醒一次；所有通知
+    合并成一条消息，每小时最多发送 max_alerts_per_hour 条。
+    """
+
+    def __init__(self, monitor, notify: Callable[[str], Awaitable[None]], interval: float = 60.0,
+                 z_threshold: float = 4.0, alpha: float = 0.05, warmup: int = 30, trigger_count: int = 3,
+                 min_samples: int = 20, reminder_interval: float = 3600.0, max_alerts_per_hour: int = 6):
+        self.monitor = monitor
+        self.notify = notify
+        self.interval = interval
+        self.z_threshold = z_threshold
+        self.alpha = alpha
+        self.warmup = warmup
+        self.trigger_count = trigger_count
+        self.min_samples = min_samples
+        self.reminder_interval = reminder_interval
+        self.max_alerts_per_hour = max_alerts_per_hour
+
+        self.states: Dict[str, SignalState] = {signal.name: SignalState(signal) for signal in SIGNALS}
+        self.alerts_fired = 0
+        self.notifications_sent = 0
+        self.suppressed = 0  # 因频率限制未发送、尚未报告的通知数
+        self._sent_times = deque()
+        self._last = None  # 上次检查时的 (时间, 请求数, 错误数, 上游响应数, 上游 429 数)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """启动后台检测任务"""
+        if self._task is None or self._task.done():
+            self._last = self._counters(time.time())
+            self._task = asyncio.create_task(self._check_loop())
+            logger.info(f"🚨 异常检测已启动 (检测间隔 {self.interval}s, 阈值 {self.z_threshold}σ)")
+
+    async def stop(self):
+        """停止后台检测任务"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def _check_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check()
+            except Exception as e:
+                logger.error(f"异常检测失败: {e}")
+
+    def _counters(self, now: float) -> tuple:
+        monitor = self.monitor
+        responses = throttled = 0
+        for (_, status), count in list(monitor.upstream_status.items()):
+            responses += count
+            if status == "429":
+                throttled += count
+        return now, monitor.request_count, monitor.error_count, responses, throttled
+
+    def _observe(self, now: float) -> Dict[str, Optional[float]]:
+        """本周期的指标值（样本不足的指标为 None）"""
+        current = self._counters(now)
+        last, self._last = self._last or current, current
+        elapsed = current[0] - last[0]
+        if elapsed <= 0:
+            return {}
+
+        requests = current[1] - last[1]
+        errors = current[2] - last[2]
+        responses = current[3] - last[3]
+        throttled = current[4] - last[4]
+        # 1 分钟滑动窗口直方图（检测间隔与窗口相近时即为本周期的 P95）
+        latency = self.monitor.get_latency_stats("all", "1m")
+
+        return {
+            'request_rate': requests * 60 / elapsed,
+            'p95_latency': latency['p95'] if latency['count'] >= self.min_samples else None,
+            'error_rate': errors / requests if requests >= self.min_samples else None,
+            'upstream_429_rate': throttled / responses if responses >= self.min_samples else None
+        }
+
+    def evaluate(self, now: Optional[float] = None) -> Dict[str, List[SignalState]]:
+        """检测一个周期，返回新触发、已恢复和需要提醒的指标"""
+        now = now if now is not None else time.time()
+        hour = datetime.fromtimestamp(now).hour
+        result = {'fired': [], 'recovered': [], 'reminders': []}
+
+        for name, value in self._observe(now).items():
+            if value is None:
+                continue
+            state = self.states[name]
+            signal = state.signal
+
+            anomalous = False
+            baseline = state.baseline_for(hour, self.warmup)
+            if baseline is not None:
+                deviation = value - baseline.mean
+                if signal.direction == "up":
+                    deviation = max(deviation, 0.0)
+                std = baseline.std
+                state.zscore = deviation / std if std > 0 else (math.inf if deviation else 0.0)
+                min_deviation = max(signal.min_delta, signal.min_ratio * abs(baseline.mean))
+                anomalous = abs(state.zscore) >= self.z_threshold and abs(deviation) >= min_deviation
+                state.expected = baseline.mean
+            state.value = value
+
+            if anomalous:
+                state.breaches += 1
+                state.normals = 0
+            else:
+                state.normals += 1
+                state.breaches = 0
+
+            if not state.active and state.breaches >= self.trigger_count:
+                state.active = True
+                state.since = now
+                self.alerts_fired += 1
+                result['fired'].append(state)
+            elif state.active and state.normals >= self.trigger_count:
+                state.active = False
+                result['recovered'].append(state)
+            elif state.active and now - state.notified_at >= self.reminder_interval:
+                result['reminders'].append(state)
+
+            state.update(value, hour, self.alpha / 10 if anomalous or state.active else self.alpha)
+
+        return result
+
+    async def check(self, now: Optional[float] = None):
+        """检测一个周期并发送通知"""
+        now = now if now is not None else time.time()
+        result = self.evaluate(now)
+        for state in result['fired']:
+            logger.warning(f"🚨 性能异常: {self._describe(state)}")
+        for state in result['recovered']:
+            logger.info(f"✅ 性能恢复: {state.signal.label} (持续 {self._duration(now - state.since)})")
+
+        text = self._format(result, now)
+        if text:
+            await self._send(text, now, [*result['fired'], *result['reminders']])
+
+    async def _send(self, text: str, now: float, notified: List[SignalState]):
+        """发送通知（每小时最多 max_alerts_per_hour 条）"""
+        while self._sent_times and now - self._sent_times[0] >= 3600:
+            self._sent_times.popleft()
+        if len(self._sent_times) >= self.max_alerts_per_hour:
+            self.suppressed += 1
+            logger.warning("🚨 告警通知超过频率限制，本次未发送")
+            return
+
+        if self.suppressed:
+            text += f"\n\n_（此前有 {self.suppressed} 条通知因频率限制未发送）_"
+        self._sent_times.append(now)
+        self.suppressed = 0
+        self.notifications_sent += 1
+        for state in notified:
+            state.notified_at = now
+        await self.notify(text)
+
+    def _format(self, result: Dict[str, List[SignalState]], now: float) -> str:
+        sections = []
+        if result['fired']:
+            lines = [f"• {self._describe(state)}" for state in result['fired']]
+            sections.append("🚨 **性能异常告警**\n" + "\n".join(lines))
+        if result['reminders']:
+            lines = [f"• {self._describe(state)}，已持续 {self._duration(now - state.since)}"
+                     for state in result['reminders']]
+            sections.append("⏰ **异常仍在持续**\n" + "\n".join(lines))
+        if result['recovered']:
+            lines = [
+                f"• {state.signal.label}: {state.signal.fmt.format(state.value)}（持续 {self._duration(now - state.since)}）"
+                for state in result['recovered']
+            ]
+            sections.append("✅ **已恢复正常**\n" + "\n".join(lines))
+        return "\n\n".join(sections)
+
+    @staticmethod
+    def _describe(state: SignalState) -> str:
+        fmt = state.signal.fmt
+        return (f"{state.signal.label}: {fmt.format(state.value)}"
+                f"（基线 {fmt.format(state.expected)}，偏离 {state.zscore:.1f}σ）")
+
+    @staticmethod
+    def _duration(seconds: float) -> str:
+        if seconds < 3600:
+            return f"{seconds / 60:.0f}分钟"
+        return f"{seconds / 3600:.1f}小时"
+
+    def get_stats(self) -> Dict:
+        """各指标的当前值、基线和告警状态"""
+        return {
+            'signals': [
+                {
+                    'name': state.signal.name,
+                    'label': state.signal.label,
+                    'value': state.signal.fmt.format(state.value) if state.value is not None else "-",
+                    'expected': state.signal.fmt.format(state.expected) if state.expected is not None else "学习中",
+                    'active': state.active
+                }
+                for state in self.states.values()
+            ],
+            'alerts_fired': self.alerts_fired,
+            'notifications_sent': self.notifications_sent
+        }
\ No newline at end of file
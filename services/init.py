@@ -4,11 +4,31 @@ from .user_service import UserService
 from .media_service import MediaService
 from .system_monitor import SystemMonitor
 from .realtime_stats import RealTimeStatsManager
+from .admin_snapshots import AdminSnapshotService
+from .timeseries import TimeSeriesStore
+from .retention import RetentionTracker
+from .metrics_exporter import MetricsExporter
+from .system_sampler import SystemSampler
+from .trace_exporter import OTLPFileExporter
+from .loop_monitor import LoopMonitor
+from .profiler import SamplingProfiler
+from .memory_diagnostics import MemoryDiagnostics
+from .anomaly_detector import AnomalyDetector
 
 __all__ = [
     'OpenAIService',
     'UserService',
     'MediaService',
     'SystemMonitor',
-    'RealTimeStatsManager'
+    'RealTimeStatsManager',
+    'AdminSnapshotService',
+    'TimeSeriesStore',
+    'RetentionTracker',
+    'MetricsExporter',
+    'SystemSampler',
+    'OTLPFileExporter',
+    'LoopMonitor',
+    'SamplingProfiler',
+    'MemoryDiagnostics',
+    'AnomalyDetector'
 ]
\ No newline at end of file
@@ -0,0 +1,169 @@
+"""
+事件循环延迟监控服务
+"""
+
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+from utils.histogram import LatencyHistogram, RollingHistogram
+from services.system_monitor import LATENCY_WINDOWS
+
+logger = logging.getLogger(__name__)
+
+# 项目根目录，用于在调用栈中定位项目自己的代码
+PROJECT_ROOT = str(Path(__file__).resolve().parent.parent)
+
+
+class SlowCallback(NamedTuple):
+    """一次事件循环阻塞"""
+    detected_at: float
+    duration: float  # 阻塞时长（秒）
+    location: str  # 调用栈中最内层的项目代码位置
+    stack: List[str]
+
+
+class LoopMonitor:
+    """事件循环延迟探针和慢回调检测器
+
+    探针任务每隔 tick 秒 sleep 一次，实际唤醒时间与预期的差值就是调度延迟，
+    记入滑动窗口直方图。看门狗线程检查探针的心跳，超过 tick + slow_threshold
+    没有更新说明事件循环正被某个回调阻塞，此时抓取事件循环线程的调用栈；
+    探针恢复后把实际阻塞时长和调用栈一起记录下来。
+    """
+
+    def __init__(self, tick: float = 0.1, slow_threshold: float = 0.1, max_reports: int = 20,
+                 stack_depth: int = 30):
+        self.tick = tick
+        self.slow_threshold = slow_threshold
+        self.stack_depth = stack_depth
+
+        self.lag: Dict[str, RollingHistogram] = {
+            window: RollingHistogram(seconds, slots)
+            for window, (seconds, slots) in LATENCY_WINDOWS.items()
+        }
+        self.lag_total = LatencyHistogram()  # 启动以来的累计直方图（Prometheus 导出）
+        self.max_lag = 0.0
+        self.slow_callbacks = deque(maxlen=max_reports)
+        self.slow_count = 0
+
+        self._beat = 0.0  # 探针最近一次开始等待的时间（monotonic）
+        self._captured = None  # 看门狗抓到的 (心跳, 调用栈)
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self):
+        """启动探针任务和看门狗线程（需在事件循环中调用）"""
+        if self._task is not None and not self._task.done():
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._task = asyncio.create_task(self._probe())
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watchdog, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info(f"⏱️ 事件循环监控已启动 (探测间隔 {self.tick}s, 阻塞阈值 {self.slow_threshold}s)")
+
+    async def stop(self):
+        """停止探针任务和看门狗线程"""
+        self._stop.set()
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        if self._thread is not None:
+            await asyncio.to_thread(self._thread.join, 2)
+            self._thread = None
+
+    async def _probe(self):
+        while True:
+            started = time.monotonic()
+            self._beat = started
+            await asyncio.sleep(self.tick)
+            lag = max(time.monotonic() - started - self.tick, 0.0)
+            self._record_lag(lag)
+            if lag >= self.slow_threshold:
+                self._record_slow_callback(started, lag)
+
+    def _record_lag(self, lag: float):
+        now = time.time()
+        index = self.lag_total.index_of(lag)
+        self.lag_total.record_index(index, lag)
+        for histogram in self.lag.values():
+            histogram.record(lag, now, index)
+        if lag > self.max_lag:
+            self.max_lag = lag
+
+    def _record_slow_callback(self, beat: float, lag: float):
+        captured = self._captured
+        self._captured = None
+        if captured is not None and captured[0] == beat:
+            stack = captured[1]
+        else:
+            # 阻塞时间太短，看门狗没来得及抓到调用栈
+            stack = []
+
+        report = SlowCallback(time.time() - lag, lag, self._locate(stack), stack)
+        self.slow_callbacks.append(report)
+        self.slow_count += 1
+        logger.warning(f"🐢 事件循环阻塞 {lag * 1000:.0f}ms: {report.location}\n{''.join(stack)}")
+
+    def _watchdog(self):
+        """看门狗线程：探针心跳超时时抓取事件循环线程的调用栈"""
+        interval = min(self.tick, self.slow_threshold) / 2
+        while not self._stop.wait(interval):
+            beat = self._beat
+            if time.monotonic() - beat < self.tick + self.slow_threshold:
+                continue
+            captured = self._captured
+            if captured is not None and captured[0] == beat:
+                continue  # 同一次阻塞只抓一次
+
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None:
+                self._captured = (beat, traceback.format_stack(frame, limit=self.stack_depth))
+                del frame
+
+    @staticmethod
+    def _locate(stack: List[str]) -> str:
+        """调用栈中最内层的项目代码（不含第三方库）"""
+        for entry in reversed(stack):
+            line = entry.strip().splitlines()[0]
+            if PROJECT_ROOT in line and "site-packages" not in line:
+                return line.replace(PROJECT_ROOT + "/", "")
+        return stack[-1].strip().splitlines()[0] if stack else "未知（未抓到调用栈）"
+
+    def get_stats(self, window: str = "5m") -> Dict:
+        """窗口内的调度延迟统计（秒）和最近的阻塞记录"""
+        histogram = self.lag[window].snapshot()
+        percentiles = histogram.percentiles([0.5, 0.99])
+        return {
+            'count': histogram.total,
+            'mean': histogram.mean,
+            'p50': percentiles[0.5],
+            'p99': percentiles[0.99],
+            'max': histogram.max(),
+            'max_lag': self.max_lag,
+            'slow_count': self.slow_count,
+            'recent_slow': [
+                {
+                    'time': datetime.fromtimestamp(report.detected_at).strftime('%H:%M:%S'),
+                    'duration': report.duration,
+                    'location': report.location
+                }
+                for report in reversed(self.slow_callbacks)
+            ]
+        }
\ No newline at end of file
@@ -0,0 +1,256 @@
+"""
+内存诊断服务
+"""
+
+import sys
+import time
+import asyncio
+import logging
+import tracemalloc
+from collections import deque
+from pathlib import Path
+from types import BuiltinFunctionType, FunctionType, MethodType, ModuleType
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# 项目根目录，分配位置的文件路径相对于它显示
+PROJECT_ROOT = str(Path(__file__).resolve().parent.parent)
+
+_ATOMIC = (str, bytes, bytearray, int, float, bool, type(None))
+_SKIPPED = (type, ModuleType, FunctionType, MethodType, BuiltinFunctionType)
+
+# 快照对比时排除的分配位置（追踪器自身和导入系统）
+_TRACE_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def deep_sizeof(obj) -> int:
+    """对象及其引用的全部容器、实例属性的总字节数
+
+    同一对象只计一次；类、模块、函数不计入。小整数、驻留字符串等共享对象
+    也会被计入，结果是上界估计，用于观察增长趋势。
+    """
+    seen = set()
+    size = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or isinstance(item, _SKIPPED):
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+
+        if isinstance(item, _ATOMIC):
+            continue
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset, deque)):
+            stack.extend(item)
+        else:
+            attributes = getattr(item, "__dict__", None)
+            if attributes is not None:
+                stack.append(attributes)
+            for slot in getattr(type(item), "__slots__", ()):
+                value = getattr(item, slot, None)
+                if value is not None:
+                    stack.append(value)
+    return size
+
+
+def _shallow_copy(obj):
+    """复制容器的顶层（元组逐个元素复制），其他对象原样返回"""
+    if isinstance(obj, tuple):
+        return tuple(_shallow_copy(item) for item in obj)
+    if isinstance(obj, (dict, list, set, deque)):
+        return obj.copy()
+    return obj
+
+
+class StructureSize(NamedTuple):
+    """一个内存结构的大小"""
+    name: str
+    bytes: int
+    entries: Optional[int]  # 不支持 len() 的结构为 None
+    stale: bool = False  # 本轮统计失败，沿用上一轮的结果
+
+
+class MemoryDiagnostics:
+    """内存诊断：已注册结构的大小统计 + tracemalloc 快照对比
+
+    各服务把自己的进程内数据结构以 (名称, 取值函数) 注册进来，后台任务每隔
+    interval 秒统计一次每个结构的深度大小和条目数，管理面板和 Prometheus
+    读取最近一次的结果。取值和顶层容器的浅拷贝在事件循环中完成，深度遍历
+    在线程中进行；某个结构统计失败时沿用上一轮的结果并标记为过期。tracemalloc 只在管理员拍摄快照时开启，
+    对比两次快照即可按分配位置找出内存增长来源。
+    """
+
+    def __init__(self, interval: float = 300.0, trace_frames: int = 10, max_snapshots: int = 5):
+        self.interval = interval
+        self.trace_frames = trace_frames
+
+        self.structures: Dict[str, Callable[[], object]] = {}
+        self.sizes: List[StructureSize] = []
+        self.measured_at = 0.0
+        self.measure_seconds = 0.0
+
+        self.snapshots = deque(maxlen=max_snapshots)  # (拍摄时间, 快照)
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, name: str, getter: Callable[[], object]):
+        """注册一个需要统计的结构（getter 返回结构本身）"""
+        self.structures[name] = getter
+
+    # ------------------------------------------------------------------
+    # 结构大小
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """启动后台统计任务"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._measure_loop())
+            logger.info(f"🧠 内存诊断已启动 (统计间隔 {self.interval}s, {len(self.structures)} 个结构)")
+
+    async def stop(self):
+        """停止后台统计任务"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    @property
+    def running(self) -> bool:
+        """定时统计任务是否在运行"""
+        return self._task is not None and not self._task.done()
+
+    async def ensure_measured(self) -> List[StructureSize]:
+        """最近一次统计结果；从未统计过，或定时统计未运行且结果已超过一个统计间隔时当场统计"""
+        if not self.measured_at or (not self.running and time.time() - self.measured_at >= self.interval):
+            await self.measure()
+        return self.sizes
+
+    async def _measure_loop(self):
+        while True:
+            try:
+                await self.measure()
+            except Exception as e:
+                logger.error(f"统计内存结构失败: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def measure(self) -> List[StructureSize]:
+        """统计所有已注册结构（深度遍历在线程中进行，不阻塞事件循环）"""
+        started = time.perf_counter()
+        structures = self._collect()
+        sizes = await asyncio.to_thread(self._measure, structures)
+
+        # 统计失败的结构沿用上一轮的结果，标记为过期而不是从列表中消失
+        previous = {item.name: item for item in self.sizes}
+        measured = {item.name for item in sizes}
+        sizes += [
+            previous[name]._replace(stale=True)
+            for name in self.structures if name not in measured and name in previous
+        ]
+        sizes.sort(key=lambda item: item.bytes, reverse=True)
+
+        self.sizes = sizes
+        self.measured_at = time.time()
+        self.measure_seconds = time.perf_counter() - started
+        return self.sizes
+
+    def _collect(self) -> Dict[str, object]:
+        """在事件循环中取出各结构并浅拷贝顶层容器，线程遍历时不会与事件循环的修改冲突"""
+        structures = {}
+        for name, getter in self.structures.items():
+            try:
+                structures[name] = _shallow_copy(getter())
+            except Exception as e:
+                logger.warning(f"获取结构 {name} 失败: {e}")
+        return structures
+
+    @staticmethod
+    def _measure(structures: Dict[str, object]) -> List[StructureSize]:
+        sizes = []
+        for name, structure in structures.items():
+            try:
+                entries = len(structure) if hasattr(structure, "__len__") else None
+                sizes.append(StructureSize(name, deep_sizeof(structure), entries))
+            except Exception as e:
+                # 深层的容器仍可能在遍历期间被修改，本轮跳过（沿用上一轮的结果）
+                logger.warning(f"统计结构 {name} 失败: {e}")
+        return sizes
+
+    # ------------------------------------------------------------------
+    # tracemalloc 快照
+    # ------------------------------------------------------------------
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    async def take_snapshot(self) -> int:
+        """拍摄一次快照（首次调用时开启 tracemalloc，之前的分配不会被记录）"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.trace_frames)
+            self.snapshots.clear()
+            logger.info(f"🧠 tracemalloc 已开启 (保留 {self.trace_frames} 层调用栈)")
+
+        snapshot = await asyncio.to_thread(lambda: tracemalloc.take_snapshot().filter_traces(_TRACE_FILTERS))
+        self.snapshots.append((time.time(), snapshot))
+        return len(self.snapshots)
+
+    def stop_tracing(self):
+        """关闭 tracemalloc 并丢弃快照（追踪期间内存分配会明显变慢）"""
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+            logger.info("🧠 tracemalloc 已关闭")
+        self.snapshots.clear()
+
+    async def diff(self, limit: int = 10) -> List[Dict]:
+        """对比最近两次快照，按分配位置列出增长最多的地方"""
+        if len(self.snapshots) < 2:
+            return []
+
+        (_, old), (_, new) = self.snapshots[-2], self.snapshots[-1]
+        stats = await asyncio.to_thread(new.compare_to, old, "lineno")
+        return [
+            {
+                'location': self._location(stat.traceback[0]),
+                'size_diff': stat.size_diff,
+                'count_diff': stat.count_diff,
+                'size': stat.size
+            }
+            for stat in stats[:limit] if stat.size_diff
+        ]
+
+    @staticmethod
+    def _location(frame) -> str:
+        filename = frame.filename
+        if filename.startswith(PROJECT_ROOT):
+            filename = filename[len(PROJECT_ROOT) + 1:]
+        else:
+            # 标准库和第三方库只保留最后两级路径
+            filename = "/".join(Path(filename).parts[-2:])
+        return f"{filename}:{frame.lineno}"
+
+    def get_stats(self) -> Dict:
+        """诊断状态"""
+        traced, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+        return {
+            'structures': len(self.structures),
+            'stale_structures': sum(item.stale for item in self.sizes),
+            'measured_at': self.measured_at,
+            'measure_seconds': self.measure_seconds,
+            'tracing': tracemalloc.is_tracing(),
+            'traced_bytes': traced,
+            'traced_peak_bytes': peak,
+            'snapshots': len(self.snapshots),
+            'last_snapshot_at': self.snapshots[-1][0] if self.snapshots else 0.0
+        }
\ No newline at end of file
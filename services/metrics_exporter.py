@@ -0,0 +1,365 @@
+"""
+Prometheus 指标导出服务
+"""
+
+import time
+import asyncio
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utils.decorators import rate_limiter_stats
+from utils.log_pipeline import log_pipeline
+
+logger = logging.getLogger(__name__)
+
+# 累计延迟直方图的桶上界（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = Dict[str, str]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class MetricsWriter:
+    """Prometheus 文本格式（0.0.4）构造器"""
+
+    def __init__(self, prefix: str = "tgbot"):
+        self.prefix = prefix
+        self.lines: List[str] = []
+
+    def _sample(self, name: str, labels: Optional[Labels], value: float):
+        if labels:
+            label_text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+            self.lines.append(f"{name}{{{label_text}}} {_format_value(value)}")
+        else:
+            self.lines.append(f"{name} {_format_value(value)}")
+
+    def metric(self, name: str, kind: str, help_text: str, samples: Iterable[Tuple[Optional[Labels], float]]):
+        """写入一个计数器（counter）或仪表（gauge）"""
+        full_name = f"{self.prefix}_{name}"
+        self.lines.append(f"# HELP {full_name} {help_text}")
+        self.lines.append(f"# TYPE {full_name} {kind}")
+        for labels, value in samples:
+            self._sample(full_name, labels, value)
+
+    def histogram(self, name: str, help_text: str, series: Iterable[Tuple[Labels, object]]):
+        """写入直方图，series 为 (标签, LatencyHistogram)"""
+        full_name = f"{self.prefix}_{name}"
+        self.lines.append(f"# HELP {full_name} {help_text}")
+        self.lines.append(f"# TYPE {full_name} histogram")
+        for labels, histogram in series:
+            for bound, count in zip(LATENCY_BUCKETS, histogram.cumulative(LATENCY_BUCKETS)):
+                self._sample(f"{full_name}_bucket", {**labels, "le": _format_value(bound)}, count)
+            self._sample(f"{full_name}_bucket", {**labels, "le": "+Inf"}, histogram.total)
+            self._sample(f"{full_name}_sum", labels, histogram.sum)
+            self._sample(f"{full_name}_count", labels, histogram.total)
+
+    def render(self) -> bytes:
+        return ("\n".join(self.lines) + "\n").encode("utf-8")
+
+
+class MetricsExporter:
+    """内置的 Prometheus /metrics 导出器
+
+    只读取各服务已经聚合好的计数器和直方图，请求处理路径上没有额外开销；
+    尚未创建的服务直接跳过，抓取不会触发服务初始化。渲染结果缓存
+    min_interval 秒，HTTP 服务基于 asyncio.start_server，不阻塞事件循环。
+    """
+
+    def __init__(self, bot, host: str = "0.0.0.0", port: int = 8000, min_interval: float = 5.0):
+        self.bot = bot
+        self.host = host
+        self.port = port
+        self.min_interval = min_interval
+
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._payload = b""
+        self._rendered_at = 0.0
+        self.render_seconds = 0.0
+        self.scrapes = 0
+        self.collector_errors: Dict[str, int] = {}
+
+    async def start(self):
+        """启动 HTTP 服务（端口被占用时只记录警告）"""
+        try:
+            self._server = await asyncio.start_server(self._handle, self.host, self.port)
+            logger.info(f"📈 Prometheus 指标已启用: http://{self.host}:{self.port}/metrics")
+        except OSError as e:
+            logger.warning(f"❌ 指标服务启动失败: {e}")
+
+    async def stop(self):
+        """停止 HTTP 服务"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=5)
+            method, path, *_ = head.split(b"\r\n", 1)[0].decode("latin-1").split(" ")
+
+            if path.split("?", 1)[0] == "/metrics" and method in ("GET", "HEAD"):
+                self.scrapes += 1
+                body = self.render()
+                status, content_type = "200 OK", CONTENT_TYPE
+            else:
+                body = b"not found\n"
+                status, content_type = "404 Not Found", "text/plain; charset=utf-8"
+
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1")
+            )
+            if method != "HEAD":
+                writer.write(body)
+            await writer.drain()
+
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                ConnectionError, ValueError):
+            pass
+        except Exception as e:
+            logger.error(f"处理指标请求失败: {e}")
+        finally:
+            writer.close()
+
+    def render(self) -> bytes:
+        """渲染指标文本（min_interval 秒内重复抓取直接返回缓存）"""
+        now = time.time()
+        if self._payload and now - self._rendered_at < self.min_interval:
+            return self._payload
+
+        started = time.perf_counter()
+        out = MetricsWriter()
+        self._collect(out)
+
+        self.render_seconds = time.perf_counter() - started
+        out.metric("metrics_render_seconds", "gauge", "上一次渲染指标耗时（秒）",
+                   [(None, self.render_seconds)])
+        out.metric("metrics_scrapes_total", "counter", "指标抓取次数", [(None, self.scrapes)])
+        out.metric("metrics_collector_errors_total", "counter", "收集指标失败的次数（按收集器）", [
+            ({"collector": name}, count) for name, count in self.collector_errors.items()
+        ])
+
+        self._payload = out.render()
+        self._rendered_at = now
+        return self._payload
+
+    def _service(self, name: str):
+        """已创建的服务（不触发延迟创建）"""
+        return vars(self.bot).get(name)
+
+    def _collect(self, out: MetricsWriter):
+        """依次运行各收集器；单个收集器出错只跳过它自己的指标并计数"""
+        for name, collect in (
+            ("monitor", self._collect_monitor),
+            ("loop", self._collect_loop),
+            ("queues", self._collect_queues),
+            ("group_filter", self._collect_group_filter),
+            ("stats", self._collect_stats),
+            ("rate_limiters", self._collect_rate_limiters),
+            ("caches", self._collect_caches),
+            ("tracing", self._collect_tracing),
+            ("memory", self._collect_memory),
+            ("anomaly", self._collect_anomaly),
+            ("logs", self._collect_logs),
+            ("users", self._collect_users),
+        ):
+            # 收集器先写入独立的 writer，出错时不会留下写了一半的指标
+            part = MetricsWriter(out.prefix)
+            try:
+                collect(part)
+            except Exception as e:
+                self.collector_errors[name] = self.collector_errors.get(name, 0) + 1
+                logger.error(f"收集指标失败 ({name}): {e}")
+            else:
+                out.lines.extend(part.lines)
+
+    def _collect_loop(self, out: MetricsWriter):
+        loop_monitor = self._service("loop_monitor")
+        if loop_monitor is None:
+            return
+        out.histogram("event_loop_lag_seconds", "事件循环调度延迟（秒）", [({}, loop_monitor.lag_total)])
+        out.metric("event_loop_slow_callbacks_total", "counter", "阻塞事件循环超过阈值的次数",
+                   [(None, loop_monitor.slow_count)])
+
+    def _collect_group_filter(self, out: MetricsWriter):
+        group_filter = self.bot.group_filter.get_stats()
+        out.metric("group_messages_total", "counter", "群组预过滤器检查的消息数", [
+            ({"result": "passed"}, group_filter['passed']),
+            ({"result": "filtered"}, group_filter['filtered']),
+        ])
+
+    def _collect_anomaly(self, out: MetricsWriter):
+        detector = self._service("anomaly_detector")
+        if detector is None:
+            return
+        out.metric("anomaly_active", "gauge", "指标是否处于异常告警状态", [
+            ({"signal": name}, int(state.active)) for name, state in detector.states.items()
+        ])
+        out.metric("anomaly_alerts_total", "counter", "触发的异常告警次数", [(None, detector.alerts_fired)])
+
+    def _collect_logs(self, out: MetricsWriter):
+        logs = log_pipeline.get_stats()
+        out.metric("log_queue_depth", "gauge", "等待写出的日志条数", [(None, logs['queue_depth'])])
+        out.metric("log_records_dropped_total", "counter", "被丢弃的日志条数", [
+            ({"reason": "queue_full"}, logs['overflowed']),
+            *(({"reason": "sampled", "logger": name}, count) for name, count in logs['sampled_out'].items())
+        ])
+
+    def _collect_users(self, out: MetricsWriter):
+        users = self._service("user_service")
+        if users is not None:
+            out.metric("registered_users", "gauge", "已注册用户数", [(None, len(users.users_data))])
+
+    def _collect_monitor(self, out: MetricsWriter):
+        monitor = self._service("system_monitor")
+        if monitor is None:
+            return
+
+        out.metric("uptime_seconds", "gauge", "运行时间（秒）",
+                   [(None, time.time() - monitor.start_time)])
+        out.metric("requests_total", "counter", "处理的更新数", [(None, monitor.request_count)])
+        out.metric("request_errors_total", "counter", "处理出错的更新数", [(None, monitor.error_count)])
+
+        totals = monitor.latency_totals
+        sample = monitor.sampler.latest
+        if sample is not None:
+            for name, help_text, value in (
+                ("system_cpu_percent", "系统 CPU 使用率", sample.cpu_percent),
+                ("system_memory_percent", "系统内存使用率", sample.memory_percent),
+                ("system_disk_percent", "磁盘使用率", sample.disk_percent),
+                ("network_sent_bytes_per_second", "网络发送速率（字节/秒）", sample.net_sent_rate),
+                ("network_recv_bytes_per_second", "网络接收速率（字节/秒）", sample.net_recv_rate),
+                ("process_resident_memory_bytes", "本进程常驻内存（字节）", sample.process_rss),
+                ("process_cpu_percent", "本进程 CPU 使用率", sample.process_cpu_percent),
+                ("process_open_fds", "本进程打开的文件描述符", sample.process_fds),
+                ("process_threads", "本进程线程数", sample.process_threads),
+            ):
+                out.metric(name, "gauge", help_text, [(None, value)])
+
+        out.histogram("request_duration_seconds", "处理器延迟（秒）", [
+            ({"handler": name.split(":", 1)[1]}, histogram)
+            for name, histogram in totals.items() if name.startswith("handler:")
+        ])
+        out.histogram("upstream_duration_seconds", "上游调用延迟（秒，每次尝试）", [
+            ({"upstream": name.split(":", 1)[1]}, histogram)
+            for name, histogram in totals.items() if name.startswith("upstream:")
+        ])
+
+        out.metric("upstream_responses_total", "counter", "上游响应次数（按状态码）", [
+            ({"upstream": upstream, "status": status}, count)
+            for (upstream, status), count in monitor.upstream_status.items()
+        ])
+        out.metric("upstream_retries_total", "counter", "上游重试次数", [
+            ({"upstream": upstream}, count) for upstream, count in monitor.upstream_retries.items()
+        ])
+        out.metric("upstream_errors_total", "counter", "上游调用失败次数", [
+            ({"upstream": upstream}, count) for upstream, count in monitor.upstream_errors.items()
+        ])
+
+    def _collect_tracing(self, out: MetricsWriter):
+        tracer = self._service("tracer")
+        if tracer is None:
+            return
+
+        out.metric("traces_started_total", "counter", "进入链路追踪采样判断的请求数", [(None, tracer.started)])
+        out.metric("traces_sampled_total", "counter", "被采样并完成的追踪数", [(None, tracer.sampled)])
+        if tracer.exporter is not None:
+            out.metric("traces_exported_total", "counter", "已导出的追踪数", [(None, tracer.exporter.exported)])
+            out.metric("traces_dropped_total", "counter", "导出队列已满被丢弃的追踪数", [(None, tracer.exporter.dropped)])
+
+    def _collect_memory(self, out: MetricsWriter):
+        memory = self._service("memory_diagnostics")
+        if memory is None:
+            return
+
+        out.metric("memory_structure_bytes", "gauge", "进程内数据结构的深度大小（字节，上次统计）", [
+            ({"structure": item.name}, item.bytes) for item in memory.sizes
+        ])
+        out.metric("memory_structure_entries", "gauge", "进程内数据结构的条目数（上次统计）", [
+            ({"structure": item.name}, item.entries) for item in memory.sizes if item.entries is not None
+        ])
+        out.metric("memory_structure_stale", "gauge", "上次统计失败、沿用更早结果的结构", [
+            ({"structure": item.name}, int(item.stale)) for item in memory.sizes
+        ])
+        stats = memory.get_stats()
+        if stats['tracing']:
+            out.metric("tracemalloc_traced_bytes", "gauge", "tracemalloc 追踪到的内存（字节）",
+                       [(None, stats['traced_bytes'])])
+
+    def _collect_queues(self, out: MetricsWriter):
+        out.metric("inflight_requests", "gauge", "在途处理器数量",
+                   [(None, self.bot.shutdown.inflight_count)])
+
+        application = self.bot.application
+        if application is not None:
+            out.metric("update_queue_depth", "gauge", "等待处理的更新数量",
+                       [(None, application.update_queue.qsize())])
+
+    def _collect_stats(self, out: MetricsWriter):
+        stats = self._service("stats_manager")
+        if stats is None:
+            return
+
+        metrics = stats.get_connection_metrics()
+        if metrics['redis_state'] != 'disabled':
+            out.metric("redis_up", "gauge", "统计 Redis 是否已连接",
+                       [(None, metrics['redis_state'] == 'connected')])
+            out.metric("redis_outages_total", "counter", "Redis 中断次数", [(None, metrics['redis_outage_count'])])
+            out.metric("redis_reconnects_total", "counter", "Redis 重连次数", [(None, metrics['redis_reconnects'])])
+            out.metric("redis_outage_seconds_total", "counter", "Redis 累计中断时长（秒）",
+                       [(None, metrics['redis_total_outage_seconds'])])
+
+        out.metric("stats_buffer_keys", "gauge", "统计写缓冲中待刷新的键数",
+                   [(None, metrics['buffered_keys'])])
+        out.metric("stats_dropped_updates_total", "counter", "Redis 断开期间丢弃的统计更新数",
+                   [(None, metrics['dropped_updates'])])
+        out.metric("stats_flushed_updates_total", "counter", "已写入 Redis 的统计更新数",
+                   [(None, stats.flushed_updates)])
+        out.metric("stats_flushed_commands_total", "counter", "统计刷新发送的 Redis 命令数",
+                   [(None, stats.flushed_commands)])
+
+    def _collect_rate_limiters(self, out: MetricsWriter):
+        limiters = rate_limiter_stats()
+        out.metric("rate_limit_allowed_total", "counter", "速率限制放行次数（含 Redis 放行、本地快速放行和回退放行）", [
+            ({"limiter": name}, item['allowed']) for name, item in limiters.items()
+        ])
+        out.metric("rate_limit_limited_total", "counter", "速率限制拒绝次数（含 Redis 拒绝和回退拒绝）", [
+            ({"limiter": name}, item['limited']) for name, item in limiters.items()
+        ])
+        out.metric("rate_limit_tracked_keys", "gauge", "速率限制跟踪的用户数", [
+            ({"limiter": name}, item['tracked_keys']) for name, item in limiters.items()
+        ])
+
+    def _collect_caches(self, out: MetricsWriter):
+        caches = []
+
+        snapshots = self._service("admin_snapshots")
+        if snapshots is not None:
+            caches.append(("admin_snapshots", snapshots.hits, snapshots.misses))
+
+        for name, item in rate_limiter_stats().items():
+            if 'local_hits' in item:
+                caches.append((f"rate_limit_local:{name}", item['local_hits'], item['remote_calls']))
+
+        out.metric("cache_hits_total", "counter", "缓存命中次数", [
+            ({"cache": name}, hits) for name, hits, _ in caches
+        ])
+        out.metric("cache_misses_total", "counter", "缓存未命中次数", [
+            ({"cache": name}, misses) for name, _, misses in caches
+        ])
\ No newline at end of file
@@ -5,9 +5,14 @@ OpenAI API 服务
 import logging
 import json
 import asyncio
-import aiohttp
+from contextlib import nullcontext
 from typing import Dict, Any, Optional
 from config.config import Config
+from utils.lazy import lazy_import
+from utils.tracing import span
+
+# aiohttp 在首次发起请求时才导入
+aiohttp = lazy_import("aiohttp")
 
 logger = logging.getLogger(__name__)
 
@@ -15,15 +20,16 @@ logger = logging.getLogger(__name__)
 class OpenAIService:
     """OpenAI API 服务类"""
 
-    def __init__(self):
+    def __init__(self, monitor=None):
         self.config = Config
         self.session = None
+        self.monitor = monitor  # SystemMonitor，记录上游延迟
         self.base_headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {self.config.API_KEY}"
         }
 
-    async def get_session(self) -> aiohttp.ClientSession:
+    async def get_session(self) -> "aiohttp.ClientSession":
         """获取HTTP会话"""
         if self.session is None or self.session.closed:
             timeout = aiohttp.ClientTimeout(total=self.config.REQUEST_TIMEOUT)
@@ -38,6 +44,14 @@ class OpenAIService:
         if self.session and not self.session.closed:
             await self.session.close()
 
+    def _record_status(self, status):
+        if self.monitor:
+            self.monitor.record_upstream_status("openai", status)
+
+    def _record_retry(self):
+        if self.monitor:
+            self.monitor.record_upstream_retry("openai")
+
     def get_system_prompt(self) -> str:
         """获取系统提示词"""
         return """你是一个友好、专业的AI助手。请遵循以下回复风格:
@@ -65,12 +79,19 @@ class OpenAIService:
         session = await self.get_session()
 
         for attempt in range(self.config.MAX_RETRIES):
+            if attempt:
+                self._record_retry()
             try:
-                async with session.post(url, json=data) as response:
-                    response.raise_for_status()
-                    return await response.json()
-
-            except aiohttp.ClientTimeout:
+                with span("openai.attempt", attempt=attempt + 1) as stage, \
+                        self.monitor.track_upstream("openai") if self.monitor else nullcontext():
+                    async with session.post(url, json=data) as response:
+                        self._record_status(response.status)
+                        stage.set("http.status_code", response.status)
+                        response.raise_for_status()
+                        return await response.json()
+
+            except asyncio.TimeoutError:
+                self._record_status("timeout")
                 logger.warning(f"API请求超时 (尝试 {attempt + 1}/{self.config.MAX_RETRIES})")
                 if attempt < self.config.MAX_RETRIES - 1:
                     await asyncio.sleep(2 ** attempt)
@@ -86,6 +107,7 @@ class OpenAIService:
                 raise Exception(f"API错误: {e.status}")
 
             except Exception as e:
+                self._record_status("error")
                 logger.error(f"请求错误 (尝试 {attempt + 1}/{self.config.MAX_RETRIES}): {e}")
                 if attempt < self.config.MAX_RETRIES - 1:
                     await asyncio.sleep(2 ** attempt)
@@ -108,12 +130,14 @@ class OpenAIService:
                 messages.append({"role": "user", "content": user_message})
 
             # 发送请求
-            response_data = await self.make_api_request(messages)
+            with span("upstream", model=self.config.MODEL):
+                response_data = await self.make_api_request(messages)
 
             # 解析响应
             if self.config.API_TYPE in ["openai", "one-api", "new-api"]:
                 raw_response = response_data["choices"][0]["message"]["content"]
-                return self.format_response(raw_response)
+                with span("formatting"):
+                    return self.format_response(raw_response)
             else:
                 logger.error(f"不支持的API类型: {self.config.API_TYPE}")
                 return "抱歉，配置错误。请联系管理员。"
@@ -0,0 +1,146 @@
+"""
+采样性能剖析服务
+"""
+
+import sys
+import time
+import asyncio
+import logging
+import threading
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# 项目根目录，帧名称中的文件路径相对于它显示
+PROJECT_ROOT = str(Path(__file__).resolve().parent.parent)
+
+
+class ProfileResult(NamedTuple):
+    """一次剖析的结果"""
+    path: Path
+    duration: float
+    samples: int
+    stacks: int  # 不同调用栈的数量
+    top: List[tuple]  # 自身耗时最多的函数 (帧名称, 样本数)
+
+
+class SamplingProfiler:
+    """按需启动、限时运行的采样剖析器
+
+    独立线程每隔 interval 秒通过 sys._current_frames() 读取所有线程的调用栈，
+    被剖析的代码不需要任何插桩，停止后开销为零。事件循环线程的调用栈前面加上
+    当前正在运行的 asyncio 任务（协程名），同一段代码被不同任务调用时可以区分。
+    结果以折叠栈格式（每行 "帧1;帧2;帧3 样本数"）保存在 output_dir 下，
+    可以直接交给 flamegraph.pl、speedscope 等工具生成火焰图。
+    """
+
+    def __init__(self, output_dir: str = "data/profiles", interval: float = 0.01,
+                 max_duration: float = 60.0, keep_files: int = 20, max_cached_names: int = 20_000):
+        self.output_dir = Path(output_dir)
+        self.interval = interval
+        self.max_duration = max_duration
+        self.keep_files = keep_files
+        self.running = False
+        self.last_result: Optional[ProfileResult] = None
+
+        # (文件名, 代码对象) -> 帧名称，避免每个样本重复格式化（只在一次剖析内有效，条目数有上限）。
+        # 代码对象判等时不比较文件名，不同文件中完全相同的函数需要用文件名区分
+        self._names: Dict[tuple, str] = {}
+        self.max_cached_names = max_cached_names
+
+    async def profile(self, duration: float) -> ProfileResult:
+        """剖析 duration 秒（不超过 max_duration），同一时间只允许一次"""
+        if self.running:
+            raise RuntimeError("已有剖析任务正在运行")
+
+        duration = min(max(duration, 1.0), self.max_duration)
+        loop = asyncio.get_running_loop()
+        self.running = True
+        try:
+            logger.info(f"🔥 开始性能剖析 ({duration:.0f}s, 采样间隔 {self.interval * 1000:.0f}ms)")
+            stacks = await asyncio.to_thread(self._sample, duration, threading.get_ident(), loop)
+            result = await asyncio.to_thread(self._save, stacks, duration)
+            logger.info(f"🔥 性能剖析完成: {result.path} ({result.samples} 个样本)")
+            self.last_result = result
+            return result
+        finally:
+            self._names.clear()  # 不让缓存把代码对象一直留在内存里
+            self.running = False
+
+    def _sample(self, duration: float, loop_thread_id: int, loop) -> Counter:
+        """采样线程：在 duration 秒内定时记录所有线程的调用栈"""
+        stacks = Counter()
+        # 私有字典，不同 Python 版本可能不存在；不存在时调用栈不带任务名
+        current_tasks = getattr(asyncio.tasks, "_current_tasks", None)
+        own_thread = threading.get_ident()
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+
+        deadline = time.monotonic() + duration
+        next_sample = time.monotonic()
+        while next_sample < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread:
+                    continue
+
+                names = []
+                while frame is not None:
+                    names.append(self._frame_name(frame.f_code))
+                    frame = frame.f_back
+                names.append(thread_names.get(thread_id, f"thread-{thread_id}"))
+
+                if thread_id == loop_thread_id and current_tasks is not None:
+                    task_name = self._task_name(current_tasks, loop)
+                    if task_name is not None:
+                        names.insert(-1, f"task:{task_name}")
+
+                stacks[";".join(reversed(names))] += 1
+
+            next_sample += self.interval
+            time.sleep(max(next_sample - time.monotonic(), 0))
+        return stacks
+
+    @staticmethod
+    def _task_name(current_tasks, loop) -> Optional[str]:
+        """事件循环线程当前运行的任务名（从采样线程读取，读取失败时返回 None）"""
+        try:
+            task = current_tasks.get(loop)
+            if task is None:
+                return None
+            return getattr(task.get_coro(), '__qualname__', None) or task.get_name()
+        except Exception:
+            # 事件循环线程同时在切换任务，这个样本不带任务名
+            return None
+
+    def _frame_name(self, code) -> str:
+        key = (code.co_filename, code)
+        name = self._names.get(key)
+        if name is None:
+            filename = code.co_filename
+            if filename.startswith(PROJECT_ROOT):
+                filename = filename[len(PROJECT_ROOT) + 1:]
+            qualname = getattr(code, "co_qualname", code.co_name)
+            # 折叠栈格式用分号分隔帧、空格分隔样本数
+            name = f"{qualname} ({filename}:{code.co_firstlineno})".replace(";", ":")
+            if len(self._names) < self.max_cached_names:
+                self._names[key] = name
+        return name
+
+    def _save(self, stacks: Counter, duration: float) -> ProfileResult:
+        """写出折叠栈文件并清理旧文件"""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        path = self.output_dir / f"profile-{datetime.now().strftime('%Y%m%d-%H%M%S')}.folded"
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        for old in sorted(self.output_dir.glob("profile-*.folded"))[:-self.keep_files]:
+            old.unlink(missing_ok=True)
+
+        self_time = Counter()
+        for stack, count in stacks.items():
+            self_time[stack.rsplit(";", 1)[-1]] += count
+
+        return ProfileResult(path, duration, sum(stacks.values()), len(stacks), self_time.most_common(5))
\ No newline at end of file
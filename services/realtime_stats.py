@@ -3,105 +3,594 @@
 """
 
 import json
-import aioredis
+import time
 import asyncio
+from pathlib import Path
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
-from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+from collections import Counter, defaultdict
 import logging
+from utils.lazy import lazy_import
+from utils.hyperloglog import HyperLogLog
+from utils.presence import PresenceIndex
+from services.timeseries import TimeSeriesStore
+from services.retention import RetentionTracker
+
+# aioredis 在初始化连接时才导入，导入失败同样回退到内存统计
+aioredis = lazy_import("aioredis")
 
 logger = logging.getLogger(__name__)
 
+# 活跃用户 HyperLogLog 的保留窗口（月活需要 30 天的日 HLL）
+DAILY_HLL_DAYS = 31
+HOURLY_HLL_HOURS = 25
+
+# 在线用户索引保留时长（秒），可查询的最大在线窗口
+PRESENCE_RETENTION = 3600
+ONLINE_WINDOW = 300
+
+# 时间序列汇总间隔（秒）
+ROLLUP_INTERVAL = 60
+
+# 排行榜：种类、各周期在内存中保留的数量和 Redis 过期时间
+LEADERBOARD_KINDS = ("users", "chats", "actions")
+LEADERBOARD_RETENTION = {"day": 8, "week": 5}
+LEADERBOARD_TTL = {"day": 86400 * 8, "week": 86400 * 35}
+
+# 旧版不会过期的计数哈希（已由时间序列替代）
+LEGACY_COUNTER_KEYS = ["daily_users", "daily_messages", "hourly_messages", "minute_messages"]
+
+
+class StatsBuffer:
+    """统计写缓冲
+
+    合并一段时间内的计数增量、集合成员和字段值，刷新时每个键只发一条命令，
+    Redis 操作数与不同键的数量相关，而与消息数量无关。
+    """
+
+    def __init__(self):
+        self.counters: Dict[str, Dict[str, int]] = {}  # HINCRBY 增量
+        self.members: Dict[str, Set] = {}  # SADD 成员
+        self.hll_members: Dict[str, Set] = {}  # PFADD 成员
+        self.fields: Dict[str, Dict[str, str]] = {}  # HSET 字段（后写覆盖先写）
+        self.scores: Dict[str, Dict[str, float]] = {}  # ZADD 分数（取最大值）
+        self.trims: Dict[str, float] = {}  # ZREMRANGEBYSCORE 截断分数
+        self.increments: Dict[str, Dict[str, float]] = {}  # ZINCRBY 增量
+        self.bits: Dict[str, Set] = {}  # SETBIT 用户（刷新时换算成位图序号）
+        self.expires: Dict[str, int] = {}  # EXPIRE 秒数
+        self.keys: Set[str] = set()  # 以上写入涉及的不同键（截断和过期只附加在这些键上，不单独计数）
+        self.updates = 0  # 合并进缓冲的更新次数
+
+    def hincrby(self, key: str, field: str, amount: int = 1):
+        fields = self.counters.setdefault(key, {})
+        fields[field] = fields.get(field, 0) + amount
+        self.keys.add(key)
+
+    def sadd(self, key: str, member):
+        self.members.setdefault(key, set()).add(member)
+        self.keys.add(key)
+
+    def pfadd(self, key: str, member):
+        self.hll_members.setdefault(key, set()).add(member)
+        self.keys.add(key)
+
+    def setbit(self, key: str, member):
+        self.bits.setdefault(key, set()).add(member)
+        self.keys.add(key)
+
+    def hset(self, key: str, field: str, value: str):
+        self.fields.setdefault(key, {})[field] = value
+        self.keys.add(key)
+
+    def zadd(self, key: str, member, score: float):
+        scores = self.scores.setdefault(key, {})
+        scores[member] = max(score, scores.get(member, score))
+        self.keys.add(key)
+
+    def zincrby(self, key: str, member, amount: float = 1):
+        members = self.increments.setdefault(key, {})
+        members[member] = members.get(member, 0) + amount
+        self.keys.add(key)
+
+    def ztrim(self, key: str, max_score: float):
+        self.trims[key] = max(max_score, self.trims.get(key, max_score))
+
+    def expire(self, key: str, seconds: int):
+        self.expires[key] = seconds
+
+    def __len__(self) -> int:
+        """缓冲中不同的键数量（常数时间，每条消息都会检查）"""
+        return len(self.keys)
+
+    def merge(self, other: "StatsBuffer"):
+        """合并一个更早的缓冲（刷新失败时放回），字段值以当前缓冲为准"""
+        for key, fields in other.counters.items():
+            for field, amount in fields.items():
+                self.hincrby(key, field, amount)
+        for key, members in other.members.items():
+            self.members.setdefault(key, set()).update(members)
+        for key, members in other.hll_members.items():
+            self.hll_members.setdefault(key, set()).update(members)
+        for key, members in other.bits.items():
+            self.bits.setdefault(key, set()).update(members)
+        for key, fields in other.fields.items():
+            # 当前缓冲中的值更新，不覆盖
+            self.fields[key] = {**fields, **self.fields.get(key, {})}
+        for key, scores in other.scores.items():
+            for member, score in scores.items():
+                self.zadd(key, member, score)
+        for key, members in other.increments.items():
+            for member, amount in members.items():
+                self.zincrby(key, member, amount)
+        for key, max_score in other.trims.items():
+            self.ztrim(key, max_score)
+        for key, seconds in other.expires.items():
+            self.expires.setdefault(key, seconds)
+        self.keys |= other.keys
+        self.updates += other.updates
+
+    def apply(self, pipe, offsets: Optional[Dict] = None) -> int:
+        """把缓冲写入 Redis 管道，返回命令数（offsets 为用户到位图序号的映射）"""
+        commands = 0
+        for key, members in self.bits.items():
+            # 一个位图的所有置位合并成一条 BITFIELD
+            args = []
+            for member in members:
+                args += ['SET', 'u1', offsets[member], 1]
+            pipe.execute_command('BITFIELD', key, *args)
+            commands += 1
+        for key, fields in self.counters.items():
+            for field, amount in fields.items():
+                pipe.hincrby(key, field, amount)
+                commands += 1
+        for key, members in self.members.items():
+            pipe.sadd(key, *members)
+            commands += 1
+        for key, members in self.hll_members.items():
+            pipe.pfadd(key, *members)
+            commands += 1
+        for key, fields in self.fields.items():
+            pipe.hset(key, mapping=fields)
+            commands += 1
+        for key, scores in self.scores.items():
+            pipe.zadd(key, scores)
+            commands += 1
+        for key, members in self.increments.items():
+            for member, amount in members.items():
+                pipe.zincrby(key, amount, member)
+                commands += 1
+        for key, max_score in self.trims.items():
+            pipe.zremrangebyscore(key, '-inf', max_score)
+            commands += 1
+        for key, seconds in self.expires.items():
+            pipe.expire(key, seconds)
+            commands += 1
+        return commands
+
+    def to_dict(self) -> Dict:
+        return {
+            'counters': self.counters,
+            'members': {key: list(members) for key, members in self.members.items()},
+            'hll_members': {key: list(members) for key, members in self.hll_members.items()},
+            'bits': {key: list(members) for key, members in self.bits.items()},
+            'fields': self.fields,
+            'scores': self.scores,
+            'trims': self.trims,
+            'increments': self.increments,
+            'expires': self.expires
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "StatsBuffer":
+        buffer = cls()
+        buffer.counters = data.get('counters', {})
+        buffer.members = {key: set(members) for key, members in data.get('members', {}).items()}
+        buffer.hll_members = {key: set(members) for key, members in data.get('hll_members', {}).items()}
+        buffer.bits = {key: set(members) for key, members in data.get('bits', {}).items()}
+        buffer.fields = data.get('fields', {})
+        buffer.scores = data.get('scores', {})
+        buffer.trims = data.get('trims', {})
+        buffer.increments = data.get('increments', {})
+        buffer.expires = data.get('expires', {})
+        buffer.keys = set().union(
+            buffer.counters, buffer.members, buffer.hll_members, buffer.fields,
+            buffer.scores, buffer.increments, buffer.bits
+        )
+        return buffer
+
 
 class RealTimeStatsManager:
     """实时统计管理器"""
 
-    def __init__(self, redis_url: str = "redis://localhost:6379"):
+    def __init__(self, redis_url: str = "redis://localhost:6379", fallback_file: str = "data/stats_fallback.json",
+                 pending_file: str = "data/stats_pending.json", flush_interval: float = 1.0,
+                 max_buffer_keys: int = 5000, max_connections: int = 20, probe_interval: float = 5.0,
+                 max_offline_keys: int = 50000, retention_days: int = 90):
         self.redis_url = redis_url
-        self.redis: Optional[aioredis.Redis] = None
-        self.fallback_stats = defaultdict(int)  # Redis不可用时的备用统计
+        self.redis: Optional["aioredis.Redis"] = None
+        self.fallback_file = Path(fallback_file)
+        self.fallback_stats = defaultdict(int, self._load_fallback_stats())  # Redis不可用时的备用统计
         self.redis_available = False
 
-        # 内存中的实时数据
-        self.active_users = set()  # 当前活跃用户
-        self.user_last_activity = {}  # 用户最后活动时间
+        # 连接池与健康探测：断线期间继续缓冲，恢复后批量回放
+        self.max_connections = max_connections
+        self.probe_interval = probe_interval
+        self.max_offline_keys = max_offline_keys
+        self._probe_task: Optional[asyncio.Task] = None
+        self.outage_started: Optional[float] = None
+        self.outage_count = 0
+        self.last_outage_seconds = 0.0
+        self.total_outage_seconds = 0.0
+        self.reconnect_count = 0
+        self.dropped_updates = 0
+
+        # Redis 写缓冲：定期或超过键数上限时合并成一个管道写入
+        self.pending_file = Path(pending_file)
+        self.buffer = self._load_pending_buffer()
+        self.flush_interval = flush_interval
+        self.max_buffer_keys = max_buffer_keys
+        self._flush_task: Optional[asyncio.Task] = None
+        self.flushed_updates = 0
+        self.flushed_commands = 0
+
+        # 内存中的实时数据（活跃用户用 HyperLogLog 计数，每个窗口固定 16KB）
+        self.all_users_hll = HyperLogLog()
+        self.daily_hll: Dict[str, HyperLogLog] = {}
+        self.hourly_hll: Dict[str, HyperLogLog] = {}
+        self.presence = PresenceIndex(retention_seconds=PRESENCE_RETENTION)  # 用户最后活跃时间索引
+        self.timeseries = TimeSeriesStore()  # 分钟/小时/天消息数
+        self.retention = RetentionTracker(retention_days=retention_days)  # 每日活跃位图（留存分析）
+        self._rollup_task: Optional[asyncio.Task] = None
+        self._rollup_catch_up = True
+
+        # 内存排行榜：周期 -> 周期键 -> 种类 -> 计数
+        self.leaderboards: Dict[str, Dict[str, Dict[str, Counter]]] = {period: {} for period in LEADERBOARD_RETENTION}
 
     async def initialize(self):
-        """初始化Redis连接"""
+        """创建 Redis 连接池并启动健康探测（连接失败时在后台自动重连）"""
         try:
-            self.redis = await aioredis.from_url(
+            pool = aioredis.ConnectionPool.from_url(
                 self.redis_url,
+                max_connections=self.max_connections,
                 decode_responses=True,
                 socket_timeout=5,
-                socket_connect_timeout=5
+                socket_connect_timeout=5,
+                health_check_interval=30
             )
+            self.redis = aioredis.Redis(connection_pool=pool)
+        except Exception as e:
+            logger.warning(f"❌ Redis不可用，使用内存统计: {e}")
+            self.redis = None
+            return
 
-            # 测试连接
-            await self.redis.ping()
-            self.redis_available = True
+        self._flush_task = asyncio.create_task(self._flush_loop())
+        self._rollup_task = asyncio.create_task(self._rollup_loop())
+        self._probe_task = asyncio.create_task(self._probe_loop())
+
+        if await self._probe():
             logger.info("✅ Redis连接成功，启用实时统计")
+        else:
+            logger.warning("❌ Redis连接失败，暂用内存统计，后台将自动重连")
 
+    async def _probe(self) -> bool:
+        """探测 Redis 连接，状态变化时切换并回放缓冲"""
+        try:
+            await self.redis.ping()
         except Exception as e:
-            logger.warning(f"❌ Redis连接失败，使用内存统计: {e}")
+            self._mark_down(e)
+            return False
+
+        if not self.redis_available:
+            self._mark_up()
+            await self.flush_buffer()
+        return True
+
+    async def _probe_loop(self):
+        """定期健康探测"""
+        while True:
+            await asyncio.sleep(self.probe_interval)
+            await self._probe()
+
+    def _mark_down(self, error: Exception):
+        """标记 Redis 断开，开始记录中断时长"""
+        if self.outage_started is None:
+            self.outage_started = time.time()
+            self.outage_count += 1
+            logger.warning(f"⚠️ Redis 连接中断，统计数据暂存内存: {error}")
+        self.redis_available = False
+
+    def _mark_up(self):
+        """标记 Redis 恢复"""
+        if self.outage_started is not None:
+            self.last_outage_seconds = time.time() - self.outage_started
+            self.total_outage_seconds += self.last_outage_seconds
+            self.outage_started = None
+            self.reconnect_count += 1
+            logger.info(
+                f"✅ Redis 已恢复（中断 {self.last_outage_seconds:.0f}s），"
+                f"回放 {len(self.buffer)} 个缓冲键"
+            )
+
+        self.redis_available = True
+        self._rollup_catch_up = True
+
+    def get_connection_metrics(self) -> Dict:
+        """Redis 连接状态指标"""
+        current_outage = time.time() - self.outage_started if self.outage_started is not None else 0.0
+        return {
+            'redis_state': 'connected' if self.redis_available else ('disconnected' if self.redis else 'disabled'),
+            'redis_outage_seconds': current_outage,
+            'redis_outage_count': self.outage_count,
+            'redis_last_outage_seconds': self.last_outage_seconds,
+            'redis_total_outage_seconds': self.total_outage_seconds + current_outage,
+            'redis_reconnects': self.reconnect_count,
+            'buffered_keys': len(self.buffer),
+            'dropped_updates': self.dropped_updates
+        }
+
+    def _load_fallback_stats(self) -> Dict:
+        """加载上次关闭时保存的备用统计"""
+        if self.fallback_file.exists():
+            try:
+                with open(self.fallback_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except Exception as e:
+                logger.error(f"加载备用统计失败: {e}")
+        return {}
+
+    def _load_pending_buffer(self) -> StatsBuffer:
+        """加载上次关闭时没能写入 Redis 的缓冲"""
+        if self.pending_file.exists():
+            try:
+                with open(self.pending_file, 'r', encoding='utf-8') as f:
+                    buffer = StatsBuffer.from_dict(json.load(f))
+                self.pending_file.unlink()
+                return buffer
+            except Exception as e:
+                logger.error(f"加载未写入的统计缓冲失败: {e}")
+        return StatsBuffer()
+
+    async def _flush_loop(self):
+        """定期刷新写缓冲"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush_buffer()
+
+    async def _rollup_loop(self):
+        """定期把 Redis 中的分钟数据汇总成小时、天数据（启动或重连后先补汇总中断期间的数据）"""
+        while True:
+            if self.redis_available:
+                try:
+                    # 没有实际汇总时保留补汇总标记，等有指标后再补
+                    if await self.timeseries.rollup_redis(self.redis, catch_up=self._rollup_catch_up):
+                        self._rollup_catch_up = False
+                except Exception as e:
+                    logger.error(f"汇总时间序列失败: {e}")
+            await asyncio.sleep(ROLLUP_INTERVAL)
+
+    async def flush_buffer(self) -> bool:
+        """把写缓冲合并成一个管道写入 Redis，失败时放回缓冲（至少一次）"""
+        if not len(self.buffer):
+            return True
+        if not self.redis_available or not self.redis:
+            return False
+
+        buffer, self.buffer = self.buffer, StatsBuffer()
+        try:
+            offsets = await self.retention.resolve(self.redis, buffer.bits) if buffer.bits else None
+            pipe = self.redis.pipeline(transaction=False)
+            commands = buffer.apply(pipe, offsets)
+            await pipe.execute()
+
+            self.flushed_updates += buffer.updates
+            self.flushed_commands += commands
+            return True
+
+        except Exception as e:
+            logger.error(f"刷新统计缓冲失败: {e}")
+            self.buffer.merge(buffer)
+            self._mark_down(e)
+            return False
+
+    async def flush(self):
+        """刷新写缓冲并保存内存中的备用统计（关闭时调用）"""
+        # Redis 写不进去的缓冲落盘，下次启动后重新写入（文件在线程中写入）
+        if not await self.flush_buffer():
+            await asyncio.to_thread(self._write_json, self.pending_file, self.buffer.to_dict())
+
+        if self.fallback_stats:
+            await asyncio.to_thread(self._write_json, self.fallback_file, dict(self.fallback_stats))
+
+    @staticmethod
+    def _write_json(path: Path, data: Dict):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+
+    async def close(self):
+        """关闭Redis连接"""
+        for task in (self._flush_task, self._rollup_task, self._probe_task):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+
+        if self.redis:
+            await self.redis.close()
+            await self.redis.connection_pool.disconnect()
             self.redis_available = False
 
-    async def update_user_activity(self, user_id: int, action: str, chat_type: str = "private"):
+    async def update_user_activity(self, user_id: int, action: str, chat_type: str = "private",
+                                   chat_id: Optional[int] = None):
         """更新用户活动统计"""
         try:
             current_time = datetime.now()
             today = current_time.strftime('%Y-%m-%d')
             hour = current_time.strftime('%Y-%m-%d-%H')
-            minute = current_time.strftime('%Y-%m-%d-%H-%M')
 
-            # 更新活跃用户列表
-            self.active_users.add(user_id)
-            self.user_last_activity[user_id] = current_time
+            # Redis 断开期间继续写缓冲，恢复后回放；缓冲过大时丢弃新增量
+            use_redis = self.redis is not None and (
+                self.redis_available or len(self.buffer) < self.max_offline_keys
+            )
+            if self.redis is not None and not use_redis:
+                self.dropped_updates += 1
 
-            if self.redis_available and self.redis:
-                # Redis统计
-                pipe = self.redis.pipeline()
+            # 更新活跃用户计数
+            self._add_active_user(user_id, today, hour)
+            self.retention.record(user_id, today, self.buffer if use_redis else None)
+            self.presence.touch(user_id, current_time.timestamp())
+
+            # 消息数时间序列（分钟粒度，后台汇总成小时/天）
+            self.timeseries.record(
+                "messages", ts=current_time.timestamp(), buffer=self.buffer if use_redis else None
+            )
+
+            # 排行榜（最活跃用户、最忙群组、最常用功能；按天和按周）
+            self._update_leaderboards(
+                current_time, user_id, action,
+                chat_id if chat_type in ("group", "supergroup") else None,
+                self.buffer if use_redis else None
+            )
+
+            if use_redis:
+                # Redis统计（写入缓冲，由后台任务批量刷新）
+                buffer = self.buffer
+                buffer.updates += 1
 
                 # 日统计
-                pipe.hincrby("daily_users", today, 1)
-                pipe.hincrby("daily_messages", today, 1)
-                pipe.sadd(f"active_users:{today}", user_id)
+                buffer.pfadd(f"hll:active_users:{today}", user_id)
+                buffer.pfadd("hll:users:all", user_id)
 
                 # 小时统计
-                pipe.hincrby("hourly_messages", hour, 1)
-                pipe.sadd(f"active_users:{hour}", user_id)
-
-                # 分钟统计（用于实时监控）
-                pipe.hincrby("minute_messages", minute, 1)
+                buffer.pfadd(f"hll:active_users:{hour}", user_id)
 
                 # 用户个人统计
-                pipe.hincrby(f"user_stats:{user_id}", "total_messages", 1)
-                pipe.hincrby(f"user_stats:{user_id}", f"messages_{today}", 1)
-                pipe.hset(f"user_stats:{user_id}", "last_activity", current_time.isoformat())
+                buffer.hincrby(f"user_stats:{user_id}", "total_messages")
+                buffer.hincrby(f"user_stats:{user_id}", f"messages_{today}")
+                buffer.hset(f"user_stats:{user_id}", "last_activity", current_time.isoformat())
+
+                # 在线用户索引（有序集合：用户 -> 最后活跃时间）
+                buffer.zadd("presence", user_id, current_time.timestamp())
+                buffer.ztrim("presence", current_time.timestamp() - PRESENCE_RETENTION)
 
                 # 动作类型统计
-                pipe.hincrby("action_types", action, 1)
-                pipe.hincrby(f"action_types:{today}", action, 1)
+                buffer.hincrby("action_types", action)
+                buffer.hincrby(f"action_types:{today}", action)
 
                 # 聊天类型统计
-                pipe.hincrby("chat_types", chat_type, 1)
+                buffer.hincrby("chat_types", chat_type)
 
                 # 设置过期时间
-                pipe.expire(f"active_users:{today}", 86400 * 7)  # 7天
-                pipe.expire(f"active_users:{hour}", 3600 * 25)  # 25小时
-                pipe.expire(f"user_stats:{user_id}", 86400 * 30)  # 30天
-                pipe.expire("minute_messages", 3600)  # 1小时
+                buffer.expire(f"hll:active_users:{today}", 86400 * DAILY_HLL_DAYS)  # 31天（用于月活）
+                buffer.expire(f"hll:active_users:{hour}", 3600 * HOURLY_HLL_HOURS)  # 25小时
+                buffer.expire(f"user_stats:{user_id}", 86400 * 30)  # 30天
 
-                await pipe.execute()
+                if self.redis_available and len(buffer) >= self.max_buffer_keys:
+                    await self.flush_buffer()
 
-            else:
-                # 备用内存统计
-                self.fallback_stats[f"daily_users_{today}"] += 1
-                self.fallback_stats[f"hourly_messages_{hour}"] += 1
-                self.fallback_stats[f"action_{action}"] += 1
+            # 备用内存统计
+            self.fallback_stats[f"action_{action}"] += 1
 
         except Exception as e:
             logger.error(f"更新用户活动统计失败: {e}")
 
+    def _period_keys(self, when: datetime) -> Dict[str, str]:
+        """排行榜周期键：日期和 ISO 周"""
+        year, week, _ = when.isocalendar()
+        return {"day": when.strftime('%Y-%m-%d'), "week": f"{year}-W{week:02d}"}
+
+    def _update_leaderboards(self, when: datetime, user_id: int, action: str,
+                             chat_id: Optional[int], buffer: Optional[StatsBuffer]):
+        """增量更新排行榜（内存计数 + Redis 有序集合）"""
+        members = {"users": user_id, "chats": chat_id, "actions": action}
+
+        for period, period_key in self._period_keys(when).items():
+            history = self.leaderboards[period]
+            boards = history.get(period_key)
+            if boards is None:
+                boards = history[period_key] = {kind: Counter() for kind in LEADERBOARD_KINDS}
+                # 周期按时间顺序插入，超出保留数量时删除最早的
+                while len(history) > LEADERBOARD_RETENTION[period]:
+                    del history[next(iter(history))]
+
+            for kind, member in members.items():
+                if member is None:
+                    continue
+                boards[kind][member] += 1
+                if buffer is not None:
+                    key = f"lb:{kind}:{period_key}"
+                    buffer.zincrby(key, member)
+                    buffer.expire(key, LEADERBOARD_TTL[period])
+
+    async def get_leaderboard(self, kind: str, period: str = "day", limit: int = 10) -> List[Tuple[str, int]]:
+        """获取排行榜前 limit 名（Redis 有序集合为 O(log n + k)）"""
+        period_key = self._period_keys(datetime.now())[period]
+
+        if self.redis_available and self.redis:
+            entries = await self.redis.zrevrange(f"lb:{kind}:{period_key}", 0, limit - 1, withscores=True)
+            return [(str(member), int(score)) for member, score in entries]
+
+        boards = self.leaderboards[period].get(period_key)
+        return [(str(member), count) for member, count in boards[kind].most_common(limit)] if boards else []
+
+    def _add_active_user(self, user_id: int, today: str, hour: str):
+        """把用户计入内存中的日/小时/总活跃 HyperLogLog"""
+        self.all_users_hll.add(user_id)
+
+        for windows, key, keep in ((self.daily_hll, today, DAILY_HLL_DAYS),
+                                   (self.hourly_hll, hour, HOURLY_HLL_HOURS)):
+            counter = windows.get(key)
+            if counter is None:
+                counter = windows[key] = HyperLogLog()
+                # 窗口按时间顺序插入，超出保留数量时删除最早的
+                while len(windows) > keep:
+                    del windows[next(iter(windows))]
+            counter.add(user_id)
+
+    def _recent_days(self, days: int) -> List[str]:
+        """最近 N 天的日期键（含今天）"""
+        now = datetime.now()
+        return [(now - timedelta(days=i)).strftime('%Y-%m-%d') for i in range(days)]
+
+    def _memory_active_users(self, days: int) -> int:
+        """合并内存中最近 N 天的日 HyperLogLog 得到活跃用户数"""
+        counters = [self.daily_hll[day] for day in self._recent_days(days) if day in self.daily_hll]
+        return HyperLogLog.union(*counters).count() if counters else 0
+
+    async def get_active_users(self, days: int = 1) -> int:
+        """最近 N 天的去重活跃用户数（周活 days=7，月活 days=30），误差约 0.81%"""
+        if self.redis_available and self.redis:
+            # 多键 PFCOUNT 在服务端合并 HLL，不需要额外的临时键
+            return int(await self.redis.pfcount(*(f"hll:active_users:{day}" for day in self._recent_days(days))))
+        return self._memory_active_users(days)
+
+    async def get_retention_report(self) -> Dict:
+        """日活/周活/月活（位图精确值）和次日/7日/30日留存"""
+        try:
+            redis = self.redis if self.redis_available else None
+            return await self.retention.report(redis)
+        except Exception as e:
+            logger.error(f"获取留存数据失败: {e}")
+            return {'error': str(e)}
+
+    async def get_cohorts(self, days: int = 7, horizon: int = 7) -> List[Dict]:
+        """最近 days 天的同期群留存表"""
+        redis = self.redis if self.redis_available else None
+        return await self.retention.cohorts(days, horizon, redis)
+
+    async def get_message_count(self, since: datetime) -> int:
+        """统计从 since 到现在的消息数"""
+        redis = self.redis if self.redis_available else None
+        return int(await self.timeseries.total("messages", since.timestamp(), time.time(), redis))
+
+    async def get_message_series(self, hours: int = 6, step: int = 300) -> List:
+        """最近 hours 小时内每 step 秒的消息数，返回 [(时间, 数量), ...]"""
+        redis = self.redis if self.redis_available else None
+        now = time.time()
+        return await self.timeseries.query("messages", now - hours * 3600 + step, now, step, redis)
+
     async def get_real_time_stats(self) -> Dict:
         """获取实时统计数据"""
         try:
@@ -109,17 +598,21 @@ class RealTimeStatsManager:
             today = current_time.strftime('%Y-%m-%d')
             hour = current_time.strftime('%Y-%m-%d-%H')
 
+            # 消息数来自时间序列
+            today_messages = await self.get_message_count(current_time.replace(hour=0, minute=0, second=0, microsecond=0))
+            hour_messages = await self.get_message_count(current_time.replace(minute=0, second=0, microsecond=0))
+
             if self.redis_available and self.redis:
                 # 从Redis获取统计
                 pipe = self.redis.pipeline()
 
-                # 今日统计
-                pipe.hget("daily_messages", today)
-                pipe.scard(f"active_users:{today}")
+                # 今日、当前小时活跃用户
+                pipe.pfcount(f"hll:active_users:{today}")
+                pipe.pfcount(f"hll:active_users:{hour}")
 
-                # 当前小时统计
-                pipe.hget("hourly_messages", hour)
-                pipe.scard(f"active_users:{hour}")
+                # 周活、月活（合并最近 7/30 天的日 HLL）
+                pipe.pfcount(*(f"hll:active_users:{day}" for day in self._recent_days(7)))
+                pipe.pfcount(*(f"hll:active_users:{day}" for day in self._recent_days(30)))
 
                 # 动作类型统计
                 pipe.hgetall("action_types")
@@ -128,17 +621,20 @@ class RealTimeStatsManager:
                 # 聊天类型统计
                 pipe.hgetall("chat_types")
 
-                results = await pipe.execute()
-
                 # 在线用户数（最近5分钟活跃）
-                online_users = await self._get_online_users_count()
+                pipe.zcount("presence", time.time() - ONLINE_WINDOW, '+inf')
+
+                results = await pipe.execute()
+                online_users = int(results[7] or 0)
 
                 return {
-                    'today_messages': int(results[0] or 0),
-                    'today_active_users': int(results[1] or 0),
-                    'current_hour_messages': int(results[2] or 0),
-                    'current_hour_users': int(results[3] or 0),
+                    'today_messages': today_messages,
+                    'today_active_users': int(results[0] or 0),
+                    'current_hour_messages': hour_messages,
+                    'current_hour_users': int(results[1] or 0),
                     'online_users': online_users,
+                    'week_active_users': int(results[2] or 0),
+                    'month_active_users': int(results[3] or 0),
                     'total_action_types': results[4] or {},
                     'today_action_types': results[5] or {},
                     'chat_types': results[6] or {},
@@ -148,16 +644,15 @@ class RealTimeStatsManager:
 
             else:
                 # 使用备用统计
-                online_users = len([
-                    uid for uid, last_time in self.user_last_activity.items()
-                    if (current_time - last_time).seconds < 300  # 5分钟内活跃
-                ])
+                online_users = self.presence.count(ONLINE_WINDOW)
 
                 return {
-                    'today_messages': self.fallback_stats.get(f"daily_users_{today}", 0),
-                    'today_active_users': len(self.active_users),
-                    'current_hour_messages': self.fallback_stats.get(f"hourly_messages_{hour}", 0),
-                    'current_hour_users': len(self.active_users),
+                    'today_messages': today_messages,
+                    'today_active_users': self._memory_active_users(1),
+                    'current_hour_messages': hour_messages,
+                    'current_hour_users': self.hourly_hll[hour].count() if hour in self.hourly_hll else 0,
+                    'week_active_users': self._memory_active_users(7),
+                    'month_active_users': self._memory_active_users(30),
                     'online_users': online_users,
                     'total_action_types': {
                         k.replace('action_', ''): v
@@ -178,51 +673,52 @@ class RealTimeStatsManager:
                 'data_source': 'error'
             }
 
-    async def _get_online_users_count(self) -> int:
-        """获取在线用户数（最近5分钟活跃）"""
+    async def get_online_users(self, window_seconds: float = ONLINE_WINDOW) -> int:
+        """获取最近 window_seconds 秒内活跃的用户数（最长 PRESENCE_RETENTION）"""
         try:
-            current_time = datetime.now()
-
             if self.redis_available and self.redis:
-                # 检查最近5分钟的活跃用户
-                online_count = 0
-                for i in range(5):
-                    minute_time = current_time - timedelta(minutes=i)
-                    minute_key = minute_time.strftime('%Y-%m-%d-%H-%M')
-                    count = await self.redis.hget("minute_messages", minute_key)
-                    if count:
-                        online_count = max(online_count, int(count))
-
-                return online_count
-            else:
-                # 使用内存统计
-                five_minutes_ago = current_time - timedelta(minutes=5)
-                return len([
-                    uid for uid, last_time in self.user_last_activity.items()
-                    if last_time >= five_minutes_ago
-                ])
+                return int(await self.redis.zcount("presence", time.time() - window_seconds, '+inf'))
+            return self.presence.count(window_seconds)
 
         except Exception as e:
             logger.error(f"获取在线用户数失败: {e}")
             return 0
 
     async def get_user_statistics(self, limit: int = 10) -> Dict:
-        """获取用户统计数据"""
+        """获取用户统计数据（含按天、按周的排行榜）"""
         try:
+            boards = [(kind, period) for period in LEADERBOARD_RETENTION for kind in LEADERBOARD_KINDS]
+
             if self.redis_available and self.redis:
-                # 获取最活跃用户
-                action_types = await self.redis.hgetall("action_types")
+                periods = self._period_keys(datetime.now())
+                pipe = self.redis.pipeline()
+                pipe.pfcount("hll:users:all")
+                pipe.hgetall("action_types")
+                for kind, period in boards:
+                    pipe.zrevrange(f"lb:{kind}:{periods[period]}", 0, limit - 1, withscores=True)
+                results = await pipe.execute()
 
-                # 这里可以添加更多用户统计逻辑
                 return {
-                    'total_registered_users': len(self.active_users),
-                    'action_distribution': action_types,
+                    'total_registered_users': int(results[0] or 0),
+                    'action_distribution': results[1] or {},
+                    'leaderboards': {
+                        f"{kind}_{period}": [(str(member), int(score)) for member, score in entries]
+                        for (kind, period), entries in zip(boards, results[2:])
+                    },
                     'data_source': 'redis'
                 }
             else:
                 return {
-                    'total_registered_users': len(self.active_users),
-                    'action_distribution': {},
+                    'total_registered_users': self.all_users_hll.count(),
+                    'action_distribution': {
+                        k.replace('action_', ''): v
+                        for k, v in self.fallback_stats.items()
+                        if k.startswith('action_')
+                    },
+                    'leaderboards': {
+                        f"{kind}_{period}": await self.get_leaderboard(kind, period, limit)
+                        for kind, period in boards
+                    },
                     'data_source': 'memory'
                 }
 
@@ -243,11 +739,13 @@ class RealTimeStatsManager:
                     'redis_total_commands_processed': info.get('total_commands_processed', 0),
                     'redis_uptime_in_seconds': info.get('uptime_in_seconds', 0),
                     'cache_hit_rate': 'N/A',  # 可以实现缓存命中率统计
+                    **self.get_connection_metrics(),
                     'data_source': 'redis'
                 }
             else:
                 return {
                     'redis_status': 'disconnected',
+                    **self.get_connection_metrics(),
                     'data_source': 'memory'
                 }
 
@@ -256,20 +754,16 @@ class RealTimeStatsManager:
             return {'error': str(e)}
 
     async def cleanup_old_data(self):
-        """清理过期数据"""
+        """清理旧版不会过期的统计键（新的时间序列和 HLL 键都自带过期时间）"""
         if not self.redis_available or not self.redis:
             return
 
         try:
-            # 清理超过7天的数据
-            cutoff_date = datetime.now() - timedelta(days=7)
-
-            # 清理按日期存储的键
-            for i in range(8, 15):  # 8-14天前的数据
-                old_date = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
-                await self.redis.delete(f"active_users:{old_date}")
-                await self.redis.hdel("daily_users", old_date)
-                await self.redis.hdel("daily_messages", old_date)
+            legacy_sets = [
+                f"active_users:{(datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')}"
+                for i in range(8, 15)
+            ]
+            await self.redis.delete(*legacy_sets, *LEGACY_COUNTER_KEYS)
 
             logger.info("✅ 清理过期统计数据完成")
 
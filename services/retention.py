@@ -0,0 +1,253 @@
+"""
+留存与同期群分析服务
+"""
+
+import uuid
+import logging
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utils.bitmap import ActivityBitmap, numpy_available
+
+logger = logging.getLogger(__name__)
+
+# 查询或分配稠密用户序号（ARGV: 过期秒数, 用户1, 日期1, 用户2, 日期2, ...）
+# 新用户取自增序号，并记入首次活跃当天的新增位图
+INDEX_LUA = """
+local ttl = tonumber(ARGV[1])
+local result = {}
+for i = 2, #ARGV, 2 do
+    local index = redis.call('HGET', KEYS[1], ARGV[i])
+    if not index then
+        index = redis.call('INCR', KEYS[2]) - 1
+        redis.call('HSET', KEYS[1], ARGV[i], index)
+        local new_key = KEYS[3] .. ARGV[i + 1]
+        redis.call('SETBIT', new_key, index, 1)
+        redis.call('EXPIRE', new_key, ttl)
+    end
+    result[#result + 1] = tonumber(index)
+end
+return result
+"""
+
+# 一个统计量：BITCOUNT(BITOP op 位图...)，位图用 (种类, 日期) 表示
+Metric = Tuple[str, List[Tuple[str, str]]]
+
+
+class RetentionTracker:
+    """基于位图的日活/周活/月活与留存分析
+
+    每个用户分配一个稠密序号，每天一个活跃位图（第 i 位表示序号为 i 的用户当天活跃），
+    首次出现的用户另记入当天的新增位图。日活是一次 BITCOUNT，周活/月活是 BITOP OR，
+    第 N 日留存是 新增(D) AND 活跃(D+N)，耗时只与位图长度（用户总数 / 8 字节）有关。
+
+    没有 Redis 写缓冲时（未配置 Redis，或断线期间缓冲已满）才写入进程内的 NumPy 位数组，
+    序号只在本进程内有效，最多记录 max_local_users 个用户（超出的用户不计入，
+    结果为下限）；未安装 NumPy 时不做内存统计。
+    """
+
+    def __init__(self, prefix: str = "ret", retention_days: int = 90, max_cached_indices: int = 100_000,
+                 max_local_users: int = 100_000):
+        self.prefix = prefix
+        self.retention_days = retention_days
+        self.ttl = 86400 * (retention_days + 1)
+        self.max_cached_indices = max_cached_indices
+        self.max_local_users = max_local_users
+        self._index_script = None
+
+        # Redis 序号缓存（先进先出淘汰）
+        self.redis_index: Dict[int, int] = {}
+
+        # 内存位图：种类 -> 日期 -> 位图
+        self.local_index: Dict[int, int] = {}
+        self.local: Dict[str, Dict[str, ActivityBitmap]] = {"active": {}, "new": {}}
+        self.local_dropped = 0  # 超过 max_local_users 未计入的记录数
+        self._local_enabled: Optional[bool] = None
+
+    def key(self, kind: str, day: str) -> str:
+        """位图的 Redis 键"""
+        return f"{self.prefix}:{kind}:{day}"
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+
+    @property
+    def local_enabled(self) -> bool:
+        """内存位图是否可用（需要 NumPy）"""
+        if self._local_enabled is None:
+            self._local_enabled = numpy_available()
+            if not self._local_enabled:
+                logger.warning("⚠️ 未安装 NumPy，Redis 不可用时不统计留存")
+        return self._local_enabled
+
+    def record(self, user_id: int, day: str, buffer=None):
+        """记录用户当天活跃
+
+        传入 StatsBuffer 时只写入缓冲（Redis 序号在刷新时分配），否则写入内存位图。
+        """
+        if buffer is not None:
+            key = self.key("active", day)
+            buffer.setbit(key, user_id)
+            buffer.expire(key, self.ttl)
+            return
+
+        if not self.local_enabled:
+            return
+        index = self.local_index.get(user_id)
+        if index is None:
+            if len(self.local_index) >= self.max_local_users:
+                self.local_dropped += 1
+                return
+            index = self.local_index[user_id] = len(self.local_index)
+            self._local_bitmap("new", day).set(index)
+        self._local_bitmap("active", day).set(index)
+
+    def _local_bitmap(self, kind: str, day: str) -> ActivityBitmap:
+        bitmaps = self.local[kind]
+        bitmap = bitmaps.get(day)
+        if bitmap is None:
+            bitmap = bitmaps[day] = ActivityBitmap()
+            # 新的一天开始时删除超过保留期的位图
+            cutoff = (date.fromisoformat(day) - timedelta(days=self.retention_days)).isoformat()
+            for old in [old for old in bitmaps if old < cutoff]:
+                del bitmaps[old]
+        return bitmap
+
+    async def resolve(self, redis, bits: Dict[str, Iterable]) -> Dict[int, int]:
+        """查询缓冲中用户的 Redis 序号，未缓存的用户在一次脚本调用中查询或分配"""
+        offsets = {}
+        first_day = {}
+        # 键名以日期结尾，排序后按时间先后，新用户记入最早出现的那天
+        for key in sorted(bits):
+            day = key.rsplit(":", 1)[1]
+            for user_id in bits[key]:
+                index = self.redis_index.get(user_id)
+                if index is not None:
+                    offsets[user_id] = index
+                else:
+                    first_day.setdefault(user_id, day)
+
+        if first_day:
+            if self._index_script is None:
+                self._index_script = redis.register_script(INDEX_LUA)
+
+            args = [self.ttl]
+            for user_id, day in first_day.items():
+                args += [user_id, day]
+            indices = await self._index_script(
+                keys=[f"{self.prefix}:index", f"{self.prefix}:next", f"{self.prefix}:new:"],
+                args=args
+            )
+
+            for user_id, index in zip(first_day, indices):
+                offsets[user_id] = self.redis_index[user_id] = int(index)
+            while len(self.redis_index) > self.max_cached_indices:
+                del self.redis_index[next(iter(self.redis_index))]
+
+        return offsets
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+
+    async def _count(self, metrics: List[Metric], redis=None) -> List[int]:
+        """计算多个统计量；Redis 上在一个管道中完成，临时键用完即删"""
+        if redis is None:
+            return [self._count_local(op, bitmaps) for op, bitmaps in metrics]
+
+        pipe = redis.pipeline(transaction=False)
+        positions = []
+        commands = 0
+        tmp_prefix = f"{self.prefix}:tmp:{uuid.uuid4().hex}"
+        for i, (op, bitmaps) in enumerate(metrics):
+            keys = [self.key(kind, day) for kind, day in bitmaps]
+            if len(keys) == 1:
+                pipe.bitcount(keys[0])
+                positions.append(commands)
+                commands += 1
+            else:
+                tmp = f"{tmp_prefix}:{i}"
+                pipe.bitop(op, tmp, *keys)
+                pipe.bitcount(tmp)
+                pipe.delete(tmp)
+                positions.append(commands + 1)
+                commands += 3
+
+        results = await pipe.execute()
+        return [int(results[position] or 0) for position in positions]
+
+    def _count_local(self, op: str, bitmaps: List[Tuple[str, str]]) -> int:
+        if not self.local_enabled:
+            return 0
+        empty = ActivityBitmap()
+        result = None
+        for kind, day in bitmaps:
+            bitmap = self.local[kind].get(day, empty)
+            if result is None:
+                result = bitmap
+            else:
+                result = result & bitmap if op == "AND" else result | bitmap
+        return result.count() if result is not None else 0
+
+    def _days(self, end: date, days: int) -> List[str]:
+        return [(end - timedelta(days=i)).isoformat() for i in range(days)]
+
+    async def report(self, redis=None, today: Optional[date] = None,
+                     retention_days: Tuple[int, ...] = (1, 7, 30)) -> Dict:
+        """日活/周活/月活（精确值）和第 N 日留存
+
+        留存按最近一个完整的自然日计算：第 N 日留存 = N+1 天前的新增用户中昨天仍活跃的比例。
+        """
+        today = today or date.today()
+        yesterday = today - timedelta(days=1)
+
+        metrics: List[Metric] = [
+            ("OR", [("active", day) for day in self._days(today, days)])
+            for days in (1, 7, 30)
+        ]
+        for n in retention_days:
+            cohort = (yesterday - timedelta(days=n)).isoformat()
+            metrics.append(("OR", [("new", cohort)]))
+            metrics.append(("AND", [("new", cohort), ("active", yesterday.isoformat())]))
+
+        counts = await self._count(metrics, redis)
+        report = {'dau': counts[0], 'wau': counts[1], 'mau': counts[2], 'retention': {}}
+        for i, n in enumerate(retention_days):
+            size, retained = counts[3 + 2 * i], counts[4 + 2 * i]
+            report['retention'][n] = {
+                'cohort_size': size,
+                'retained': retained,
+                'rate': retained / size if size else 0.0
+            }
+        return report
+
+    async def cohorts(self, days: int = 7, horizon: int = 7, redis=None,
+                      today: Optional[date] = None) -> List[Dict]:
+        """同期群留存表：最近 days 天每天的新增用户在之后第 1..horizon 天的留存人数"""
+        today = today or date.today()
+        cohort_days = sorted(today - timedelta(days=i) for i in range(days))
+
+        metrics: List[Metric] = []
+        layout = []
+        for cohort in cohort_days:
+            metrics.append(("OR", [("new", cohort.isoformat())]))
+            offsets = [n for n in range(1, horizon + 1) if cohort + timedelta(days=n) <= today]
+            for n in offsets:
+                metrics.append(("AND", [("new", cohort.isoformat()), ("active", (cohort + timedelta(days=n)).isoformat())]))
+            layout.append((cohort, len(offsets)))
+
+        counts = iter(await self._count(metrics, redis))
+        table = []
+        for cohort, width in layout:
+            size = next(counts)
+            table.append({
+                'day': cohort.isoformat(),
+                'size': size,
+                'retained': [next(counts) for _ in range(width)]
+            })
+        return table
+
+    def memory_usage(self) -> int:
+        """内存位图占用的字节数"""
+        return sum(bitmap.nbytes for bitmaps in self.local.values() for bitmap in bitmaps.values())
\ No newline at end of file
@@ -2,70 +2,68 @@
 系统监控服务
 """
 
-import psutil
 import time
 import asyncio
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, Optional, Tuple
 import logging
+from collections import defaultdict
+from contextlib import contextmanager
+from utils.histogram import LatencyHistogram, RollingHistogram
+from utils.bucket_ring import TimeBucketRing
+from services.system_sampler import SystemSampler
 
 logger = logging.getLogger(__name__)
 
+# 延迟滑动窗口：名称 -> (窗口秒数, 时间片数)
+LATENCY_WINDOWS = {"1m": (60, 6), "5m": (300, 10), "1h": (3600, 12)}
+
 
 class SystemMonitor:
     """系统资源监控器"""
 
-    def __init__(self):
-        self.start_time = time.time()
+    def __init__(self, sample_interval: float = 5.0, sample_history: int = 720,
+                 start_time: Optional[float] = None):
+        # 运行时间的起点，默认为创建时间（机器人传入进程启动时间）
+        self.start_time = start_time or time.time()
         self.request_count = 0
         self.error_count = 0
-        self.response_times: List[float] = []
         self.api_call_count = 0
         self.last_error_time: Optional[datetime] = None
         self.last_error_message = ""
 
-        # 性能历史记录（最近24小时）
-        self.hourly_stats = {}
+        # 系统资源后台采样（CPU、内存、磁盘、网络、本进程）
+        self.sampler = SystemSampler(sample_interval, sample_history)
+
+        # 性能历史记录：请求数、错误数、响应时间总和的分钟桶（24 小时）和小时桶（32 天）
+        self.minutes = TimeBucketRing(60, 24 * 60)
+        self.hours = TimeBucketRing(3600, 32 * 24)
+
+        # 延迟直方图：all / handler:<名称> / upstream:<名称> -> 窗口 -> 直方图
+        self.latency: Dict[str, Dict[str, RollingHistogram]] = {}
+        self.latency_totals: Dict[str, LatencyHistogram] = {}  # 启动以来的累计直方图（Prometheus 导出）
+
+        # 上游调用结果：错误数、(上游, 状态码) -> 次数、重试次数
+        self.upstream_errors: Dict[str, int] = defaultdict(int)
+        self.upstream_status: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.upstream_retries: Dict[str, int] = defaultdict(int)
 
         logger.info("🔍 系统监控器已启动")
 
     def get_real_system_status(self) -> Dict:
         """获取真实的系统状态"""
         try:
-            # CPU使用率
-            cpu_percent = psutil.cpu_percent(interval=0.1)
-
-            # 内存使用情况
-            memory = psutil.virtual_memory()
-            memory_percent = memory.percent
-            memory_used_gb = memory.used / (1024 ** 3)
-            memory_total_gb = memory.total / (1024 ** 3)
-
-            # 磁盘使用率
-            try:
-                disk = psutil.disk_usage('/')
-                disk_percent = (disk.used / disk.total) * 100
-                disk_free_gb = disk.free / (1024 ** 3)
-            except:
-                disk_percent = 0
-                disk_free_gb = 0
-
-            # 网络IO统计
-            try:
-                net_io = psutil.net_io_counters()
-                bytes_sent_mb = net_io.bytes_sent / (1024 ** 2)
-                bytes_recv_mb = net_io.bytes_recv / (1024 ** 2)
-            except:
-                bytes_sent_mb = 0
-                bytes_recv_mb = 0
+            # 系统资源优先取后台线程的最新采样；后台采样关闭时每次查看都重新采样
+            sample = self.sampler.current()
+            cpu_percent = sample.cpu_percent
+            memory_percent = sample.memory_percent
 
             # 运行时间
             uptime_seconds = time.time() - self.start_time
             uptime_str = str(timedelta(seconds=int(uptime_seconds)))
 
-            # 平均响应时间（最近100次请求）
-            recent_responses = self.response_times[-100:] if self.response_times else []
-            avg_response = sum(recent_responses) / len(recent_responses) if recent_responses else 0
+            # 响应时间（最近5分钟）
+            latency = self.get_latency_stats("all", "5m")
 
             # 确定系统状态
             if cpu_percent > 90 or memory_percent > 90:
@@ -86,19 +84,28 @@ class SystemMonitor:
                 'status_emoji': status_emoji,
                 'cpu_percent': cpu_percent,
                 'memory_percent': memory_percent,
-                'memory_used_gb': memory_used_gb,
-                'memory_total_gb': memory_total_gb,
-                'disk_percent': disk_percent,
-                'disk_free_gb': disk_free_gb,
-                'network_sent_mb': bytes_sent_mb,
-                'network_recv_mb': bytes_recv_mb,
+                'memory_used_gb': sample.memory_used / (1024 ** 3),
+                'memory_total_gb': sample.memory_total / (1024 ** 3),
+                'disk_percent': sample.disk_percent,
+                'disk_free_gb': sample.disk_free / (1024 ** 3),
+                'network_sent_mb': sample.net_sent / (1024 ** 2),
+                'network_recv_mb': sample.net_recv / (1024 ** 2),
+                'network_sent_rate_kb': sample.net_sent_rate / 1024,
+                'network_recv_rate_kb': sample.net_recv_rate / 1024,
+                'process_rss_mb': sample.process_rss / (1024 ** 2),
+                'process_cpu_percent': sample.process_cpu_percent,
+                'process_fds': sample.process_fds,
+                'process_threads': sample.process_threads,
+                'sample_age': time.time() - sample.timestamp,
                 'uptime': uptime_str,
                 'uptime_seconds': uptime_seconds,
                 'total_requests': self.request_count,
                 'api_calls': self.api_call_count,
                 'error_count': self.error_count,
                 'error_rate': error_rate,
-                'avg_response_time': avg_response,
+                'avg_response_time': latency['mean'],
+                'p95_response_time': latency['p95'],
+                'p99_response_time': latency['p99'],
                 'last_error_time': self.last_error_time.strftime('%H:%M:%S') if self.last_error_time else '无',
                 'last_error_message': self.last_error_message or '无',
                 'current_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -112,101 +119,141 @@ class SystemMonitor:
                 'current_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             }
 
-    def record_request(self, response_time: float, is_error: bool = False, error_msg: str = ""):
+    def _record_latency(self, name: str, seconds: float, now: float):
+        windows = self.latency.get(name)
+        if windows is None:
+            windows = self.latency[name] = {
+                window: RollingHistogram(seconds, slots)
+                for window, (seconds, slots) in LATENCY_WINDOWS.items()
+            }
+            self.latency_totals[name] = LatencyHistogram()
+
+        # 所有直方图的桶划分相同，只计算一次桶下标
+        total = self.latency_totals[name]
+        index = total.index_of(seconds)
+        total.record_index(index, seconds)
+        for histogram in windows.values():
+            histogram.record(seconds, now, index)
+
+    def record_request(self, response_time: float, is_error: bool = False, error_msg: str = "",
+                       handler: Optional[str] = None):
         """记录请求统计"""
         self.request_count += 1
-        self.response_times.append(response_time)
+        now = time.time()
+        self._record_latency("all", response_time, now)
+        if handler:
+            self._record_latency(f"handler:{handler}", response_time, now)
 
         if is_error:
             self.error_count += 1
             self.last_error_time = datetime.now()
             self.last_error_message = error_msg[:100]  # 限制错误消息长度
 
-        # 只保留最近1000次请求的响应时间
-        if len(self.response_times) > 1000:
-            self.response_times = self.response_times[-1000:]
-
-        # 记录小时统计
-        current_hour = datetime.now().strftime('%Y-%m-%d-%H')
-        if current_hour not in self.hourly_stats:
-            self.hourly_stats[current_hour] = {
-                'requests': 0,
-                'errors': 0,
-                'total_response_time': 0
-            }
+        # 记录分钟/小时桶（环形数组原地覆盖，不需要清理）
+        self.minutes.record(response_time, is_error, now)
+        self.hours.record(response_time, is_error, now)
 
-        self.hourly_stats[current_hour]['requests'] += 1
-        self.hourly_stats[current_hour]['total_response_time'] += response_time
+    def record_api_call(self):
+        """记录API调用"""
+        self.api_call_count += 1
 
+    def record_upstream(self, name: str, latency: float, is_error: bool = False):
+        """记录上游服务（如 OpenAI）的调用延迟"""
+        self.record_api_call()
+        self._record_latency(f"upstream:{name}", latency, time.time())
         if is_error:
-            self.hourly_stats[current_hour]['errors'] += 1
+            self.upstream_errors[name] += 1
 
-        # 清理超过24小时的数据
-        self._cleanup_old_stats()
+    def record_upstream_status(self, name: str, status):
+        """记录上游响应状态（HTTP 状态码或 timeout/error）"""
+        self.upstream_status[(name, str(status))] += 1
 
-    def record_api_call(self):
-        """记录API调用"""
-        self.api_call_count += 1
+    def record_upstream_retry(self, name: str):
+        """记录上游重试"""
+        self.upstream_retries[name] += 1
+
+    @contextmanager
+    def track_upstream(self, name: str):
+        """计时一次上游调用，代码块抛出异常时记为失败"""
+        started = time.perf_counter()
+        failed = True
+        try:
+            yield
+            failed = False
+        finally:
+            self.record_upstream(name, time.perf_counter() - started, failed)
+
+    def get_latency_stats(self, name: str = "all", window: str = "5m") -> Dict:
+        """某个处理器/上游在窗口内的延迟统计（秒）"""
+        windows = self.latency.get(name)
+        if windows is None:
+            return {'count': 0, 'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+
+        histogram = windows[window].snapshot()
+        percentiles = histogram.percentiles([0.5, 0.95, 0.99])
+        return {
+            'count': histogram.total,
+            'mean': histogram.mean,
+            'p50': percentiles[0.5],
+            'p95': percentiles[0.95],
+            'p99': percentiles[0.99],
+            'max': histogram.max()
+        }
+
+    def get_latency_report(self, window: str = "5m") -> Dict[str, Dict]:
+        """所有处理器和上游的延迟统计，按 p99 从高到低排序"""
+        report = {name: self.get_latency_stats(name, window) for name in self.latency}
+        return dict(sorted(
+            ((name, stats) for name, stats in report.items() if stats['count']),
+            key=lambda item: item[1]['p99'], reverse=True
+        ))
 
     def get_hourly_stats(self, hours: int = 24) -> Dict:
         """获取指定小时数的统计数据"""
-        current_time = datetime.now()
-        stats = {}
+        return self.get_stats_series(hours * 3600, 3600, '%Y-%m-%d-%H')
 
-        for i in range(hours):
-            hour_time = current_time - timedelta(hours=i)
-            hour_key = hour_time.strftime('%Y-%m-%d-%H')
-
-            if hour_key in self.hourly_stats:
-                hour_data = self.hourly_stats[hour_key]
-                avg_response = (hour_data['total_response_time'] /
-                                max(hour_data['requests'], 1))
-
-                stats[hour_key] = {
-                    'requests': hour_data['requests'],
-                    'errors': hour_data['errors'],
-                    'avg_response': avg_response,
-                    'error_rate': (hour_data['errors'] / max(hour_data['requests'], 1)) * 100
-                }
-            else:
-                stats[hour_key] = {
-                    'requests': 0,
-                    'errors': 0,
-                    'avg_response': 0,
-                    'error_rate': 0
-                }
-
-        return stats
+    def get_stats_series(self, seconds: int, step: int, key_format: str = '%Y-%m-%d %H:%M') -> Dict:
+        """获取最近 seconds 秒内每 step 秒的请求统计（如最近 6 小时每 5 分钟）"""
+        ring = self.hours if step % 3600 == 0 else self.minutes
+        per = max(step // ring.bucket_seconds, 1)
 
-    def _cleanup_old_stats(self):
-        """清理超过24小时的统计数据"""
-        cutoff_time = datetime.now() - timedelta(hours=25)
-        cutoff_key = cutoff_time.strftime('%Y-%m-%d-%H')
+        # 从与步长对齐的桶开始读取，每 per 个桶合并成一步（最后一步是当前未结束的一步）
+        current = ring.epoch(time.time())
+        steps = max(min(seconds // step, (ring.size - per) // per + 1), 1)
+        first = (current // per - steps + 1) * per
+        series = ring.series(current - first + 1)
 
-        keys_to_remove = [
-            key for key in self.hourly_stats.keys()
-            if key < cutoff_key
-        ]
+        stats = {}
+        for i in range(0, len(series), per):
+            chunk = series[i:i + per]
+            requests = sum(bucket[1] for bucket in chunk)
+            errors = sum(bucket[2] for bucket in chunk)
+            total_response_time = sum(bucket[3] for bucket in chunk)
+            stats[datetime.fromtimestamp(chunk[0][0]).strftime(key_format)] = {
+                'requests': int(requests),
+                'errors': int(errors),
+                'avg_response': total_response_time / max(requests, 1),
+                'error_rate': (errors / max(requests, 1)) * 100
+            }
 
-        for key in keys_to_remove:
-            del self.hourly_stats[key]
+        return stats
 
     def get_performance_trend(self) -> Dict:
-        """获取性能趋势分析"""
-        if len(self.response_times) < 10:
-            return {'trend': 'insufficient_data', 'message': '数据不足'}
-
-        # 分析最近的响应时间趋势
-        recent_50 = self.response_times[-50:]
-        older_50 = self.response_times[-100:-50] if len(self.response_times) >= 100 else []
+        """获取性能趋势分析（最近5分钟与最近1小时的平均响应时间对比）"""
+        recent_requests, _, recent_latency = self.minutes.totals(5)
+        baseline_requests, _, baseline_latency = self.minutes.totals(60)
 
-        if not older_50:
+        if recent_requests < 10:
+            return {'trend': 'insufficient_data', 'message': '数据不足'}
+        if baseline_requests - recent_requests < 10:
             return {'trend': 'insufficient_data', 'message': '历史数据不足'}
 
-        recent_avg = sum(recent_50) / len(recent_50)
-        older_avg = sum(older_50) / len(older_50)
+        recent_mean = recent_latency / recent_requests
+        baseline_mean = baseline_latency / baseline_requests
+        if baseline_mean <= 0:
+            return {'trend': 'stable', 'message': '性能稳定', 'emoji': '📊'}
 
-        improvement = ((older_avg - recent_avg) / older_avg) * 100
+        improvement = ((baseline_mean - recent_mean) / baseline_mean) * 100
 
         if improvement > 10:
             return {
@@ -0,0 +1,169 @@
+"""
+系统资源采样服务
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from typing import List, NamedTuple, Optional
+from utils.lazy import lazy_import
+
+# psutil 在采样线程第一次采样时才导入
+psutil = lazy_import("psutil")
+
+logger = logging.getLogger(__name__)
+
+
+class SystemSample(NamedTuple):
+    """一次系统资源采样"""
+    timestamp: float
+    cpu_percent: float
+    memory_percent: float
+    memory_used: int
+    memory_total: int
+    disk_percent: float
+    disk_free: int
+    net_sent: int  # 累计发送字节数
+    net_recv: int  # 累计接收字节数
+    net_sent_rate: float  # 发送速率（字节/秒）
+    net_recv_rate: float  # 接收速率（字节/秒）
+    process_rss: int
+    process_cpu_percent: float
+    process_fds: int
+    process_threads: int
+
+
+class SystemSampler:
+    """后台系统资源采样器
+
+    独立线程每隔 interval 秒采样一次 CPU、内存、磁盘、网络和本进程资源，
+    写入固定长度的环形缓冲。CPU 使用率取两次采样之间的平均值，不需要
+    cpu_percent(interval=...) 阻塞等待；读取方直接拿最新一次采样，不做任何系统调用。
+    """
+
+    def __init__(self, interval: float = 5.0, history: int = 720):
+        self.interval = interval
+        self.samples = deque(maxlen=history)
+        self.latest: Optional[SystemSample] = None
+        self.errors = 0
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._process = None
+
+    def start(self):
+        """启动采样线程"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="system-sampler", daemon=True)
+        self._thread.start()
+        logger.info(f"🔍 系统采样线程已启动 (间隔 {self.interval}s)")
+
+    @property
+    def running(self) -> bool:
+        """采样线程是否在运行"""
+        return self._thread is not None and self._thread.is_alive()
+
+    def current(self) -> SystemSample:
+        """最新一次采样；采样线程未运行或最新采样已超过一个间隔时当场采样"""
+        latest = self.latest
+        if latest is None or not self.running or time.time() - latest.timestamp > self.interval:
+            return self.sample()
+        return latest
+
+    def stop(self, timeout: float = 2.0):
+        """停止采样线程"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while True:
+            try:
+                self.sample()
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"系统资源采样失败: {e}")
+            if self._stop.wait(self.interval):
+                return
+
+    def sample(self) -> SystemSample:
+        """采样一次并写入环形缓冲"""
+        first = self._process is None
+        if first:
+            self._process = psutil.Process(os.getpid())
+
+        now = time.time()
+        memory = psutil.virtual_memory()
+
+        try:
+            disk = psutil.disk_usage('/')
+            disk_percent = (disk.used / disk.total) * 100
+            disk_free = disk.free
+        except Exception:
+            disk_percent = 0.0
+            disk_free = 0
+
+        try:
+            net_io = psutil.net_io_counters()
+            net_sent, net_recv = net_io.bytes_sent, net_io.bytes_recv
+        except Exception:
+            net_sent = net_recv = 0
+
+        previous = self.latest
+        elapsed = now - previous.timestamp if previous else 0
+        if elapsed > 0:
+            # 计数器可能因网卡重置而回退，回退时速率记为 0
+            sent_rate = max(net_sent - previous.net_sent, 0) / elapsed
+            recv_rate = max(net_recv - previous.net_recv, 0) / elapsed
+        else:
+            sent_rate = recv_rate = 0.0
+
+        process = self._process
+        with process.oneshot():
+            rss = process.memory_info().rss
+            # cpu_percent(None) 返回距上次调用的平均使用率，第一次调用只建立基准
+            process_cpu = process.cpu_percent(interval=None)
+            threads = process.num_threads()
+            fds = process.num_fds() if hasattr(process, "num_fds") else process.num_handles()
+
+        cpu_percent = psutil.cpu_percent(interval=None)
+        if first:
+            cpu_percent = process_cpu = 0.0
+
+        sample = SystemSample(
+            timestamp=now,
+            cpu_percent=cpu_percent,
+            memory_percent=memory.percent,
+            memory_used=memory.used,
+            memory_total=memory.total,
+            disk_percent=disk_percent,
+            disk_free=disk_free,
+            net_sent=net_sent,
+            net_recv=net_recv,
+            net_sent_rate=sent_rate,
+            net_recv_rate=recv_rate,
+            process_rss=rss,
+            process_cpu_percent=process_cpu,
+            process_fds=fds,
+            process_threads=threads
+        )
+
+        with self._lock:
+            self.samples.append(sample)
+            self.latest = sample
+        return sample
+
+    def history(self, seconds: Optional[float] = None) -> List[SystemSample]:
+        """最近 seconds 秒内的采样（默认全部）"""
+        with self._lock:
+            samples = list(self.samples)
+        if seconds is None:
+            return samples
+        cutoff = time.time() - seconds
+        return [sample for sample in samples if sample.timestamp >= cutoff]
\ No newline at end of file
@@ -0,0 +1,224 @@
+"""
+多分辨率时间序列服务
+"""
+
+import time
+import logging
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class Resolution(NamedTuple):
+    """时间序列分辨率"""
+    name: str
+    size: int  # 桶大小（秒）
+    period: int  # 每个 Redis 键覆盖的时长（秒）
+    retention: int  # 保留时长（秒）
+
+
+# 从细到粗排列，汇总方向为 分钟 -> 小时 -> 天
+RESOLUTIONS = [
+    Resolution("1m", 60, 3600, 26 * 3600),
+    Resolution("1h", 3600, 86400, 32 * 86400),
+    Resolution("1d", 86400, 32 * 86400, 400 * 86400),
+]
+
+Part = Tuple[Resolution, int, int]
+
+
+class TimeSeriesStore:
+    """多分辨率时间序列存储
+
+    写入只落到分钟桶，汇总任务把分钟桶加总成小时桶、小时桶加总成天桶。
+    汇总是覆盖写，可以重复执行，多个副本同时汇总也不会重复计数。
+    Redis 中每个分辨率按周期分键（一个哈希表），键自带过期时间；内存中
+    超过保留时长的桶在汇总时删除。查询自动选择满足步长的最粗分辨率，
+    最近两个可能尚未汇总完成的桶用更细的分辨率现算。
+    """
+
+    def __init__(self, prefix: str = "ts"):
+        self.prefix = prefix
+        self.utc_offset = time.localtime().tm_gmtoff  # 小时/天按本地时间对齐
+        self.metrics: Set[str] = set()
+
+        # 内存数据：分辨率 -> 指标 -> {桶起始时间: 值}
+        self.local: Dict[str, Dict[str, Dict[int, float]]] = {res.name: {} for res in RESOLUTIONS}
+        self._last_bucket = 0
+
+    def align(self, ts: float, size: int) -> int:
+        """把时间戳对齐到桶起始时间"""
+        return int((ts + self.utc_offset) // size * size - self.utc_offset)
+
+    def key(self, metric: str, res: Resolution, bucket: int) -> str:
+        """桶所在的 Redis 键"""
+        return f"{self.prefix}:{metric}:{res.name}:{self.align(bucket, res.period)}"
+
+    # ------------------------------------------------------------------
+    # 写入与汇总
+    # ------------------------------------------------------------------
+
+    def record(self, metric: str, count: int = 1, ts: Optional[float] = None, buffer=None):
+        """记录计数；传入 StatsBuffer 时同时写入 Redis"""
+        ts = ts if ts is not None else time.time()
+        minute = RESOLUTIONS[0]
+        bucket = self.align(ts, minute.size)
+
+        self.metrics.add(metric)
+        series = self.local[minute.name].setdefault(metric, {})
+        series[bucket] = series.get(bucket, 0) + count
+
+        # 每进入新的一分钟汇总一次内存数据
+        if bucket != self._last_bucket:
+            self._last_bucket = bucket
+            self.rollup_local(ts)
+
+        if buffer is not None:
+            key = self.key(metric, minute, bucket)
+            buffer.hincrby(key, str(bucket), count)
+            buffer.expire(key, minute.retention + minute.period)
+
+    def _recent_buckets(self, res: Resolution, now: float, since: Optional[float] = None) -> List[int]:
+        """需要（重新）汇总的桶：默认为上一个和当前这个，或从 since 开始的所有桶"""
+        current = self.align(now, res.size)
+        first = self.align(since, res.size) if since is not None else current - res.size
+        return list(range(first, current + 1, res.size))
+
+    def rollup_local(self, now: Optional[float] = None):
+        """汇总内存数据并删除过期的桶"""
+        now = now if now is not None else time.time()
+
+        for fine, coarse in zip(RESOLUTIONS, RESOLUTIONS[1:]):
+            for metric, series in self.local[fine.name].items():
+                target = self.local[coarse.name].setdefault(metric, {})
+                for bucket in self._recent_buckets(coarse, now):
+                    total = sum(v for ts, v in series.items() if bucket <= ts < bucket + coarse.size)
+                    if total:
+                        target[bucket] = total
+
+        for res in RESOLUTIONS:
+            cutoff = now - res.retention
+            for series in self.local[res.name].values():
+                for bucket in [bucket for bucket in series if bucket < cutoff]:
+                    del series[bucket]
+
+    async def rollup_redis(self, redis, now: Optional[float] = None, catch_up: bool = False) -> bool:
+        """汇总 Redis 中的数据（每层一次读管道 + 一次写管道）
+
+        catch_up=True 时汇总细粒度数据保留期内的所有桶，用于启动时补上停机期间漏掉的汇总。
+        还没有记录过任何指标时不做汇总，返回 False。
+        """
+        now = now if now is not None else time.time()
+        metrics = sorted(self.metrics)
+        if not metrics:
+            return False
+
+        for fine, coarse in zip(RESOLUTIONS, RESOLUTIONS[1:]):
+            buckets = self._recent_buckets(coarse, now, now - fine.retention if catch_up else None)
+            start, end = buckets[0], buckets[-1] + coarse.size
+            parts = [(fine, start, end)]
+            values = await self._read_redis(redis, metrics, parts)
+
+            pipe = redis.pipeline(transaction=False)
+            for metric, series in zip(metrics, values):
+                for bucket in buckets:
+                    total = sum(v for ts, v in series.items() if bucket <= ts < bucket + coarse.size)
+                    if total:
+                        key = self.key(metric, coarse, bucket)
+                        pipe.hset(key, str(bucket), total)
+                        pipe.expire(key, coarse.retention + coarse.period)
+            await pipe.execute()
+        return True
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+
+    def _pick(self, start: int, step: int, now: float) -> Resolution:
+        """选择步长允许、且保留时长覆盖查询起点的最粗分辨率"""
+        for res in reversed(RESOLUTIONS):
+            if step % res.size == 0 and now - start <= res.retention:
+                return res
+        return RESOLUTIONS[0]
+
+    def _plan(self, res: Resolution, start: int, end: int, now: float) -> List[Part]:
+        """拆分查询范围：已汇总的部分用 res，最近两个桶递归使用更细的分辨率"""
+        index = RESOLUTIONS.index(res)
+        if index == 0:
+            return [(res, start, end)]
+
+        fresh = max(start, self.align(now, res.size) - res.size)
+        if fresh >= end:
+            return [(res, start, end)]
+
+        parts = [(res, start, fresh)] if start < fresh else []
+        return parts + self._plan(RESOLUTIONS[index - 1], fresh, end, now)
+
+    def _read_local(self, metric: str, parts: List[Part]) -> Dict[int, float]:
+        values = {}
+        for res, start, end in parts:
+            for bucket, value in self.local[res.name].get(metric, {}).items():
+                if start <= bucket < end:
+                    values[bucket] = values.get(bucket, 0) + value
+        return values
+
+    async def _read_redis(self, redis, metrics: List[str], parts: List[Part]) -> List[Dict[int, float]]:
+        """在一个管道中读取多个指标的多段数据"""
+        pipe = redis.pipeline(transaction=False)
+        layout = []
+        for metric in metrics:
+            for res, start, end in parts:
+                for period in range(self.align(start, res.period), end, res.period):
+                    pipe.hgetall(self.key(metric, res, period))
+                    layout.append((metric, start, end))
+
+        results = await pipe.execute()
+
+        values = {metric: {} for metric in metrics}
+        for (metric, start, end), fields in zip(layout, results):
+            series = values[metric]
+            for bucket, value in (fields or {}).items():
+                bucket = int(bucket)
+                if start <= bucket < end:
+                    series[bucket] = series.get(bucket, 0) + float(value)
+        return [values[metric] for metric in metrics]
+
+    def _prepare(self, start: float, end: float, step: int, now: float) -> Tuple[int, int, List[Part]]:
+        res = self._pick(int(start), step, now)
+        start = self.align(start, step)
+        end = int(end)
+        return start, end, self._plan(res, self.align(start, res.size), end, now)
+
+    def _group(self, values: Dict[int, float], start: int, end: int, step: int) -> List[Tuple[int, float]]:
+        """把细粒度桶合并成步长为 step 的序列（缺失的桶补 0）"""
+        series = {bucket: 0 for bucket in range(start, end, step)}
+        for ts, value in values.items():
+            bucket = start + (ts - start) // step * step
+            if bucket in series:
+                series[bucket] += value
+        return sorted(series.items())
+
+    def query_local(self, metric: str, start: float, end: float, step: int) -> List[Tuple[int, float]]:
+        """查询内存数据，返回 [(桶起始时间, 值), ...]"""
+        now = time.time()
+        start, end, parts = self._prepare(start, end, step, now)
+        return self._group(self._read_local(metric, parts), start, end, step)
+
+    async def query(self, metric: str, start: float, end: float, step: int, redis=None) -> List[Tuple[int, float]]:
+        """查询时间序列（如最近 6 小时每 5 分钟的消息数），有 Redis 连接时从 Redis 读取"""
+        if redis is None:
+            return self.query_local(metric, start, end, step)
+
+        now = time.time()
+        start, end, parts = self._prepare(start, end, step, now)
+        values = (await self._read_redis(redis, [metric], parts))[0]
+        return self._group(values, start, end, step)
+
+    async def total(self, metric: str, start: float, end: float, redis=None) -> float:
+        """统计时间范围内的总和"""
+        step = next(
+            (res.size for res in reversed(RESOLUTIONS)
+             if res.size <= end - start and self.align(start, res.size) == int(start)),
+            RESOLUTIONS[0].size
+        )
+        return sum(value for _, value in await self.query(metric, start, end, step, redis))
\ No newline at end of file
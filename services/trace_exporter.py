@@ -0,0 +1,126 @@
+"""
+OTLP 追踪文件导出服务
+"""
+
+import json
+import asyncio
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+STATUS_CODE_ERROR = 2
+
+
+def _any_value(value) -> Dict:
+    """Python 值转换为 OTLP AnyValue"""
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _attributes(attributes: Dict) -> List[Dict]:
+    return [{"key": key, "value": _any_value(value)} for key, value in attributes.items()]
+
+
+class OTLPFileExporter:
+    """OTLP JSON 文件导出器
+
+    结束的追踪先放入内存队列，后台任务每隔 interval 秒在线程中把队列写成一行
+    ExportTraceServiceRequest JSON（与 OpenTelemetry Collector 的 file exporter
+    格式相同，可以直接用 otlpjsonfile receiver 读取）。队列超过 max_pending
+    条时丢弃新的追踪，不阻塞请求处理。
+    """
+
+    def __init__(self, path: str, service_name: str = "tg-aibot", interval: float = 5.0,
+                 max_pending: int = 10000):
+        self.path = Path(path)
+        self.service_name = service_name
+        self.interval = interval
+        self.max_pending = max_pending
+
+        self.pending = []
+        self._task: Optional[asyncio.Task] = None
+
+        self.exported = 0
+        self.dropped = 0
+
+    def export(self, trace):
+        """加入导出队列（请求处理路径上调用，只做追加）"""
+        if len(self.pending) >= self.max_pending:
+            self.dropped += 1
+            return
+        self.pending.append(trace)
+
+    def start(self):
+        """启动后台写入任务"""
+        if self._task is None or self._task.done():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._task = asyncio.create_task(self._flush_loop())
+            logger.info(f"🔍 追踪导出已启用: {self.path}")
+
+    async def stop(self):
+        """停止后台任务并写出剩余的追踪"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        await self.flush()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"导出追踪失败: {e}")
+
+    async def flush(self):
+        """写出队列中的追踪"""
+        if not self.pending:
+            return
+        traces, self.pending = self.pending, []
+        line = json.dumps(self.encode(traces), ensure_ascii=False, separators=(",", ":"))
+        await asyncio.to_thread(self._append, line)
+        self.exported += len(traces)
+
+    def _append(self, line: str):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line + "\n")
+
+    def encode(self, traces) -> Dict:
+        """编码为 OTLP/JSON 的 ExportTraceServiceRequest"""
+        spans = []
+        for trace in traces:
+            for span in trace.spans:
+                item = {
+                    "traceId": trace.trace_id,
+                    "spanId": span.span_id,
+                    "name": span.name,
+                    "kind": SPAN_KIND_INTERNAL if span.parent_id else SPAN_KIND_SERVER,
+                    "startTimeUnixNano": str(span.start_ns),
+                    "endTimeUnixNano": str(span.end_ns),
+                    "attributes": _attributes(span.attributes)
+                }
+                if span.parent_id:
+                    item["parentSpanId"] = span.parent_id
+                if span.error:
+                    item["status"] = {"code": STATUS_CODE_ERROR, "message": span.error}
+                spans.append(item)
+
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": _attributes({"service.name": self.service_name})},
+                "scopeSpans": [{"scope": {"name": "tgbot.tracing"}, "spans": spans}]
+            }]
+        }
\ No newline at end of file
@@ -6,8 +6,9 @@ import json
 import logging
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from telegram import User
+from utils.tracing import span
 
 logger = logging.getLogger(__name__)
 
@@ -15,11 +16,27 @@ logger = logging.getLogger(__name__)
 class UserService:
     """用户管理服务类"""
 
-    def __init__(self, data_file: str = "data/users.json"):
+    # 用户等级：(最低消息数, 等级名称, 速率限制额度倍数)
+    #
+    # 每次操作扣除的额度 = 操作消耗 / 倍数。按默认 RATE_LIMIT_MESSAGES=20、RATE_LIMIT_WINDOW=60，
+    # 普通短消息消耗 1（更长的消息每 RATE_LIMIT_TOKENS_PER_UNIT 个 token 计 1），
+    # 各等级每分钟可发送的短消息数依次为 100 / 80 / 60 / 40 / 30 / 20；
+    # 命令消耗 0.25，语音 3，图片 5，文档 0.5，同样除以倍数。
+    USER_LEVELS = [
+        (5000, "🏆 传奇大师", 5.0),
+        (2000, "💎 钻石专家", 4.0),
+        (1000, "🥇 黄金高手", 3.0),
+        (500, "🥈 白银达人", 2.0),
+        (100, "🥉 青铜新手", 1.5),
+        (0, "🌱 初来乍到", 1.0),
+    ]
+
+    def __init__(self, data_file: str = "data/users.json", history_file: str = "data/conversations.json"):
         self.data_file = Path(data_file)
         self.data_file.parent.mkdir(parents=True, exist_ok=True)
+        self.history_file = Path(history_file)
         self.users_data = self.load_users_data()
-        self.conversation_history = {}
+        self.conversation_history = self.load_conversation_history()
 
     def load_users_data(self) -> Dict:
         """加载用户数据"""
@@ -32,14 +49,34 @@ class UserService:
                 return {}
         return {}
 
+    def dump_users_data(self):
+        """写入用户数据文件（同步，失败时抛出异常；关闭时在线程中调用）"""
+        with span("user.save", users=len(self.users_data)), \
+                open(self.data_file, 'w', encoding='utf-8') as f:
+            json.dump(self.users_data, f, ensure_ascii=False, indent=2)
+
     async def save_users_data(self):
         """保存用户数据"""
         try:
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(self.users_data, f, ensure_ascii=False, indent=2)
+            self.dump_users_data()
         except Exception as e:
             logger.error(f"保存用户数据失败: {e}")
 
+    def load_conversation_history(self) -> Dict:
+        """加载上次关闭时保存的对话历史"""
+        if self.history_file.exists():
+            try:
+                with open(self.history_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except Exception as e:
+                logger.error(f"加载对话历史失败: {e}")
+        return {}
+
+    def dump_conversation_history(self):
+        """写入对话历史文件（同步，失败时抛出异常；关闭时在线程中调用）"""
+        with open(self.history_file, 'w', encoding='utf-8') as f:
+            json.dump(self.conversation_history, f, ensure_ascii=False)
+
     async def register_user(self, user: User):
         """注册用户"""
         user_id = str(user.id)
@@ -85,6 +122,10 @@ class UserService:
 
     async def update_user_activity(self, user_id: int):
         """更新用户活动"""
+        with span("user.update_activity"):
+            await self._update_user_activity(user_id)
+
+    async def _update_user_activity(self, user_id: int):
         user_id_str = str(user_id)
         current_time = datetime.now()
         today = current_time.date().isoformat()
@@ -144,18 +185,19 @@ class UserService:
 
     def calculate_user_level(self, total_messages: int) -> str:
         """计算用户等级"""
-        if total_messages >= 5000:
-            return "🏆 传奇大师"
-        elif total_messages >= 2000:
-            return "💎 钻石专家"
-        elif total_messages >= 1000:
-            return "🥇 黄金高手"
-        elif total_messages >= 500:
-            return "🥈 白银达人"
-        elif total_messages >= 100:
-            return "🥉 青铜新手"
-        else:
-            return "🌱 初来乍到"
+        return self._get_level(total_messages)[1]
+
+    def get_rate_limit_multiplier(self, user_id: int) -> float:
+        """获取用户等级对应的速率限制额度倍数"""
+        total_messages = self.users_data.get(str(user_id), {}).get('total_messages', 0)
+        return self._get_level(total_messages)[2]
+
+    def _get_level(self, total_messages: int) -> Tuple[int, str, float]:
+        """查找消息数对应的等级"""
+        for level in self.USER_LEVELS:
+            if total_messages >= level[0]:
+                return level
+        return self.USER_LEVELS[-1]
 
     def calculate_user_badges(self, user_data: Dict) -> str:
         """计算用户徽章"""
@@ -0,0 +1,82 @@
+"""
+管理面板快照测试
+"""
+
+import asyncio
+
+import pytest
+
+from services import admin_snapshots
+from services.admin_snapshots import AdminSnapshotService, Snapshot
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """可控的当前时间"""
+    now = [1000.0]
+    monkeypatch.setattr(admin_snapshots.time, "time", lambda: now[0])
+    return now
+
+
+def test_content_key_changes_only_when_age_bucket_changes(clock):
+    snapshot = Snapshot("状态", 1, 1000.0)
+    key = snapshot.content_key
+
+    clock[0] = 1000.0 + Snapshot.AGE_STEP - 0.1
+    assert snapshot.content_key == key  # 显示的年龄没变，面板不需要重新编辑
+
+    clock[0] = 1000.0 + Snapshot.AGE_STEP
+    assert snapshot.content_key != key
+    assert "约10秒前" in snapshot.render()
+
+
+def test_content_key_changes_with_version_or_capture_time(clock):
+    key = Snapshot("状态", 1, 1000.0).content_key
+    assert Snapshot("状态", 2, 1000.0).content_key != key
+    assert Snapshot("状态", 1, 1001.0).content_key != key
+
+
+def make_service(texts):
+    service = AdminSnapshotService(bot=None, interval=5, idle_timeout=60)
+    texts = iter(texts)
+
+    async def render():
+        return next(texts)
+
+    service.renderers = {"status": render}
+    service._locks = {"status": asyncio.Lock()}
+    return service
+
+
+def test_refresh_bumps_version_only_when_text_changes(clock):
+    service = make_service(["A", "A", "B"])
+
+    async def run():
+        first = await service.refresh("status")
+        clock[0] += 1
+        same = await service.refresh("status")
+        clock[0] += 1
+        changed = await service.refresh("status")
+        return first, same, changed
+
+    first, same, changed = asyncio.run(run())
+    assert (first.version, same.version, changed.version) == (1, 1, 2)
+    # 文本相同时版本号不变，但采集时间更新，面板上的数据时间仍会重新渲染
+    assert same.content_key != first.content_key
+
+
+def test_get_serves_cached_snapshot_within_two_intervals(clock):
+    service = make_service(["A", "B"])
+
+    async def run():
+        first = await service.get("status")
+        clock[0] += service.interval * 2
+        cached = await service.get("status")
+        clock[0] += 1
+        stale = await service.get("status")
+        return first, cached, stale
+
+    first, cached, stale = asyncio.run(run())
+    assert cached is first
+    assert stale.text == "B"
+    assert (service.hits, service.misses) == (1, 2)
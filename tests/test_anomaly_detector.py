@@ -0,0 +1,132 @@
+"""
+异常检测测试
+"""
+
+import asyncio
+
+from services.anomaly_detector import AnomalyDetector
+
+
+class FakeMonitor:
+    """只提供异常检测读取的累计计数器"""
+
+    def __init__(self):
+        self.request_count = 0
+        self.error_count = 0
+        self.upstream_status = {}
+
+    def get_latency_stats(self, name, window):
+        return {'p95': 0.0, 'count': 0}
+
+
+def make_detector(notify=None):
+    async def ignore(text):
+        pass
+
+    monitor = FakeMonitor()
+    detector = AnomalyDetector(monitor, notify or ignore, warmup=5, trigger_count=3, min_samples=20)
+    detector.evaluate(now=0)  # 记下初始计数
+    return monitor, detector
+
+
+def step(monitor, detector, now, errors):
+    """模拟一个周期：100 次请求，其中 errors 次出错"""
+    monitor.request_count += 100
+    monitor.error_count += errors
+    return detector.evaluate(now=now)
+
+
+def names(states):
+    return [state.signal.name for state in states]
+
+
+def test_no_alert_during_warmup():
+    monitor, detector = make_detector()
+    for i in range(1, 5):
+        result = step(monitor, detector, i * 60, 50)
+        assert not result['fired']
+    assert detector.states['error_rate'].expected is None
+
+
+def test_fires_after_consecutive_breaches_and_recovers():
+    monitor, detector = make_detector()
+    now = 0
+    for i in range(20):
+        now += 60
+        step(monitor, detector, now, 1 + i % 2)
+
+    # 连续 trigger_count 个周期异常才告警
+    for i in range(2):
+        now += 60
+        assert not step(monitor, detector, now, 40)['fired']
+    now += 60
+    result = step(monitor, detector, now, 40)
+    assert names(result['fired']) == ['error_rate']
+    state = detector.states['error_rate']
+    assert state.active and state.since == now
+    assert detector.alerts_fired == 1
+
+    # 告警期间不重复触发
+    now += 60
+    assert not step(monitor, detector, now, 40)['fired']
+
+    # 连续 trigger_count 个周期正常才恢复
+    for i in range(2):
+        now += 60
+        assert not step(monitor, detector, now, 1)['recovered']
+    now += 60
+    result = step(monitor, detector, now, 1)
+    assert names(result['recovered']) == ['error_rate']
+    assert not state.active
+
+
+def test_single_spike_does_not_fire():
+    monitor, detector = make_detector()
+    now = 0
+    for i in range(20):
+        now += 60
+        step(monitor, detector, now, 1 + i % 2)
+
+    for errors in (40, 1, 40, 2, 40, 1):
+        now += 60
+        assert not step(monitor, detector, now, errors)['fired']
+    assert detector.alerts_fired == 0
+
+
+def test_small_deviation_below_min_delta_is_ignored():
+    """偏离超过 z 阈值但小于最小绝对偏离量时不算异常"""
+    monitor, detector = make_detector()
+    now = 0
+    for i in range(20):
+        now += 60
+        step(monitor, detector, now, 1 + i % 2)
+
+    for _ in range(5):
+        now += 60
+        assert not step(monitor, detector, now, 5)['fired']
+
+
+def test_check_sends_notification():
+    sent = []
+
+    async def notify(text):
+        sent.append(text)
+
+    monitor, detector = make_detector(notify)
+    now = 0
+    for i in range(20):
+        now += 60
+        step(monitor, detector, now, 1 + i % 2)
+
+    async def spike():
+        nonlocal now
+        for _ in range(3):
+            now += 60
+            monitor.request_count += 100
+            monitor.error_count += 40
+            await detector.check(now=now)
+
+    asyncio.run(spike())
+    assert len(sent) == 1
+    assert "性能异常告警" in sent[0] and "错误率" in sent[0]
+    assert detector.notifications_sent == 1
@@ -0,0 +1,40 @@
+"""
+机器人核心模块测试
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("telegram")
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+def run_python(code: str) -> str:
+    """在新的解释器中运行代码（不受其他测试已导入模块的影响）"""
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, timeout=60
+    )
+    assert result.returncode == 0, result.stderr
+    return result.stdout
+
+
+def test_import_core_bot():
+    """core.bot 及其导入的处理器、装饰器可以正常导入"""
+    output = run_python("import core.bot; print(core.bot.TelegramAIBot.__name__)")
+    assert output.strip() == "TelegramAIBot"
+
+
+def test_monitoring_services_are_imported_lazily():
+    """导入 core.bot 时不导入监控服务模块，首次访问对应属性时才导入"""
+    output = run_python(
+        "import sys, core.bot\n"
+        "print(sorted(name for name in sys.modules if name.startswith('services.')))"
+    )
+    for module in ("system_monitor", "loop_monitor", "memory_diagnostics", "profiler",
+                   "anomaly_detector", "metrics_exporter", "admin_snapshots", "realtime_stats"):
+        assert f"services.{module}" not in output
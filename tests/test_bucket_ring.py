@@ -0,0 +1,64 @@
+"""
+环形时间分桶计数器测试
+"""
+
+import pytest
+
+from utils.bucket_ring import TimeBucketRing
+
+
+def test_records_into_current_bucket():
+    ring = TimeBucketRing(60, 10, utc_offset=0)
+    ring.record(0.5, now=600)
+    ring.record(1.5, is_error=True, now=659)
+
+    assert ring.series(1, now=659) == [(600, 2, 1, 2.0)]
+    assert ring.totals(10, now=659) == (2, 1, 2.0)
+
+
+def test_series_fills_missing_buckets_with_zero():
+    ring = TimeBucketRing(60, 10, utc_offset=0)
+    ring.record(0.1, now=600)
+    ring.record(0.2, now=780)
+
+    assert ring.series(4, now=780) == [
+        (600, 1, 0, 0.1),
+        (660, 0, 0, 0.0),
+        (720, 0, 0, 0.0),
+        (780, 1, 0, 0.2),
+    ]
+
+
+def test_wraparound_reuses_slot_and_clears_old_data():
+    """转过一整圈后写入同一槽位时清零上一轮的数据"""
+    ring = TimeBucketRing(60, 10, utc_offset=0)
+    ring.record(1.0, is_error=True, now=0)
+    ring.record(2.0, now=600)  # 同一槽位，下一圈
+
+    assert ring.series(1, now=600) == [(600, 1, 0, 2.0)]
+    assert ring.totals(10, now=600) == (1, 0, 2.0)
+
+
+def test_stale_slots_are_not_reported_after_wraparound():
+    """槽位中是旧一轮的数据时按 0 返回，不会被当成当前窗口的数据"""
+    ring = TimeBucketRing(60, 10, utc_offset=0)
+    for minute in range(10):
+        ring.record(0.1, now=minute * 60)
+
+    # 15 分钟后，只有第 6~9 分钟的桶仍在最近 10 个桶内
+    now = 15 * 60
+    assert ring.totals(10, now=now) == (4, 0, pytest.approx(0.4))
+
+
+def test_series_is_capped_at_ring_size():
+    ring = TimeBucketRing(60, 10, utc_offset=0)
+    assert len(ring.series(100, now=6000)) == 10
+
+
+def test_utc_offset_aligns_bucket_start():
+    """桶按本地时间对齐，起始时间仍返回 UTC 时间戳"""
+    ring = TimeBucketRing(3600, 24, utc_offset=8 * 3600)
+    ring.record(0.1, now=3600 * 100 + 10)
+    start = ring.series(1, now=3600 * 100 + 10)[0][0]
+    assert (start + ring.utc_offset) % 3600 == 0
+    assert start <= 3600 * 100 + 10 < start + 3600
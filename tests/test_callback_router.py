@@ -0,0 +1,58 @@
+"""
+回调路由表测试
+"""
+
+from utils.callback_router import CallbackRouter
+
+
+async def help_menu(*args):
+    pass
+
+
+async def help_category(*args):
+    pass
+
+
+async def admin_action(*args):
+    pass
+
+
+def make_router():
+    router = CallbackRouter()
+    router.exact("help", help_menu)
+    router.prefix("help", help_category)
+    router.prefix("admin", admin_action)
+    return router
+
+
+def test_exact_route_takes_precedence_over_prefix():
+    assert make_router().resolve("help") == (help_menu, ())
+
+
+def test_prefix_route_passes_rest_as_argument():
+    router = make_router()
+    assert router.resolve("help_commands") == (help_category, ("commands",))
+    # 只按第一个分隔符拆分，剩余部分原样作为参数
+    assert router.resolve("admin_memory_snapshot") == (admin_action, ("memory_snapshot",))
+    assert router.resolve("admin_") == (admin_action, ("",))
+
+
+def test_prefix_requires_separator():
+    """没有分隔符时不做前缀匹配，也不匹配前缀的前缀"""
+    router = make_router()
+    assert router.resolve("admin") == (None, ())
+    assert router.resolve("helpme") == (None, ())
+    assert router.resolve("adm_status") == (None, ())
+
+
+def test_unknown_and_empty_data():
+    router = make_router()
+    assert router.resolve("unknown_action") == (None, ())
+    assert router.resolve("") == (None, ())
+
+
+def test_custom_separator():
+    router = CallbackRouter(separator=":")
+    router.prefix("admin", admin_action)
+    assert router.resolve("admin:status") == (admin_action, ("status",))
+    assert router.resolve("admin_status") == (None, ())
@@ -0,0 +1,107 @@
+"""
+群组消息预过滤器测试
+"""
+
+from datetime import datetime, timezone
+
+import pytest
+
+pytest.importorskip("telegram")
+
+from telegram import Chat, Message, MessageEntity, Update, User
+from telegram.ext import filters
+
+from utils.filters import AddressedToBotFilter
+
+BOT = User(id=100, first_name="Bot", is_bot=True, username="AiHelperBot")
+ALICE = User(id=1, first_name="Alice", is_bot=False)
+GROUP = Chat(id=-1001, type=Chat.SUPERGROUP)
+
+
+def mentions(text: str, entity_type=MessageEntity.MENTION):
+    """为文本中每个 @username 生成实体（偏移按 UTF-16 计算）"""
+    entities = []
+    for word in text.split():
+        if word.startswith("@") or word.startswith("/"):
+            prefix = text[:text.index(word)]
+            offset = len(prefix.encode("utf-16-le")) // 2
+            kind = MessageEntity.BOT_COMMAND if word.startswith("/") else entity_type
+            entities.append(MessageEntity(kind, offset, len(word.encode("utf-16-le")) // 2))
+    return entities
+
+
+def make_message(text=None, caption=None, reply_to=None, message_id=1):
+    return Message(
+        message_id, datetime.now(timezone.utc), GROUP, from_user=ALICE,
+        text=text, entities=mentions(text) if text else None,
+        caption=caption, caption_entities=mentions(caption) if caption else None,
+        reply_to_message=reply_to
+    )
+
+
+@pytest.fixture
+def group_filter():
+    group_filter = AddressedToBotFilter()
+    group_filter.set_bot(BOT)
+    return group_filter
+
+
+def test_mention_matches_case_insensitively(group_filter):
+    assert group_filter.filter(make_message("@aihelperbot 你好"))
+    assert group_filter.filter(make_message("请问 @AIHELPERBOT 在吗"))
+
+
+def test_mention_after_emoji_uses_utf16_offsets(group_filter):
+    """表情符号占两个 UTF-16 单位，实体偏移仍能正确解析"""
+    assert group_filter.filter(make_message("👋👋 @AiHelperBot 你好"))
+
+
+def test_other_mentions_and_plain_text_are_filtered(group_filter):
+    assert not group_filter.filter(make_message("@SomeoneElse 你好"))
+    assert not group_filter.filter(make_message("@AiHelperBot2 你好"))
+    assert not group_filter.filter(make_message("邮件发到 bot@AiHelperBot 吧"))  # 没有提及实体
+    assert not group_filter.filter(make_message("大家好"))
+
+
+def test_caption_mention_matches(group_filter):
+    assert group_filter.filter(make_message(caption="看看这张图 @AiHelperBot"))
+    assert not group_filter.filter(make_message(caption="看看这张图"))
+
+
+def test_reply_to_bot_matches_without_mention(group_filter):
+    bot_message = Message(10, datetime.now(timezone.utc), GROUP, from_user=BOT, text="回答")
+    user_message = Message(11, datetime.now(timezone.utc), GROUP, from_user=ALICE, text="别人")
+
+    assert group_filter.filter(make_message("继续说", reply_to=bot_message))
+    assert not group_filter.filter(make_message("继续说", reply_to=user_message))
+
+
+def test_nothing_passes_before_bot_identity_is_known():
+    group_filter = AddressedToBotFilter()
+    assert not group_filter.filter(make_message("@AiHelperBot 你好"))
+
+
+def test_commands_go_to_command_handlers(group_filter):
+    """群聊中 /命令@机器人 由命令处理器处理，不进入普通消息处理器"""
+    text_filter = filters.TEXT & ~filters.COMMAND & (filters.ChatType.PRIVATE | group_filter)
+
+    command = make_message("/help@AiHelperBot")
+    assert not text_filter.check_update(Update(1, message=command))
+    assert filters.COMMAND.check_update(Update(2, message=command))
+
+    mention = make_message("@AiHelperBot /help 是什么")
+    assert text_filter.check_update(Update(3, message=mention))
+
+
+def test_stats_and_timings(group_filter):
+    passed = make_message("@AiHelperBot 你好", message_id=5)
+    group_filter.filter(passed)
+    group_filter.filter(make_message("大家好", message_id=6))
+
+    stats = group_filter.get_stats()
+    assert (stats['checked'], stats['passed'], stats['filtered']) == (2, 1, 1)
+    assert stats['filter_rate'] == 50.0
+
+    started, finished = group_filter.pop_timing(passed)
+    assert started <= finished
+    assert group_filter.pop_timing(passed) is None
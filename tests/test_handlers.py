@@ -0,0 +1,47 @@
+"""
+处理器装饰器测试
+"""
+
+import inspect
+
+import pytest
+
+pytest.importorskip("telegram")
+
+from core.handlers.callbacks import CallbackHandlers
+from core.handlers.commands import CommandHandlers
+from core.handlers.media import MediaHandlers
+from core.handlers.messages import MessageHandlers
+from utils.decorators import monitor_performance, track_inflight
+
+
+async def _noop(self, update, context):
+    pass
+
+
+def wrapped_by(func, decorator) -> bool:
+    """func 的 __wrapped__ 链中是否有 decorator 生成的包装函数"""
+    code = decorator(_noop).__code__
+    while hasattr(func, "__wrapped__"):
+        if func.__code__ is code:
+            return True
+        func = func.__wrapped__
+    return False
+
+
+def entry_points():
+    """所有注册给 Application 的处理器（带 track_inflight 的方法）"""
+    for cls in (CommandHandlers, MessageHandlers, MediaHandlers, CallbackHandlers):
+        for name, func in inspect.getmembers(cls, inspect.iscoroutinefunction):
+            if wrapped_by(func, track_inflight):
+                yield f"{cls.__name__}.{name}", func
+
+
+def test_entry_points_exist():
+    assert len(list(entry_points())) >= 4
+
+
+@pytest.mark.parametrize("name, func", list(entry_points()))
+def test_handlers_feed_monitor_and_stats(name, func):
+    """每个处理器都经过 monitor_performance，请求计入系统监控并写入统计缓冲"""
+    assert wrapped_by(func, monitor_performance), name
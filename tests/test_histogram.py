@@ -0,0 +1,78 @@
+"""
+延迟直方图测试
+"""
+
+import random
+
+import pytest
+
+from utils.histogram import LatencyHistogram
+
+
+def test_small_values_have_exact_buckets():
+    """小于 2^sub_bucket_bits 微秒的值逐一分桶"""
+    hist = LatencyHistogram()
+    for value in range(hist.sub_bucket_count):
+        assert hist._index(value) == value
+        assert hist._upper(value) == value
+
+
+def test_upper_bound_contains_value():
+    """每个值落在的桶上界不小于它，且相对误差在精度范围内"""
+    hist = LatencyHistogram()
+    max_error = 1 / 2 ** (hist.sub_bucket_bits - 1)
+    for value in [64, 65, 127, 128, 129, 1000, 4095, 4096, 123_456, 999_999, hist.highest_us]:
+        upper = hist._upper(hist._index(value))
+        assert upper >= value
+        assert (upper - value) / value <= max_error
+
+
+def test_buckets_are_contiguous():
+    """相邻桶的区间首尾相接，没有空洞和重叠"""
+    hist = LatencyHistogram()
+    top = hist._index(hist.highest_us)
+    for index in range(hist.sub_bucket_count, top):
+        assert hist._index(hist._upper(index)) == index
+        assert hist._index(hist._upper(index) + 1) == index + 1
+
+
+def test_index_of_clamps_out_of_range_values():
+    hist = LatencyHistogram()
+    assert hist.index_of(-1.0) == 0
+    assert hist.index_of(10 ** 6) == hist._index(hist.highest_us)
+
+
+def test_percentiles_of_empty_histogram():
+    assert LatencyHistogram().percentiles([0.5, 0.99]) == {0.5: 0.0, 0.99: 0.0}
+
+
+def test_percentiles_match_exact_values():
+    """分位数（取桶上界）与精确值的相对误差不超过精度"""
+    rng = random.Random(1)
+    values = sorted(rng.lognormvariate(-3, 1) for _ in range(10_000))
+    hist = LatencyHistogram()
+    for value in values:
+        hist.record(value)
+
+    result = hist.percentiles([0.99, 0.5, 0.95])
+    assert list(result) == [0.5, 0.95, 0.99]
+    for q, estimate in result.items():
+        exact = values[int(q * len(values)) - 1]
+        assert estimate >= exact
+        assert estimate == pytest.approx(exact, rel=1 / 2 ** (hist.sub_bucket_bits - 1))
+    assert hist.mean == pytest.approx(sum(values) / len(values))
+
+
+def test_subtract_undoes_add():
+    a, b = LatencyHistogram(), LatencyHistogram()
+    for seconds in (0.001, 0.01, 0.1):
+        a.record(seconds)
+    b.record(2.0)
+
+    a.add(b)
+    assert a.total == 4
+    assert a.percentile(1.0) >= 2.0
+
+    a.subtract(b)
+    assert a.total == 3
+    assert a.percentile(1.0) == pytest.approx(0.1, rel=0.04)
@@ -0,0 +1,55 @@
+"""
+HyperLogLog 测试
+"""
+
+import pytest
+
+from utils.hyperloglog import HyperLogLog
+
+
+def test_empty_counter_is_zero():
+    assert HyperLogLog().count() == 0
+
+
+def test_small_cardinality_is_nearly_exact():
+    """小基数时使用线性计数，几乎精确"""
+    hll = HyperLogLog()
+    for i in range(1000):
+        hll.add(i)
+    assert abs(hll.count() - 1000) <= 10
+
+
+@pytest.mark.parametrize("n", [20_000, 100_000])
+def test_error_within_bounds(n):
+    """标准误差约 0.81%，3 倍标准误差以内"""
+    hll = HyperLogLog()
+    for i in range(n):
+        hll.add(f"user:{i}")
+    assert abs(hll.count() - n) / n < 3 * 1.04 / (hll.size ** 0.5)
+
+
+def test_duplicates_do_not_change_count():
+    hll = HyperLogLog()
+    for i in range(500):
+        hll.add(i)
+    before = hll.count()
+
+    changed = [hll.add(i) for i in range(500)]
+    assert not any(changed)
+    assert hll.count() == before
+
+
+def test_union_estimates_combined_cardinality():
+    a, b = HyperLogLog(), HyperLogLog()
+    for i in range(30_000):
+        a.add(i)
+    for i in range(15_000, 45_000):
+        b.add(i)
+
+    union = HyperLogLog.union(a, b)
+    assert abs(union.count() - 45_000) / 45_000 < 0.03
+
+
+def test_merge_rejects_different_precision():
+    with pytest.raises(ValueError):
+        HyperLogLog(14).merge(HyperLogLog(12))
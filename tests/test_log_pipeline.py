@@ -0,0 +1,95 @@
+"""
+日志轮转测试
+"""
+
+import gzip
+import logging
+import time
+
+from utils.log_pipeline import CompressingRotatingFileHandler
+
+
+def make_handler(path, **kwargs):
+    handler = CompressingRotatingFileHandler(str(path), **kwargs)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    return handler
+
+
+def emit(handler, message, created=None):
+    record = logging.makeLogRecord({'msg': message, 'levelno': logging.INFO, 'levelname': 'INFO'})
+    if created is not None:
+        record.created = created
+    handler.handle(record)
+
+
+def test_size_rollover_compresses_old_files(tmp_path):
+    path = tmp_path / "bot.log"
+    handler = make_handler(path, max_bytes=100, backup_count=2)
+    try:
+        for i in range(3):
+            emit(handler, f"{i}" * 60)
+    finally:
+        handler.close()
+
+    assert path.read_text(encoding='utf-8') == "2" * 60 + "\n"
+    with gzip.open(tmp_path / "bot.log.1.gz", 'rt', encoding='utf-8') as f:
+        assert f.read() == "1" * 60 + "\n"
+    with gzip.open(tmp_path / "bot.log.2.gz", 'rt', encoding='utf-8') as f:
+        assert f.read() == "0" * 60 + "\n"
+    assert not (tmp_path / "bot.log.1").exists()
+
+
+def test_backup_count_limits_old_files(tmp_path):
+    path = tmp_path / "bot.log"
+    handler = make_handler(path, max_bytes=100, backup_count=2)
+    try:
+        for i in range(6):
+            emit(handler, f"{i}" * 60)
+    finally:
+        handler.close()
+
+    backups = sorted(p.name for p in tmp_path.iterdir() if p.name != "bot.log")
+    assert backups == ["bot.log.1.gz", "bot.log.2.gz"]
+
+
+def test_uncompressed_rollover(tmp_path):
+    path = tmp_path / "bot.log"
+    handler = make_handler(path, max_bytes=100, backup_count=1, compress=False)
+    try:
+        emit(handler, "a" * 60)
+        emit(handler, "b" * 60)
+    finally:
+        handler.close()
+
+    assert (tmp_path / "bot.log.1").read_text(encoding='utf-8') == "a" * 60 + "\n"
+
+
+def test_time_rollover_at_interval_boundary(tmp_path):
+    path = tmp_path / "bot.log"
+    handler = make_handler(path, max_bytes=10_000, backup_count=3, interval=3600)
+    try:
+        # 下一次轮转时间对齐到本地时间的整点
+        assert (handler.rollover_at + handler.utc_offset) % 3600 == 0
+        assert 0 < handler.rollover_at - time.time() <= 3600
+
+        emit(handler, "before")
+        emit(handler, "after", created=handler.rollover_at)
+    finally:
+        handler.close()
+
+    assert path.read_text(encoding='utf-8') == "after\n"
+    with gzip.open(tmp_path / "bot.log.1.gz", 'rt', encoding='utf-8') as f:
+        assert f.read() == "before\n"
+
+
+def test_time_rollover_skips_empty_file(tmp_path):
+    """跨过时间边界时还没写入过内容，不生成空的旧文件"""
+    path = tmp_path / "bot.log"
+    handler = make_handler(path, max_bytes=10_000, backup_count=3, interval=3600)
+    try:
+        emit(handler, "first", created=handler.rollover_at)
+    finally:
+        handler.close()
+
+    assert path.read_text(encoding='utf-8') == "first\n"
+    assert [p.name for p in tmp_path.iterdir()] == ["bot.log"]
@@ -0,0 +1,66 @@
+"""
+事件循环延迟监控测试
+"""
+
+import asyncio
+import time
+
+from services.loop_monitor import PROJECT_ROOT, LoopMonitor
+
+
+def blocking_callback():
+    time.sleep(0.4)
+
+
+def test_watchdog_captures_stack_of_blocking_callback():
+    monitor = LoopMonitor(tick=0.05, slow_threshold=0.1)
+
+    async def run():
+        monitor.start()
+        await asyncio.sleep(0.2)
+        blocking_callback()
+        await asyncio.sleep(0.2)  # 探针恢复后记录阻塞
+        await monitor.stop()
+
+    asyncio.run(run())
+
+    assert monitor.slow_count >= 1
+    report = max(monitor.slow_callbacks, key=lambda item: item.duration)
+    assert report.duration >= 0.3
+    assert report.location.startswith('File "tests/test_loop_monitor.py"')
+    assert "blocking_callback" in report.location
+    assert monitor.max_lag >= 0.3
+    assert report.location in [item['location'] for item in monitor.get_stats()['recent_slow']]
+
+
+def test_capture_from_another_beat_is_ignored():
+    """看门狗抓到的调用栈属于更早的一次心跳时，不算在这次阻塞上"""
+    monitor = LoopMonitor()
+    monitor._captured = (1.0, ['  File "/x.py", line 1, in f\n'])
+    monitor._record_slow_callback(2.0, 0.2)
+
+    report = monitor.slow_callbacks[0]
+    assert report.stack == []
+    assert report.location == "未知（未抓到调用栈）"
+    assert monitor._captured is None
+
+
+def test_locate_prefers_innermost_project_frame():
+    stack = [
+        f'  File "{PROJECT_ROOT}/core/bot.py", line 10, in run\n    handle()\n',
+        f'  File "{PROJECT_ROOT}/services/chat.py", line 20, in handle\n    json.dumps(x)\n',
+        f'  File "{PROJECT_ROOT}/.venv/lib/site-packages/json/encoder.py", line 5, in dumps\n',
+    ]
+    assert LoopMonitor._locate(stack) == 'File "services/chat.py", line 20, in handle'
+    assert LoopMonitor._locate(stack[2:]) == stack[2].strip()
+
+
+def test_lag_is_recorded_in_all_windows():
+    monitor = LoopMonitor()
+    monitor._record_lag(0.02)
+    monitor._record_lag(0.5)
+
+    assert monitor.lag_total.total == 2
+    assert monitor.max_lag == 0.5
+    for window in monitor.lag:
+        assert monitor.get_stats(window)['count'] == 2
@@ -0,0 +1,141 @@
+"""
+内存诊断测试
+"""
+
+import asyncio
+import sys
+
+from services.memory_diagnostics import MemoryDiagnostics, _shallow_copy, deep_sizeof
+
+
+def test_measures_on_view_when_periodic_task_is_off():
+    """定时统计关闭时，查看面板在结果超过一个统计间隔后重新统计"""
+    diagnostics = MemoryDiagnostics(interval=60)
+    data = {}
+    diagnostics.register("data", lambda: data)
+
+    async def main():
+        await diagnostics.ensure_measured()
+        first = diagnostics.measured_at
+
+        data.update({i: i for i in range(100)})
+        await diagnostics.ensure_measured()
+        assert diagnostics.measured_at == first  # 一个间隔内沿用上次结果
+
+        diagnostics.measured_at -= 60
+        sizes = await diagnostics.ensure_measured()
+        assert sizes[0].entries == 100
+
+    asyncio.run(main())
+
+
+def test_periodic_task_results_are_not_remeasured_on_view():
+    diagnostics = MemoryDiagnostics(interval=60)
+    diagnostics.register("data", lambda: {})
+
+    async def main():
+        diagnostics.start()
+        await asyncio.sleep(0.05)
+        measured_at = diagnostics.measured_at
+        assert measured_at
+
+        diagnostics.measured_at = measured_at = measured_at - 120
+        await diagnostics.ensure_measured()
+        assert diagnostics.measured_at == measured_at
+        await diagnostics.stop()
+
+    asyncio.run(main())
+
+
+class Slotted:
+    __slots__ = ("payload", "empty")
+
+    def __init__(self, payload):
+        self.payload = payload
+
+
+class Plain:
+    def __init__(self, payload):
+        self.payload = payload
+        self.callback = test_deep_sizeof_counts_nested_containers  # 函数不计入
+
+
+def test_deep_sizeof_counts_nested_containers():
+    inner = [1.5, 2.5]
+    outer = {"key": inner}
+    expected = (sys.getsizeof(outer) + sys.getsizeof("key") + sys.getsizeof(inner)
+                + sys.getsizeof(1.5) + sys.getsizeof(2.5))
+    assert deep_sizeof(outer) == expected
+
+
+def test_deep_sizeof_counts_shared_objects_once_and_handles_cycles():
+    shared = list(range(100))
+    pair = [shared, shared]
+    assert deep_sizeof(pair) == sys.getsizeof(pair) + deep_sizeof(shared)
+
+    cycle = []
+    cycle.append(cycle)
+    assert deep_sizeof(cycle) == sys.getsizeof(cycle)
+
+
+def test_deep_sizeof_follows_instance_attributes_and_slots():
+    payload = "x" * 1000
+    assert deep_sizeof(Slotted(payload)) >= sys.getsizeof(payload)
+
+    plain = Plain(payload)
+    attributes = vars(plain)
+    assert deep_sizeof(plain) == (sys.getsizeof(plain) + sys.getsizeof(attributes) + sys.getsizeof(payload)
+                                  + sum(sys.getsizeof(key) for key in attributes))
+    assert deep_sizeof(Plain) == 0  # 类本身不计入
+
+
+def test_failed_structure_keeps_previous_size_marked_stale():
+    diagnostics = MemoryDiagnostics()
+    state = {"fail": False}
+    data = list(range(10))
+
+    def getter():
+        if state["fail"]:
+            raise RuntimeError("not ready")
+        return data
+
+    diagnostics.register("data", getter)
+    diagnostics.register("other", lambda: {})
+
+    first = {item.name: item for item in asyncio.run(diagnostics.measure())}
+    assert not first["data"].stale and first["data"].entries == 10
+
+    state["fail"] = True
+    data.extend(range(100))
+    second = {item.name: item for item in asyncio.run(diagnostics.measure())}
+    assert second["data"] == first["data"]._replace(stale=True)
+    assert not second["other"].stale
+    assert diagnostics.get_stats()['stale_structures'] == 1
+
+    state["fail"] = False
+    third = {item.name: item for item in asyncio.run(diagnostics.measure())}
+    assert not third["data"].stale and third["data"].entries == 110
+
+
+def test_structure_never_measured_is_left_out():
+    diagnostics = MemoryDiagnostics()
+
+    def broken():
+        raise RuntimeError("broken")
+
+    diagnostics.register("broken", broken)
+    diagnostics.register("counter", lambda: 42)
+    sizes = asyncio.run(diagnostics.measure())
+
+    assert [item.name for item in sizes] == ["counter"]
+    assert sizes[0].entries is None
+
+
+def test_top_level_is_copied_before_walking_in_thread():
+    """顶层容器在事件循环中浅拷贝，遍历期间原容器被修改不影响本轮结果"""
+    data = {i: i for i in range(10)}
+    copied = _shallow_copy((data, [1, 2]))
+    data[99] = 99
+
+    assert len(copied[0]) == 10
+    assert copied[0] is not data
@@ -0,0 +1,149 @@
+"""
+Prometheus 指标导出测试
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from services.metrics_exporter import CONTENT_TYPE, MetricsExporter
+from services.system_monitor import SystemMonitor
+
+
+class FakeBot:
+    """只提供导出器直接读取的属性；其余服务按未创建处理"""
+
+    def __init__(self, **services):
+        self.group_filter = SimpleNamespace(get_stats=lambda: {'passed': 3, 'filtered': 1})
+        self.shutdown = SimpleNamespace(inflight_count=2)
+        self.application = None
+        self.__dict__.update(services)
+
+
+def render_text(bot) -> str:
+    return MetricsExporter(bot, min_interval=0).render().decode("utf-8")
+
+
+def test_failing_collector_is_skipped_and_counted():
+    """单个收集器出错时只跳过它的指标，其他指标照常导出，并按收集器计数"""
+    bot = FakeBot(user_service=SimpleNamespace())  # 缺少 users_data
+    exporter = MetricsExporter(bot, min_interval=0)
+
+    text = exporter.render().decode("utf-8")
+    assert "tgbot_registered_users" not in text
+    assert 'tgbot_group_messages_total{result="passed"} 3' in text
+    assert "tgbot_inflight_requests 2" in text
+    assert 'tgbot_metrics_collector_errors_total{collector="users"} 1' in text
+
+    text = exporter.render().decode("utf-8")
+    assert 'tgbot_metrics_collector_errors_total{collector="users"} 2' in text
+
+
+def parse(text: str):
+    """解析文本格式：返回 {指标名: (类型, 帮助)} 和 [(样本名, 标签文本, 值)]"""
+    families, samples = {}, []
+    for line in text.splitlines():
+        if line.startswith("# HELP "):
+            name, help_text = line[7:].split(" ", 1)
+            families[name] = [None, help_text]
+        elif line.startswith("# TYPE "):
+            name, kind = line[7:].split(" ")
+            assert name in families, f"TYPE before HELP: {name}"
+            families[name][0] = kind
+        else:
+            name_labels, value = line.rsplit(" ", 1)
+            name, _, labels = name_labels.partition("{")
+            samples.append((name, labels.rstrip("}"), float(value)))
+    return families, samples
+
+
+def family_of(name: str, families) -> str:
+    """样本所属的指标族（直方图的 _bucket/_sum/_count 样本归到直方图本身）"""
+    for suffix in ("_bucket", "_sum", "_count"):
+        if name.endswith(suffix) and families.get(name[:-len(suffix)], [None])[0] == "histogram":
+            return name[:-len(suffix)]
+    return name
+
+
+def test_text_format_families_and_samples():
+    monitor = SystemMonitor()
+    for seconds in (0.003, 0.02, 0.02, 0.7, 45.0):
+        monitor.record_request(seconds, handler="chat")
+    monitor.record_request(0.1, is_error=True, handler='say "hi"\n')
+    monitor.record_upstream_status("openai", 429)
+
+    text = render_text(FakeBot(system_monitor=monitor))
+    assert text.endswith("\n")
+    families, samples = parse(text)
+
+    # 每个样本都属于声明过 HELP/TYPE 的指标族，指标名统一带前缀
+    for name, _, _ in samples:
+        family = family_of(name, families)
+        assert family in families and family.startswith("tgbot_")
+
+    assert families["tgbot_requests_total"][0] == "counter"
+    assert families["tgbot_inflight_requests"][0] == "gauge"
+    assert families["tgbot_request_duration_seconds"][0] == "histogram"
+    assert ("tgbot_requests_total", "", 6) in samples
+    assert ("tgbot_request_errors_total", "", 1) in samples
+    assert ("tgbot_upstream_responses_total", 'upstream="openai",status="429"', 1) in samples
+
+    # 标签值中的引号、换行转义
+    assert 'handler="say \\"hi\\"\\n"' in text
+
+
+def test_histogram_buckets_are_cumulative():
+    monitor = SystemMonitor()
+    for seconds in (0.003, 0.02, 0.02, 0.7, 45.0):
+        monitor.record_request(seconds, handler="chat")
+
+    _, samples = parse(render_text(FakeBot(system_monitor=monitor)))
+    chat = [(labels, value) for name, labels, value in samples
+            if name == "tgbot_request_duration_seconds_bucket" and labels.startswith('handler="chat"')]
+
+    counts = [value for _, value in chat]
+    assert counts == sorted(counts)
+    assert chat[-1] == ('handler="chat",le="+Inf"', 5)
+    assert dict(chat)['handler="chat",le="0.005"'] == 1
+    assert dict(chat)['handler="chat",le="1"'] == 4
+    assert ("tgbot_request_duration_seconds_count", 'handler="chat"', 5) in samples
+    total = next(value for name, labels, value in samples
+                 if name == "tgbot_request_duration_seconds_sum" and labels == 'handler="chat"')
+    assert total == pytest.approx(45.743)
+
+
+def test_render_is_cached_within_min_interval():
+    bot = FakeBot()
+    exporter = MetricsExporter(bot, min_interval=60)
+    first = exporter.render()
+    bot.shutdown.inflight_count = 99
+    assert exporter.render() is first
+
+
+def test_http_endpoint():
+    exporter = MetricsExporter(FakeBot(), host="127.0.0.1", port=0, min_interval=0)
+
+    async def request(path: str) -> bytes:
+        port = exporter._server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        return response
+
+    async def run():
+        await exporter.start()
+        try:
+            return await request("/metrics"), await request("/other")
+        finally:
+            await exporter.stop()
+
+    metrics, missing = asyncio.run(run())
+    head, body = metrics.split(b"\r\n\r\n", 1)
+    assert head.startswith(b"HTTP/1.1 200 OK")
+    assert CONTENT_TYPE.encode() in head
+    assert b"tgbot_metrics_scrapes_total 1" in body
+    assert missing.startswith(b"HTTP/1.1 404")
+    assert exporter.scrapes == 1
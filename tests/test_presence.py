@@ -0,0 +1,51 @@
+"""
+在线用户索引测试
+"""
+
+from utils.presence import PresenceIndex
+
+
+def test_user_is_counted_once_in_latest_bucket():
+    index = PresenceIndex(bucket_seconds=60, retention_seconds=3600)
+    index.touch(1, now=6000)
+    index.touch(1, now=6030)  # 同一个桶内只更新时间
+    index.touch(1, now=6130)  # 移到新桶
+
+    assert index.last_seen[1] == 6130
+    assert {bucket: set(members) for bucket, members in index.buckets.items() if members} == {102: {1}}
+    assert index.count(300, now=6130) == 1
+
+
+def test_count_covers_buckets_in_window():
+    index = PresenceIndex(bucket_seconds=60, retention_seconds=3600)
+    index.touch(1, now=6000)  # 第 100 个桶
+    index.touch(2, now=6300)  # 第 105 个桶
+    index.touch(3, now=6590)  # 第 109 个桶
+
+    assert index.count(60, now=6600) == 1
+    assert index.count(300, now=6600) == 2  # 从第 105 个桶开始（精度为一个桶）
+    assert index.count(3600, now=6600) == 3
+
+
+def test_old_buckets_are_pruned_when_new_bucket_opens():
+    index = PresenceIndex(bucket_seconds=60, retention_seconds=600)
+    index.touch(1, now=6000)
+    index.touch(2, now=6300)
+
+    index.touch(3, now=6900)  # 打开新桶时丢弃 6300 之前的桶
+    assert len(index) == 2
+    assert 1 not in index.last_seen
+    assert 100 not in index.buckets
+
+    assert index.prune(now=7000) == 1
+    assert set(index.last_seen) == {3}
+
+
+def test_returning_user_after_prune_is_tracked_again():
+    index = PresenceIndex(bucket_seconds=60, retention_seconds=600)
+    index.touch(1, now=6000)
+    index.prune(now=7000)
+    index.touch(1, now=7000)
+
+    assert len(index) == 1
+    assert index.count(60, now=7000) == 1
@@ -0,0 +1,82 @@
+"""
+采样性能剖析测试
+"""
+
+import asyncio
+import time
+from collections import Counter
+
+from services.profiler import SamplingProfiler
+
+
+class BrokenTask:
+    def get_coro(self):
+        raise RuntimeError("task is switching")
+
+
+def test_task_name_tolerates_errors():
+    """从采样线程读取当前任务失败时不影响采样"""
+    loop = object()
+    assert SamplingProfiler._task_name({}, loop) is None
+    assert SamplingProfiler._task_name({loop: BrokenTask()}, loop) is None
+
+
+def test_frame_name_cache_is_bounded(tmp_path):
+    profiler = SamplingProfiler(str(tmp_path), max_cached_names=2)
+    codes = [compile("pass", f"module_{i}.py", "exec") for i in range(5)]
+
+    names = [profiler._frame_name(code) for code in codes]
+    assert names[4] == "<module> (module_4.py:1)"
+    assert len(profiler._names) == 2
+    assert profiler._frame_name(codes[4]) == names[4]  # 超过上限时仍能正确命名
+
+
+def busy_loop(seconds: float):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+async def busy_handler():
+    busy_loop(1.2)
+
+
+def test_profile_writes_collapsed_stacks(tmp_path):
+    """折叠栈每行为 "帧;帧;... 样本数"，事件循环线程的栈带上当前任务名"""
+    profiler = SamplingProfiler(str(tmp_path), interval=0.005)
+
+    async def run():
+        profiling = asyncio.create_task(profiler.profile(1.0))
+        await asyncio.sleep(0.05)
+        await asyncio.create_task(busy_handler())
+        return await profiling
+
+    result = asyncio.run(run())
+    lines = result.path.read_text(encoding="utf-8").splitlines()
+
+    stacks = {}
+    for line in lines:
+        stack, count = line.rsplit(" ", 1)
+        stacks[stack] = int(count)
+    assert sum(stacks.values()) == result.samples
+    assert len(stacks) == result.stacks
+    assert list(stacks.values()) == sorted(stacks.values(), reverse=True)
+
+    busy = [stack for stack in stacks if stack.endswith("busy_loop (tests/test_profiler.py:%d)"
+                                                       % busy_loop.__code__.co_firstlineno)]
+    assert busy
+    frames = busy[0].split(";")
+    assert frames[0] == "MainThread"
+    assert frames[1] == "task:busy_handler"
+    assert result.top[0][0] == frames[-1]
+    assert profiler._names == {}
+
+
+def test_old_profiles_are_removed(tmp_path):
+    profiler = SamplingProfiler(str(tmp_path), keep_files=2)
+    for name in ("profile-20260101-000000", "profile-20260102-000000", "profile-20260103-000000"):
+        (tmp_path / f"{name}.folded").write_text("a 1\n")
+
+    profiler._save(Counter({"MainThread;f (x.py:1)": 3}), 1.0)
+    assert len(list(tmp_path.glob("profile-*.folded"))) == 2
+    assert not (tmp_path / "profile-20260101-000000.folded").exists()
@@ -0,0 +1,234 @@
+"""
+速率限制器测试
+"""
+
+import asyncio
+
+import pytest
+
+from utils.rate_limiter import GCRARateLimiter, RedisRateLimiter
+
+
+def test_allows_burst_up_to_limit():
+    """窗口内允许 max_requests 次突发，下一次被拒绝"""
+    limiter = GCRARateLimiter(5, 10)
+    now = 1000.0
+
+    for _ in range(5):
+        assert limiter.allow("user", now=now) == (True, 0.0)
+
+    allowed, retry_after = limiter.allow("user", now=now)
+    assert not allowed
+    assert retry_after == pytest.approx(2.0)
+
+
+def test_denied_request_does_not_consume_quota():
+    """被拒绝的请求不推进 TAT"""
+    limiter = GCRARateLimiter(5, 10)
+    now = 1000.0
+    for _ in range(5):
+        limiter.allow("user", now=now)
+
+    for _ in range(3):
+        assert not limiter.allow("user", now=now)[0]
+    assert limiter.tat["user"] == pytest.approx(1010.0)
+    assert limiter.get_stats()['limited'] == 3
+
+
+def test_refills_one_request_per_emission_interval():
+    """额度按 window/max_requests 的间隔匀速恢复"""
+    limiter = GCRARateLimiter(5, 10)
+    now = 1000.0
+    for _ in range(5):
+        limiter.allow("user", now=now)
+
+    # 恢复一次额度之前仍然被拒绝，恰好到点时放行一次
+    assert not limiter.allow("user", now=now + 1.999)[0]
+    assert limiter.allow("user", now=now + 2.0)[0]
+    assert not limiter.allow("user", now=now + 2.0)[0]
+
+    # 空闲整个窗口后恢复完整突发额度
+    later = now + 12.0
+    for _ in range(5):
+        assert limiter.allow("user", now=later)[0]
+    assert not limiter.allow("user", now=later)[0]
+
+
+def test_cost_is_charged_proportionally():
+    """cost 按比例扣除额度，超过剩余额度的请求被拒绝"""
+    limiter = GCRARateLimiter(4, 8)
+    now = 1000.0
+
+    assert limiter.allow("user", cost=0.5, now=now)[0]
+    assert limiter.allow("user", cost=3.5, now=now)[0]
+    allowed, retry_after = limiter.allow("user", cost=0.5, now=now)
+    assert not allowed
+    assert retry_after == pytest.approx(1.0)
+
+
+def test_keys_are_limited_independently():
+    limiter = GCRARateLimiter(1, 10)
+    assert limiter.allow("a", now=1000.0)[0]
+    assert not limiter.allow("a", now=1000.0)[0]
+    assert limiter.allow("b", now=1000.0)[0]
+
+
+def test_expired_keys_are_evicted():
+    """TAT 过期的键由时间轮淘汰"""
+    limiter = GCRARateLimiter(5, 10)
+    limiter.allow("user", now=1000.0)
+    assert len(limiter) == 1
+
+    limiter.sweep(now=1000.0 + 10 + 2 * limiter.tick)
+    assert len(limiter) == 0
+    assert limiter.get_stats()['evicted'] == 1
+
+
+def test_dump_and_load_keep_active_tats():
+    limiter = GCRARateLimiter(5, 10)
+    for _ in range(5):
+        limiter.allow(42, now=1000.0)
+
+    restored = GCRARateLimiter(5, 10)
+    restored.load(limiter.dump(now=1001.0), now=1001.0)
+    assert not restored.allow(42, now=1001.0)[0]
+
+
+def test_redis_failure_keeps_pending_grants():
+    """Redis 调用失败时，本地放行但尚未写回的次数保留到重连后写回"""
+    limiter = RedisRateLimiter(10, 60, "redis://localhost")
+
+    async def failing_script(**kwargs):
+        raise ConnectionError("down")
+
+    limiter.redis_available = True
+    limiter.script = failing_script
+    limiter.pending = {"user": 2.0}
+
+    allowed, _ = asyncio.run(limiter.acquire("user"))
+    assert allowed  # 回退到进程内限制器
+    assert not limiter.redis_available
+    assert limiter.pending == {"user": 2.0}
+
+
+def test_redis_limiter_stats_count_every_decision():
+    """放行/拒绝次数包含 Redis 判定、本地快速放行和回退限制器的判定"""
+    limiter = RedisRateLimiter(10, 60, "redis://localhost")
+    results = iter([(1, "0"), (0, "60")])
+
+    async def script(**kwargs):
+        return next(results)
+
+    async def run():
+        limiter.redis_available = True
+        limiter.script = script
+        await limiter.acquire("a")  # Redis 放行
+        await limiter.acquire("a")  # 本地快速放行
+        await limiter.acquire("b")  # Redis 拒绝
+        limiter.redis_available = False
+        limiter._next_connect = float("inf")
+        await limiter.acquire("c")  # 回退放行
+
+    asyncio.run(run())
+    stats = limiter.get_stats()
+    assert (stats['allowed'], stats['limited']) == (3, 1)
+    assert (stats['remote_calls'], stats['local_hits'], stats['fallback_calls']) == (2, 1, 1)
+
+
+class FakePipeline:
+    def __init__(self, fail=False):
+        self.fail = fail
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self):
+        if self.fail:
+            raise ConnectionError("down")
+
+
+class FakeRedis:
+    def __init__(self, fail=False):
+        self.fail = fail
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self.fail)
+
+
+def connected_limiter(results=None, fail_sync=False):
+    """已"连接"的限制器：脚本调用记录参数并依次返回 results"""
+    limiter = RedisRateLimiter(10, 60, "redis://localhost")
+    calls = []
+    results = iter(results or [])
+
+    async def script(keys, args, client=None):
+        calls.append((keys[0], args, client is not None))
+        if client is None:
+            return next(results)
+
+    limiter.redis = FakeRedis(fail_sync)
+    limiter.redis_available = True
+    limiter.script = script
+    return limiter, calls
+
+
+def test_redis_limiter_falls_back_while_unreachable():
+    """Redis 不可用且未到重试时间时直接使用进程内限制器"""
+    limiter = RedisRateLimiter(2, 60, "redis://localhost")
+    limiter._next_connect = float("inf")
+
+    async def run():
+        return [(await limiter.acquire("user"))[0] for _ in range(3)]
+
+    assert asyncio.run(run()) == [True, True, False]
+    assert limiter.get_stats()['backend'] == 'memory'
+    assert limiter.fallback_calls == 3
+
+
+def test_local_grants_are_replayed_with_next_remote_check():
+    """本地快速放行的次数在下一次 Redis 检查时一起记入"""
+    limiter, calls = connected_limiter([(1, "0"), (1, "18")])
+
+    async def run():
+        await limiter.acquire("user")
+        await limiter.acquire("user")  # 本地放行
+        await limiter.acquire("user")  # 本地放行
+        limiter.cache.clear()  # 模拟缓存过期
+        await limiter.acquire("user")
+
+    asyncio.run(run())
+    assert [args[2] for _, args, _ in calls] == [0.0, 2.0]
+    assert limiter.pending == {}
+
+
+def test_sync_replays_pending_grants_in_pipeline():
+    limiter, calls = connected_limiter()
+    limiter.pending = {"a": 2.0, "b": 1.0}
+
+    asyncio.run(limiter.sync())
+    assert sorted((key, args[2], args[3], piped) for key, args, piped in calls) == [
+        (f"{limiter.key_prefix}a", 2.0, 0, True),
+        (f"{limiter.key_prefix}b", 1.0, 0, True),
+    ]
+    assert limiter.pending == {}
+
+
+def test_failed_sync_keeps_pending_for_reconnect():
+    """写回失败时 pending 合并回去，重连后再写回"""
+    limiter, _ = connected_limiter(fail_sync=True)
+    limiter.pending = {"a": 2.0}
+
+    async def run():
+        with pytest.raises(ConnectionError):
+            await limiter.sync()
+        limiter.pending["a"] += 1.0  # 断开期间又有本地放行
+
+    asyncio.run(run())
+    assert limiter.pending == {"a": 3.0}
+
+    limiter.redis = FakeRedis()
+    asyncio.run(limiter.sync())
+    assert limiter.pending == {}
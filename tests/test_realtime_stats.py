@@ -0,0 +1,155 @@
+"""
+实时统计测试（断线缓冲、排行榜）
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from services.realtime_stats import (
+    LEADERBOARD_RETENTION, LEADERBOARD_TTL, RealTimeStatsManager, StatsBuffer
+)
+
+
+class FakePipeline:
+    """记录写入的命令；execute 按 redis.fail 决定是否失败"""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.commands.append((name, args))
+
+    async def execute(self):
+        if self.redis.fail:
+            raise ConnectionError("down")
+        self.redis.executed.append(self.commands)
+        return [None] * len(self.commands)
+
+
+class FakeRedis:
+    def __init__(self):
+        self.fail = False
+        self.executed = []
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def ping(self):
+        if self.fail:
+            raise ConnectionError("down")
+        return True
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = RealTimeStatsManager(
+        fallback_file=str(tmp_path / "fallback.json"), pending_file=str(tmp_path / "pending.json"),
+        max_offline_keys=50
+    )
+    manager.redis = FakeRedis()
+    manager.redis_available = True
+    # 预先缓存位图序号，刷新时不需要运行分配脚本
+    manager.retention.redis_index.update((user_id, user_id) for user_id in range(100))
+    return manager
+
+
+def record_users(manager, users):
+    async def run():
+        for user_id in users:
+            await manager.update_user_activity(user_id, "message")
+    asyncio.run(run())
+
+
+def test_outage_buffer_is_capped(manager):
+    manager.redis.fail = True
+    assert not asyncio.run(manager._probe())
+    manager._mark_down(ConnectionError("still down"))
+    assert manager.outage_count == 1
+
+    record_users(manager, range(100))
+
+    # 达到上限后丢弃新增量（每个用户有自己的 user_stats 键，缓冲最多超出一次更新的键数）
+    assert manager.dropped_updates > 0
+    assert 50 <= len(manager.buffer) < 60
+    assert manager.buffer.updates + manager.dropped_updates == 100
+    assert manager.get_connection_metrics()['redis_state'] == 'disconnected'
+
+
+def test_buffer_is_replayed_on_reconnect(manager):
+    manager.redis.fail = True
+    asyncio.run(manager._probe())
+    record_users(manager, range(100))
+    buffered = manager.buffer.updates
+
+    manager.redis.fail = False
+    assert asyncio.run(manager._probe())
+
+    assert manager.redis_available
+    assert manager.reconnect_count == 1
+    assert manager.outage_started is None
+    assert len(manager.buffer) == 0
+    assert manager.flushed_updates == buffered
+    assert len(manager.redis.executed) == 1  # 一个管道回放全部缓冲
+
+    # 恢复后不再丢弃
+    dropped = manager.dropped_updates
+    record_users(manager, range(100, 110))
+    assert manager.dropped_updates == dropped
+
+
+def test_failed_flush_returns_updates_to_buffer(manager):
+    record_users(manager, range(3))
+    keys = len(manager.buffer)
+
+    manager.redis.fail = True
+    assert not asyncio.run(manager.flush_buffer())
+
+    assert len(manager.buffer) == keys
+    assert manager.buffer.updates == 3
+    assert not manager.redis_available
+    assert manager.outage_count == 1
+
+
+def test_leaderboard_period_keys_use_iso_weeks(manager):
+    """年初的几天属于上一年的最后一个 ISO 周"""
+    assert manager._period_keys(datetime(2027, 1, 1)) == {"day": "2027-01-01", "week": "2026-W53"}
+    assert manager._period_keys(datetime(2026, 3, 2)) == {"day": "2026-03-02", "week": "2026-W10"}
+
+
+def test_leaderboard_writes_day_and_week_keys_with_expiry(manager):
+    buffer = StatsBuffer()
+    when = datetime(2026, 3, 2, 12)
+    manager._update_leaderboards(when, 7, "chat", -100, buffer)
+    manager._update_leaderboards(when, 7, "chat", None, buffer)  # 私聊不计入群组排行
+
+    assert buffer.increments == {
+        "lb:users:2026-03-02": {7: 2}, "lb:chats:2026-03-02": {-100: 1}, "lb:actions:2026-03-02": {"chat": 2},
+        "lb:users:2026-W10": {7: 2}, "lb:chats:2026-W10": {-100: 1}, "lb:actions:2026-W10": {"chat": 2},
+    }
+    assert buffer.expires["lb:users:2026-03-02"] == LEADERBOARD_TTL["day"]
+    assert buffer.expires["lb:chats:2026-W10"] == LEADERBOARD_TTL["week"]
+
+
+def test_memory_leaderboards_keep_recent_periods(manager):
+    start = datetime(2026, 3, 2, 12)
+    for days in range(12):
+        manager._update_leaderboards(start + timedelta(days=days), 1, "chat", None, None)
+
+    days = list(manager.leaderboards["day"])
+    assert len(days) == LEADERBOARD_RETENTION["day"]
+    assert days[-1] == "2026-03-13"
+    assert list(manager.leaderboards["week"]) == ["2026-W10", "2026-W11"]
+
+
+def test_memory_leaderboard_ranking(manager):
+    manager.redis_available = False
+    now = datetime.now()
+    for user_id, count in ((1, 3), (2, 5), (3, 1)):
+        for _ in range(count):
+            manager._update_leaderboards(now, user_id, "chat", None, None)
+
+    assert asyncio.run(manager.get_leaderboard("users", "day", limit=2)) == [("2", 5), ("1", 3)]
+    assert asyncio.run(manager.get_leaderboard("users", "week")) == [("2", 5), ("1", 3), ("3", 1)]
@@ -0,0 +1,148 @@
+"""
+留存分析测试（内存位图后端）
+"""
+
+import asyncio
+from datetime import date, timedelta
+
+import pytest
+
+from services.realtime_stats import StatsBuffer
+from services.retention import RetentionTracker
+
+TODAY = date(2026, 1, 31)
+
+
+def day(offset: int) -> str:
+    """TODAY 往前 offset 天的日期键"""
+    return (TODAY - timedelta(days=offset)).isoformat()
+
+
+@pytest.fixture
+def tracker():
+    pytest.importorskip("numpy")
+    tracker = RetentionTracker(retention_days=60)
+    activity = [
+        (8, range(1, 11)),  # 1 月 23 日：用户 1~10 首次活跃
+        (2, [*range(11, 16), 1, 2, 3]),  # 1 月 29 日：用户 11~15 首次活跃
+        (1, [11, 12, *range(1, 6)]),
+        (0, [1, 2]),
+    ]
+    for offset, users in activity:
+        for user_id in users:
+            tracker.record(user_id, day(offset))
+    return tracker
+
+
+def test_report_counts_active_users(tracker):
+    report = asyncio.run(tracker.report(today=TODAY))
+    assert (report['dau'], report['wau'], report['mau']) == (2, 10, 15)
+
+
+def test_report_retention(tracker):
+    retention = asyncio.run(tracker.report(today=TODAY))['retention']
+
+    # 次日留存：1 月 29 日新增的 11~15 中 1 月 30 日仍活跃的是 11、12
+    assert retention[1] == {'cohort_size': 5, 'retained': 2, 'rate': 0.4}
+    # 7 日留存：1 月 23 日新增的 1~10 中 1 月 30 日仍活跃的是 1~5
+    assert retention[7] == {'cohort_size': 10, 'retained': 5, 'rate': 0.5}
+    assert retention[30] == {'cohort_size': 0, 'retained': 0, 'rate': 0.0}
+
+
+def test_cohorts(tracker):
+    table = asyncio.run(tracker.cohorts(days=3, horizon=2, today=TODAY))
+    assert table == [
+        {'day': day(2), 'size': 5, 'retained': [2, 0]},
+        {'day': day(1), 'size': 0, 'retained': [0]},
+        {'day': day(0), 'size': 0, 'retained': []},
+    ]
+
+
+def test_old_bitmaps_are_dropped():
+    pytest.importorskip("numpy")
+    tracker = RetentionTracker(retention_days=7)
+    tracker.record(1, day(10))
+    tracker.record(1, day(0))
+    assert list(tracker.local["active"]) == [day(0)]
+
+
+def test_local_users_are_bounded():
+    pytest.importorskip("numpy")
+    tracker = RetentionTracker(max_local_users=2)
+    for user_id in (1, 2, 3, 1):
+        tracker.record(user_id, day(0))
+
+    assert len(tracker.local_index) == 2
+    assert tracker.local_dropped == 1
+    assert asyncio.run(tracker.report(today=TODAY))['dau'] == 2
+
+
+def test_buffered_record_skips_local_bitmaps():
+    """有 Redis 写缓冲时只写缓冲，不写内存位图"""
+    tracker = RetentionTracker()
+    buffer = StatsBuffer()
+    tracker.record(42, day(0), buffer)
+
+    assert buffer.bits == {f"ret:active:{day(0)}": {42}}
+    assert buffer.expires[f"ret:active:{day(0)}"] == tracker.ttl
+    assert tracker.local_index == {}
+    assert tracker.local == {"active": {}, "new": {}}
+
+
+def test_without_numpy_records_nothing_locally():
+    tracker = RetentionTracker()
+    tracker._local_enabled = False
+    tracker.record(1, day(0))
+
+    assert tracker.local_index == {}
+    report = asyncio.run(tracker.report(today=TODAY))
+    assert (report['dau'], report['wau'], report['mau']) == (0, 0, 0)
+
+
+class FakeIndexRedis:
+    """按 INDEX_LUA 的语义分配序号的 Redis 替身"""
+
+    def __init__(self):
+        self.index = {}
+        self.new = {}
+        self.calls = 0
+
+    def register_script(self, script):
+        async def run(keys, args):
+            self.calls += 1
+            assert args[0] > 0  # 新增位图的过期秒数
+            result = []
+            for user_id, first_day in zip(args[1::2], args[2::2]):
+                if user_id not in self.index:
+                    self.index[user_id] = len(self.index)
+                    self.new.setdefault(keys[2] + first_day, set()).add(self.index[user_id])
+                result.append(self.index[user_id])
+            return result
+        return run
+
+
+def test_resolve_assigns_dense_indices_on_first_day():
+    tracker = RetentionTracker()
+    redis = FakeIndexRedis()
+    bits = {tracker.key("active", day(0)): {2, 3}, tracker.key("active", day(1)): {1, 2}}
+
+    offsets = asyncio.run(tracker.resolve(redis, bits))
+    assert sorted(offsets.values()) == [0, 1, 2]
+    # 新用户记入最早出现的那天
+    assert redis.new == {
+        f"ret:new:{day(1)}": {offsets[1], offsets[2]},
+        f"ret:new:{day(0)}": {offsets[3]},
+    }
+
+    # 已缓存的序号不再调用脚本
+    assert asyncio.run(tracker.resolve(redis, {tracker.key("active", day(0)): {1, 3}})) == {
+        1: offsets[1], 3: offsets[3]
+    }
+    assert redis.calls == 1
+
+
+def test_resolve_cache_is_bounded():
+    tracker = RetentionTracker(max_cached_indices=2)
+    redis = FakeIndexRedis()
+    asyncio.run(tracker.resolve(redis, {tracker.key("active", day(0)): {1, 2, 3}}))
+    assert len(tracker.redis_index) == 2
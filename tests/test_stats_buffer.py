@@ -0,0 +1,43 @@
+"""
+统计写缓冲测试
+"""
+
+from services.realtime_stats import StatsBuffer
+
+
+def test_len_counts_distinct_keys_across_commands():
+    buffer = StatsBuffer()
+    buffer.hincrby("stats:day", "messages")
+    buffer.hincrby("stats:day", "messages")
+    buffer.sadd("users:day", 1)
+    buffer.pfadd("hll:day", 1)
+    buffer.zincrby("stats:day", "user:1")  # 与 hincrby 同一个键
+    buffer.expire("stats:day", 60)
+    buffer.ztrim("zset:online", 0)  # 截断和过期不单独计数
+
+    assert len(buffer) == 3
+
+
+def test_merge_keeps_key_count():
+    old = StatsBuffer()
+    old.hincrby("a", "x", 2)
+    old.sadd("b", 1)
+
+    new = StatsBuffer()
+    new.hincrby("a", "x", 3)
+    new.hset("c", "field", "value")
+
+    new.merge(old)
+    assert len(new) == 3
+    assert new.counters["a"]["x"] == 5
+
+
+def test_dict_round_trip_rebuilds_key_count():
+    buffer = StatsBuffer()
+    buffer.hincrby("a", "x")
+    buffer.setbit("bits:day", 42)
+    buffer.zadd("zset:online", "1", 100.0)
+
+    restored = StatsBuffer.from_dict(buffer.to_dict())
+    assert len(restored) == 3
+    assert restored.keys == buffer.keys
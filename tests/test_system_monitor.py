@@ -0,0 +1,72 @@
+"""
+系统监控测试
+"""
+
+import time
+
+from services.system_monitor import SystemMonitor
+
+
+def count_samples(monitor):
+    """记录当场采样的次数"""
+    calls = []
+    sample = monitor.sampler.sample
+
+    def counting_sample():
+        calls.append(time.time())
+        return sample()
+
+    monitor.sampler.sample = counting_sample
+    return calls
+
+
+def test_samples_on_every_view_when_sampler_is_stopped():
+    """后台采样关闭时每次查看面板都重新采样，而不是一直返回第一次的结果"""
+    monitor = SystemMonitor(sample_interval=60)
+    calls = count_samples(monitor)
+
+    first = monitor.get_real_system_status()
+    second = monitor.get_real_system_status()
+
+    assert 'error' not in first and 'error' not in second
+    assert len(calls) == 2
+    assert len(monitor.sampler.samples) == 2
+
+
+def start_sampler(monitor):
+    """启动采样线程并等待第一次采样"""
+    monitor.sampler.start()
+    deadline = time.time() + 5
+    while monitor.sampler.latest is None and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_uses_latest_sample_while_sampler_is_running():
+    monitor = SystemMonitor(sample_interval=60)
+    start_sampler(monitor)
+    try:
+        calls = count_samples(monitor)
+        monitor.get_real_system_status()
+        assert calls == []
+    finally:
+        monitor.sampler.stop()
+
+
+def test_resamples_when_latest_sample_is_stale():
+    """采样线程在运行但最新采样已超过一个间隔时当场采样"""
+    monitor = SystemMonitor(sample_interval=60)
+    start_sampler(monitor)
+    try:
+        sampler = monitor.sampler
+        sampler.latest = sampler.latest._replace(timestamp=time.time() - 120)
+        calls = count_samples(monitor)
+
+        assert time.time() - sampler.current().timestamp < 60
+        assert len(calls) == 1
+    finally:
+        monitor.sampler.stop()
+
+
+def test_uptime_counts_from_given_start_time():
+    monitor = SystemMonitor(start_time=time.time() - 3600)
+    assert monitor.get_real_system_status()['uptime_seconds'] >= 3600
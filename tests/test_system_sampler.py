@@ -0,0 +1,68 @@
+"""
+系统资源采样测试
+"""
+
+import time
+from collections import namedtuple
+
+import pytest
+
+psutil = pytest.importorskip("psutil")
+
+from services.system_sampler import SystemSampler
+
+NetIO = namedtuple("NetIO", "bytes_sent bytes_recv")
+
+
+def test_network_rates_and_counter_reset(monkeypatch):
+    counters = iter([NetIO(1000, 5000), NetIO(3000, 6000), NetIO(100, 200)])
+    monkeypatch.setattr(psutil, "net_io_counters", lambda: next(counters))
+
+    sampler = SystemSampler()
+    first = sampler.sample()
+    assert (first.net_sent_rate, first.net_recv_rate) == (0.0, 0.0)
+    assert (first.cpu_percent, first.process_cpu_percent) == (0.0, 0.0)  # 第一次只建立基准
+
+    second = sampler.sample()
+    elapsed = second.timestamp - first.timestamp
+    assert second.net_sent_rate == pytest.approx(2000 / elapsed)
+    assert second.net_recv_rate == pytest.approx(1000 / elapsed)
+
+    reset = sampler.sample()  # 计数器回退（网卡重置）
+    assert (reset.net_sent_rate, reset.net_recv_rate) == (0.0, 0.0)
+
+
+def test_history_is_bounded():
+    sampler = SystemSampler(history=3)
+    for _ in range(5):
+        sampler.sample()
+
+    assert len(sampler.history()) == 3
+    assert sampler.history()[-1] is sampler.latest
+    assert sampler.history(seconds=60) == sampler.history()
+    assert sampler.history(seconds=-60) == []
+
+
+def test_background_thread_samples_and_counts_errors(monkeypatch):
+    sampler = SystemSampler(interval=0.01)
+    sampler.start()
+    try:
+        deadline = time.monotonic() + 2
+        while len(sampler.samples) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert len(sampler.samples) >= 3
+        assert sampler.running
+
+        def broken():
+            raise OSError("no /proc")
+
+        monkeypatch.setattr(psutil, "virtual_memory", broken)
+        deadline = time.monotonic() + 2
+        while not sampler.errors and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert sampler.errors
+        assert sampler.running  # 采样失败不会结束线程
+    finally:
+        sampler.stop()
+
+    assert not sampler.running
@@ -0,0 +1,158 @@
+"""
+多分辨率时间序列测试
+"""
+
+import asyncio
+
+import pytest
+
+from services import timeseries
+from services.realtime_stats import StatsBuffer
+from services.timeseries import RESOLUTIONS, TimeSeriesStore
+
+MINUTE, HOUR, DAY = RESOLUTIONS
+NOW = 1_000_000 * 86400 + 10 * 3600 + 30 * 60 + 30  # 某天 10:30:30（UTC）
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+
+    def hgetall(self, key):
+        self.ops.append(lambda: dict(self.redis.hashes.get(key, {})))
+
+    def hset(self, key, field, value):
+        self.ops.append(lambda: self.redis.hashes.setdefault(key, {}).__setitem__(field, str(value)))
+
+    def expire(self, key, seconds):
+        self.ops.append(lambda: self.redis.ttl.__setitem__(key, seconds))
+
+    async def execute(self):
+        return [op() for op in self.ops]
+
+
+class FakeRedis:
+    """只实现时间序列用到的哈希命令"""
+
+    def __init__(self):
+        self.hashes = {}
+        self.ttl = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def apply(self, buffer: StatsBuffer):
+        """按刷新逻辑写入缓冲中的计数和过期时间"""
+        for key, fields in buffer.counters.items():
+            target = self.hashes.setdefault(key, {})
+            for field, amount in fields.items():
+                target[field] = str(int(target.get(field, 0)) + amount)
+        self.ttl.update(buffer.expires)
+
+
+def as_numbers(fields):
+    return {int(bucket): float(value) for bucket, value in fields.items()}
+
+
+@pytest.fixture
+def store(monkeypatch):
+    monkeypatch.setattr(timeseries.time, "time", lambda: NOW)
+    store = TimeSeriesStore()
+    store.utc_offset = 0
+    return store
+
+
+def test_local_query_groups_minutes_and_hours(store):
+    for minutes_ago in range(180):
+        store.record("messages", ts=NOW - minutes_ago * 60)
+
+    hourly = store.query_local("messages", NOW - 2 * 3600, NOW, 3600)
+    assert [value for _, value in hourly] == [60, 60, 31]  # 8 点、9 点和 10:00~10:30
+
+    five_minutes = store.query_local("messages", NOW - 15 * 60 + 1, NOW, 300)
+    assert [value for _, value in five_minutes] == [5, 5, 5, 1]
+
+
+def test_rollup_local_sums_into_coarser_buckets(store):
+    store.record("messages", 3, ts=NOW - 3600)
+    store.record("messages", 2, ts=NOW)
+
+    hour = store.align(NOW, 3600)
+    assert store.local[HOUR.name]["messages"] == {hour - 3600: 3, hour: 2}
+    assert store.local[DAY.name]["messages"] == {store.align(NOW, 86400): 5}
+
+
+def test_rollup_local_drops_expired_buckets(store):
+    old = NOW - MINUTE.retention - 60
+    store.record("messages", ts=old)
+    store.rollup_local(NOW)
+
+    assert store.local[MINUTE.name]["messages"] == {}
+    assert store.local[HOUR.name]["messages"]  # 小时桶保留得更久
+
+
+def test_record_writes_minute_bucket_with_expiry(store):
+    buffer = StatsBuffer()
+    store.record("messages", ts=NOW, buffer=buffer)
+    store.record("messages", ts=NOW + 1, buffer=buffer)
+
+    bucket = store.align(NOW, 60)
+    key = store.key("messages", MINUTE, bucket)
+    assert key == f"ts:messages:1m:{store.align(NOW, 3600)}"
+    assert buffer.counters[key] == {str(bucket): 2}
+    assert buffer.expires[key] == MINUTE.retention + MINUTE.period
+
+
+def test_rollup_redis_is_idempotent_and_expires(store):
+    redis = FakeRedis()
+    buffer = StatsBuffer()
+    for minutes_ago in range(120):
+        store.record("messages", ts=NOW - minutes_ago * 60, buffer=buffer)
+    redis.apply(buffer)
+
+    async def run():
+        assert await store.rollup_redis(redis, NOW)
+        first = {key: dict(fields) for key, fields in redis.hashes.items()}
+        await store.rollup_redis(redis, NOW)  # 重复汇总结果不变
+        assert redis.hashes == first
+
+    asyncio.run(run())
+
+    hour = store.align(NOW, 3600)
+    hour_key = store.key("messages", HOUR, hour)
+    assert as_numbers(redis.hashes[hour_key]) == {hour - 3600: 60, hour: 31}
+    assert redis.ttl[hour_key] == HOUR.retention + HOUR.period
+    day_key = store.key("messages", DAY, hour)
+    assert redis.ttl[day_key] == DAY.retention + DAY.period
+
+
+def test_catch_up_rollup_covers_minute_retention(store):
+    redis = FakeRedis()
+    buffer = StatsBuffer()
+    store.record("messages", ts=NOW - 20 * 3600, buffer=buffer)
+    redis.apply(buffer)
+
+    hour_key = store.key("messages", HOUR, NOW - 20 * 3600)
+    asyncio.run(store.rollup_redis(redis, NOW))
+    assert hour_key not in redis.hashes  # 平时只汇总最近的桶
+
+    asyncio.run(store.rollup_redis(redis, NOW, catch_up=True))
+    assert as_numbers(redis.hashes[hour_key]) == {store.align(NOW - 20 * 3600, 3600): 1}
+
+
+def test_redis_query_reads_recent_buckets_from_finer_data(store):
+    """最近两个可能尚未汇总的桶用更细的分辨率现算"""
+    redis = FakeRedis()
+    buffer = StatsBuffer()
+    for minutes_ago in range(180):
+        store.record("messages", ts=NOW - minutes_ago * 60, buffer=buffer)
+    redis.apply(buffer)  # 尚未汇总，Redis 中只有分钟桶
+
+    hourly = asyncio.run(store.query("messages", NOW - 2 * 3600, NOW, 3600, redis))
+    assert [value for _, value in hourly] == [0, 60, 31]  # 8 点已不算"最近"，需要汇总后才能读到
+
+    asyncio.run(store.rollup_redis(redis, NOW, catch_up=True))
+    hourly = asyncio.run(store.query("messages", NOW - 2 * 3600, NOW, 3600, redis))
+    assert [value for _, value in hourly] == [60, 60, 31]
+    assert asyncio.run(store.total("messages", NOW - 3 * 3600, NOW, redis)) == 180
@@ -0,0 +1,123 @@
+"""
+请求链路追踪测试
+"""
+
+import asyncio
+import random
+
+import pytest
+
+from utils.tracing import NOOP_SPAN, Tracer, current_span, span
+
+
+class ListExporter:
+    def __init__(self):
+        self.traces = []
+
+    def export(self, trace):
+        self.traces.append(trace)
+
+
+def test_sample_rate_zero_and_one():
+    assert Tracer(sample_rate=0).start_trace("update") is NOOP_SPAN
+    assert Tracer(sample_rate=1).start_trace("update") is not NOOP_SPAN
+
+
+def test_fractional_sampling(monkeypatch):
+    rng = random.Random(1)
+    monkeypatch.setattr(random, "random", rng.random)
+    tracer = Tracer(sample_rate=0.25)
+
+    for _ in range(4000):
+        with tracer.start_trace("update"):
+            pass
+
+    assert tracer.started == 4000
+    assert tracer.sampled == pytest.approx(1000, rel=0.1)
+
+
+def test_unsampled_request_uses_noop_spans():
+    tracer = Tracer(sample_rate=0)
+    with tracer.start_trace("update"):
+        assert current_span() is None
+        assert span("openai") is NOOP_SPAN
+    assert tracer.sampled == 0
+
+
+def test_spans_are_parented_through_context():
+    exporter = ListExporter()
+    tracer = Tracer(sample_rate=1, exporter=exporter)
+
+    async def call_upstream():
+        with span("openai", model="gpt") as upstream:
+            await asyncio.sleep(0)
+            return upstream
+
+    async def handle():
+        with tracer.start_trace("update", user=1) as root:
+            with span("handler") as handler:
+                # 子任务复制上下文，span 挂到创建任务时所在的 span 下
+                upstream = await asyncio.create_task(call_upstream())
+            with span("reply") as reply:
+                pass
+        return root, handler, upstream, reply
+
+    root, handler, upstream, reply = asyncio.run(handle())
+
+    assert root.parent_id is None
+    assert handler.parent_id == root.span_id
+    assert upstream.parent_id == handler.span_id
+    assert reply.parent_id == root.span_id
+    assert {s.trace.trace_id for s in (root, handler, upstream, reply)} == {root.trace.trace_id}
+    assert upstream.attributes == {"model": "gpt"}
+    assert current_span() is None
+
+    trace = exporter.traces[0]
+    assert [s.name for s in trace.stages()] == ["handler", "openai", "reply"]
+    assert tracer.recent() == [trace]
+
+
+def test_nested_trace_becomes_child_span():
+    tracer = Tracer(sample_rate=1)
+    with tracer.start_trace("update") as root:
+        with tracer.start_trace("inner") as inner:
+            pass
+
+    assert inner.parent_id == root.span_id
+    assert tracer.sampled == 1  # 只有根 span 结束时才算一个追踪
+    assert tracer.started == 2
+
+
+def test_error_is_recorded_and_trace_finished():
+    tracer = Tracer(sample_rate=1)
+    with pytest.raises(ValueError):
+        with tracer.start_trace("update"):
+            with span("handler"):
+                raise ValueError("boom")
+
+    trace = tracer.recent()[0]
+    assert trace.error == "boom"
+    assert trace.root.error == "boom"
+
+
+def test_add_child_extends_root_start():
+    """补记的过滤器阶段早于根 span 开始时，根 span 的开始时间前移"""
+    tracer = Tracer(sample_rate=1)
+    with tracer.start_trace("update") as root:
+        started = root.start_ns
+        root.add_child("filter", started - 1_000_000, started - 500_000)
+
+    trace = tracer.recent()[0]
+    assert root.start_ns == started - 1_000_000
+    assert trace.stages()[0].name == "filter"
+    assert trace.stages()[0].parent_id == root.span_id
+
+
+def test_buffer_keeps_latest_traces():
+    tracer = Tracer(sample_rate=1, capacity=3)
+    for i in range(5):
+        with tracer.start_trace(f"update-{i}"):
+            pass
+
+    assert [trace.root.name for trace in tracer.recent()] == ["update-4", "update-3", "update-2"]
+    assert tracer.get_stats()['buffered'] == 3
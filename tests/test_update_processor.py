@@ -0,0 +1,77 @@
+"""
+按聊天保序的更新处理器测试
+"""
+
+import asyncio
+from datetime import datetime
+
+import pytest
+
+telegram = pytest.importorskip("telegram")
+
+from core.update_processor import ChatOrderedUpdateProcessor
+
+
+def make_update(update_id: int, chat_id: int):
+    chat = telegram.Chat(chat_id, "private")
+    message = telegram.Message(update_id, datetime.now(), chat, text="hi")
+    return telegram.Update(update_id, message=message)
+
+
+def run_updates(processor, updates, log):
+    """并发提交 (更新 ID, 聊天 ID, 耗时) 列表，返回处理日志"""
+    async def handle(update_id, chat_id, delay):
+        log.append(("start", chat_id, update_id))
+        await asyncio.sleep(delay)
+        log.append(("end", chat_id, update_id))
+
+    async def main():
+        await asyncio.gather(*(
+            processor.process_update(make_update(update_id, chat_id), handle(update_id, chat_id, delay))
+            for update_id, chat_id, delay in updates
+        ))
+
+    asyncio.run(main())
+
+
+def test_same_chat_runs_in_order():
+    processor = ChatOrderedUpdateProcessor(8)
+    log = []
+    run_updates(processor, [(1, 100, 0.03), (2, 100, 0.0), (3, 100, 0.01)], log)
+
+    assert log == [
+        ("start", 100, 1), ("end", 100, 1),
+        ("start", 100, 2), ("end", 100, 2),
+        ("start", 100, 3), ("end", 100, 3),
+    ]
+    assert processor.queued_count == 0
+
+
+def test_different_chats_run_concurrently():
+    processor = ChatOrderedUpdateProcessor(8)
+    log = []
+    run_updates(processor, [(1, 100, 0.03), (2, 200, 0.0)], log)
+
+    # 聊天 200 的更新不等待聊天 100
+    assert log.index(("end", 200, 2)) < log.index(("end", 100, 1))
+
+
+def test_error_does_not_block_later_updates():
+    processor = ChatOrderedUpdateProcessor(8)
+    done = []
+
+    async def fail():
+        raise RuntimeError("boom")
+
+    async def succeed():
+        done.append(True)
+
+    async def main():
+        await asyncio.gather(
+            processor.process_update(make_update(1, 100), fail()),
+            processor.process_update(make_update(2, 100), succeed()),
+        )
+
+    asyncio.run(main())
+    assert done == [True]
+    assert processor.queued_count == 0
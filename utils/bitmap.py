@@ -0,0 +1,83 @@
+"""
+活跃位图
+"""
+
+import importlib.util
+from typing import Optional
+from utils.lazy import lazy_import
+
+# NumPy 只在内存位图被使用时才导入（Redis 可用时不需要）
+np = lazy_import("numpy")
+
+
+def numpy_available() -> bool:
+    """NumPy 是否已安装（内存位图依赖它，不会触发导入）"""
+    return importlib.util.find_spec("numpy") is not None
+
+_popcount_table = None
+
+
+def _popcount(bits) -> int:
+    """统计字节数组中置位的数量（256 项查表）"""
+    global _popcount_table
+    if _popcount_table is None:
+        _popcount_table = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+    return int(_popcount_table[bits].sum(dtype=np.int64))
+
+
+class ActivityBitmap:
+    """NumPy 位数组（Redis SETBIT 位图的内存等价实现）
+
+    第 i 位表示序号为 i 的用户，位顺序与 Redis 相同（每字节高位在前），
+    一百万个用户约占 122KB。按需扩容，容量每次翻倍。
+    """
+
+    def __init__(self, data: Optional[bytes] = None):
+        self.bits = np.frombuffer(data, dtype=np.uint8).copy() if data else np.zeros(0, dtype=np.uint8)
+
+    @classmethod
+    def _wrap(cls, bits) -> "ActivityBitmap":
+        bitmap = cls()
+        bitmap.bits = bits
+        return bitmap
+
+    def set(self, index: int):
+        """置位"""
+        byte = index >> 3
+        if byte >= len(self.bits):
+            grown = np.zeros(max(byte + 1, len(self.bits) * 2), dtype=np.uint8)
+            grown[:len(self.bits)] = self.bits
+            self.bits = grown
+        self.bits[byte] |= 0x80 >> (index & 7)
+
+    def __contains__(self, index: int) -> bool:
+        byte = index >> 3
+        return byte < len(self.bits) and bool(self.bits[byte] & (0x80 >> (index & 7)))
+
+    def count(self) -> int:
+        """置位数量（等价于 BITCOUNT）"""
+        return _popcount(self.bits)
+
+    def __and__(self, other: "ActivityBitmap") -> "ActivityBitmap":
+        size = min(len(self.bits), len(other.bits))
+        return self._wrap(self.bits[:size] & other.bits[:size])
+
+    def __or__(self, other: "ActivityBitmap") -> "ActivityBitmap":
+        small, large = sorted((self.bits, other.bits), key=len)
+        bits = large.copy()
+        bits[:len(small)] |= small
+        return self._wrap(bits)
+
+    def __sub__(self, other: "ActivityBitmap") -> "ActivityBitmap":
+        """差集（在 self 中但不在 other 中）"""
+        bits = self.bits.copy()
+        size = min(len(bits), len(other.bits))
+        bits[:size] &= ~other.bits[:size]
+        return self._wrap(bits)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.bits.nbytes)
+
+    def to_bytes(self) -> bytes:
+        return self.bits.tobytes()
\ No newline at end of file
@@ -0,0 +1,74 @@
+"""
+环形时间分桶计数器
+"""
+
+import time
+from array import array
+from typing import List, Optional, Tuple
+
+
+class TimeBucketRing:
+    """预分配的环形时间分桶计数器
+
+    每个桶统计请求数、错误数和延迟总和，三个字段各是一个定长数组，
+    桶编号 = (时间戳 + 时区偏移) // 桶宽度，槽位 = 桶编号 % 桶数。
+    槽位里记录着当前存放的桶编号，写入时发现编号不同说明是上一轮的旧数据，
+    原地清零后复用。记录一次只是几次整数运算和数组自增，不格式化字符串、
+    不分配内存，也不需要定期清理。
+    """
+
+    def __init__(self, bucket_seconds: int, buckets: int, utc_offset: Optional[int] = None):
+        self.bucket_seconds = bucket_seconds
+        self.size = buckets
+        # 小时桶按本地时间对齐
+        self.utc_offset = utc_offset if utc_offset is not None else time.localtime().tm_gmtoff
+
+        self.epochs = array('q', [-1]) * buckets  # 每个槽位当前存放的桶编号
+        self.requests = array('Q', [0]) * buckets
+        self.errors = array('Q', [0]) * buckets
+        self.latency = array('d', [0.0]) * buckets  # 延迟总和（秒）
+
+    def epoch(self, ts: float) -> int:
+        """时间戳所在的桶编号"""
+        return int((ts + self.utc_offset) // self.bucket_seconds)
+
+    def start_of(self, epoch: int) -> int:
+        """桶编号对应的起始时间戳"""
+        return epoch * self.bucket_seconds - self.utc_offset
+
+    def record(self, latency: float, is_error: bool = False, now: Optional[float] = None):
+        """记录一次请求"""
+        epoch = int(((now if now is not None else time.time()) + self.utc_offset) // self.bucket_seconds)
+        slot = epoch % self.size
+        if self.epochs[slot] != epoch:
+            self.epochs[slot] = epoch
+            self.requests[slot] = 0
+            self.errors[slot] = 0
+            self.latency[slot] = 0.0
+
+        self.requests[slot] += 1
+        self.latency[slot] += latency
+        if is_error:
+            self.errors[slot] += 1
+
+    def series(self, buckets: int, now: Optional[float] = None) -> List[Tuple[int, int, int, float]]:
+        """最近 buckets 个桶（含当前桶），从旧到新 [(起始时间, 请求数, 错误数, 延迟总和), ...]"""
+        current = self.epoch(now if now is not None else time.time())
+        result = []
+        for epoch in range(current - min(buckets, self.size) + 1, current + 1):
+            slot = epoch % self.size
+            if self.epochs[slot] == epoch:
+                result.append((self.start_of(epoch), self.requests[slot], self.errors[slot], self.latency[slot]))
+            else:
+                result.append((self.start_of(epoch), 0, 0, 0.0))
+        return result
+
+    def totals(self, buckets: int, now: Optional[float] = None) -> Tuple[int, int, float]:
+        """最近 buckets 个桶的 (请求数, 错误数, 延迟总和)"""
+        requests = errors = 0
+        latency = 0.0
+        for _, bucket_requests, bucket_errors, bucket_latency in self.series(buckets, now):
+            requests += bucket_requests
+            errors += bucket_errors
+            latency += bucket_latency
+        return requests, errors, latency
\ No newline at end of file
@@ -0,0 +1,43 @@
+"""
+回调路由表
+"""
+
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+CallbackFunc = Callable[..., Awaitable]
+
+
+class CallbackRouter:
+    """回调数据路由表（精确匹配 + 前缀匹配）
+
+    精确表直接按完整的 callback_data 查找；前缀表按第一个分隔符之前的
+    部分查找，剩余部分作为参数传给处理函数。两次都是字典查找，
+    路由开销与注册的路由数量无关。
+    """
+
+    def __init__(self, separator: str = "_"):
+        self.separator = separator
+        self.exact_routes: Dict[str, CallbackFunc] = {}
+        self.prefix_routes: Dict[str, CallbackFunc] = {}
+
+    def exact(self, data: str, func: CallbackFunc):
+        """注册精确匹配路由"""
+        self.exact_routes[data] = func
+
+    def prefix(self, prefix: str, func: CallbackFunc):
+        """注册前缀路由（prefix 不含分隔符，例如 "help" 匹配 "help_xxx"）"""
+        self.prefix_routes[prefix] = func
+
+    def resolve(self, data: str) -> Tuple[Optional[CallbackFunc], Tuple[str, ...]]:
+        """解析回调数据，返回 (处理函数, 参数)"""
+        func = self.exact_routes.get(data)
+        if func is not None:
+            return func, ()
+
+        head, sep, tail = data.partition(self.separator)
+        if sep:
+            func = self.prefix_routes.get(head)
+            if func is not None:
+                return func, (tail,)
+
+        return None, ()
\ No newline at end of file
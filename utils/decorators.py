@@ -3,44 +3,181 @@
 """
 
 import time
+import json
+import math
 import asyncio
 from functools import wraps
 from datetime import datetime, timedelta
-from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple, Union
 import logging
 
+from config.config import Config
+from utils.rate_limiter import GCRARateLimiter, RedisRateLimiter
+from utils.helpers import estimate_tokens
+from utils.tracing import span
+
 logger = logging.getLogger(__name__)
+# 用户行为日志量大，单独的 logger 便于通过 LOG_SAMPLE_RATES 采样
+action_logger = logging.getLogger("user_action")
+
+# 速率限制器注册表：相同 (次数, 窗口) 的处理器共享同一个用户额度
+_limiters: Dict[Tuple[int, int], Union[GCRARateLimiter, RedisRateLimiter]] = {}
+
+def get_rate_limiter(max_requests: int, window_seconds: int) -> Union[GCRARateLimiter, RedisRateLimiter]:
+    """获取（或创建）指定参数的速率限制器，后端由 Config.RATE_LIMIT_BACKEND 决定"""
+    key = (max_requests, window_seconds)
+    limiter = _limiters.get(key)
+    if limiter is None:
+        if Config.RATE_LIMIT_BACKEND == "redis":
+            limiter = RedisRateLimiter(max_requests, window_seconds, Config.REDIS_URL)
+        else:
+            limiter = GCRARateLimiter(max_requests, window_seconds)
+        _limiters[key] = limiter
+    return limiter
+
+def rate_limit(func=None, max_requests: Optional[int] = None, window_seconds: Optional[int] = None,
+               cost: Union[float, Callable] = 1.0):
+    """速率限制装饰器
+
+    支持 @rate_limit、@rate_limit() 和 @rate_limit(max_requests=5, window_seconds=60)，
+    未指定的参数使用 Config.RATE_LIMIT_MESSAGES / Config.RATE_LIMIT_WINDOW。
 
-# 速率限制存储
-rate_limit_storage = defaultdict(list)
+    cost 是本次操作消耗的额度，可以是数字或 cost(update) 函数（如按 token 估算）。
+    实际扣除的额度再除以用户等级对应的倍数，管理员不受限制。
+    """
+    # 兼容旧的位置参数写法 rate_limit(10, 60)
+    if isinstance(func, int):
+        func, max_requests, window_seconds = None, func, max_requests
+
+    limiter = get_rate_limiter(
+        max_requests or Config.RATE_LIMIT_MESSAGES,
+        window_seconds or Config.RATE_LIMIT_WINDOW
+    )
 
-def rate_limit(max_requests: int = 10, window_seconds: int = 60):
-    """速率限制装饰器"""
     def decorator(func):
         @wraps(func)
         async def wrapper(self, update, context):
             user_id = update.effective_user.id
-            current_time = time.time()
+            bot = getattr(self, 'bot', None)
 
-            # 清理过期的请求记录
-            rate_limit_storage[user_id] = [
-                req_time for req_time in rate_limit_storage[user_id]
-                if current_time - req_time < window_seconds
-            ]
+            if bot is not None and bot.is_admin(user_id):
+                return await func(self, update, context)
+
+            with span("rate_limit") as stage:
+                weight = cost(update) if callable(cost) else cost
+                if bot is not None:
+                    weight /= bot.user_service.get_rate_limit_multiplier(user_id)
+
+                # 单次消耗不超过突发上限，否则永远无法通过
+                allowed, retry_after = await limiter.acquire(user_id, min(weight, limiter.max_requests))
+                stage.set("rate_limit.allowed", allowed)
 
-            # 检查是否超过限制
-            if len(rate_limit_storage[user_id]) >= max_requests:
-                await update.message.reply_text(
-                    f"⏰ 请求过于频繁，请等待 {window_seconds} 秒后重试"
+            if not allowed:
+                await update.effective_message.reply_text(
+                    f"⏰ 请求过于频繁，请等待 {math.ceil(retry_after)} 秒后重试"
                 )
                 return
 
-            # 记录当前请求
-            rate_limit_storage[user_id].append(current_time)
-
             return await func(self, update, context)
         return wrapper
-    return decorator
+
+    return decorator(func) if func is not None else decorator
+
+def ai_request_cost(update) -> float:
+    """按提示词的估算 token 数计算 AI 请求的额度消耗
+
+    不超过 RATE_LIMIT_TOKENS_PER_UNIT 个 token 的普通消息正好计 1 次，
+    更长的消息按比例多计（如 3000 token 的长文计 3 次）。
+    """
+    message = update.effective_message
+    text = (message.text or message.caption or "") if message else ""
+    return max(1.0, estimate_tokens(text) / Config.RATE_LIMIT_TOKENS_PER_UNIT)
+
+def sweep_rate_limiters():
+    """淘汰所有限制器中已空闲的用户（流量低谷时由后台任务调用）"""
+    for limiter in _limiters.values():
+        limiter.sweep()
+
+async def close_rate_limiters():
+    """关闭分布式限制器的 Redis 连接（关闭时调用）"""
+    for limiter in _limiters.values():
+        if isinstance(limiter, RedisRateLimiter):
+            await limiter.close()
+
+def rate_limiters() -> Dict[Tuple[int, int], Union[GCRARateLimiter, RedisRateLimiter]]:
+    """所有已创建的限制器（键为 (次数, 窗口秒数)）"""
+    return _limiters
+
+def rate_limiter_stats() -> Dict[str, Dict]:
+    """所有限制器的统计（键为 次数/窗口秒数）"""
+    return {
+        f"{max_requests}/{window_seconds}": limiter.get_stats()
+        for (max_requests, window_seconds), limiter in _limiters.items()
+    }
+
+def dump_rate_limits(path: str = "data/rate_limits.json"):
+    """保存速率限制状态（关闭时调用，重启后继续生效）"""
+    data = {
+        f"{max_requests}/{window_seconds}": limiter.dump()
+        for (max_requests, window_seconds), limiter in _limiters.items()
+    }
+
+    file = Path(path)
+    file.parent.mkdir(parents=True, exist_ok=True)
+    with open(file, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+
+def load_rate_limits(path: str = "data/rate_limits.json"):
+    """加载上次保存的速率限制状态"""
+    file = Path(path)
+    if not file.exists():
+        return
+
+    try:
+        with open(file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        for key, tats in data.items():
+            # 旧格式（用户 -> 时间戳列表）直接忽略
+            if not isinstance(tats, dict):
+                continue
+            max_requests, window_seconds = map(int, key.split('/'))
+            get_rate_limiter(max_requests, window_seconds).load(tats)
+    except Exception as e:
+        logger.error(f"加载速率限制数据失败: {e}")
+
+def track_inflight(func):
+    """在途请求跟踪装饰器（配合关闭协调器实现优雅退出）"""
+    @wraps(func)
+    async def wrapper(self, update, context):
+        coordinator = getattr(self.bot, 'shutdown', None)
+        if coordinator is None:
+            return await func(self, update, context)
+
+        # 关闭过程中不再处理新的更新
+        if not coordinator.accepting:
+            coordinator.record_rejected()
+            return
+
+        with coordinator.track():
+            return await func(self, update, context)
+    return wrapper
+
+def trace_request(func):
+    """链路追踪装饰器：按采样率为处理器开始一次追踪，各阶段的 span 挂在其下"""
+    @wraps(func)
+    async def wrapper(self, update, context):
+        message = update.effective_message
+        # 过滤器在处理器之前运行，计时结果无论是否采样都要取走
+        filter_timing = self.bot.group_filter.pop_timing(message)
+
+        with self.bot.tracer.start_trace(func.__name__) as root:
+            root.set("user.id", update.effective_user.id)
+            root.set("chat.type", update.effective_chat.type)
+            if filter_timing is not None:
+                root.add_child("filter", *filter_timing)
+            return await func(self, update, context)
+    return wrapper
 
 def log_user_action(func):
     """用户行为记录装饰器"""
@@ -50,8 +187,9 @@ def log_user_action(func):
         chat_type = update.effective_chat.type
         action_name = func.__name__
 
-        # 记录用户行为
-        logger.info(f"👤 用户 {user.id} ({user.first_name}) 执行: {action_name}")
+        # 记录用户行为（参数延迟格式化，被采样丢弃的日志不做字符串拼接）
+        action_logger.info("👤 用户 %s (%s) 执行: %s", user.id, user.first_name, action_name,
+                           extra={'user_id': user.id, 'chat_type': chat_type, 'action': action_name})
 
         return await func(self, update, context)
     return wrapper
@@ -81,17 +219,20 @@ def monitor_performance(func):
                 self.bot.system_monitor.record_request(
                     response_time,
                     error_occurred,
-                    error_message
+                    error_message,
+                    handler=func.__name__
                 )
 
             # 记录到实时统计
             if hasattr(self, 'bot') and hasattr(self.bot, 'stats_manager'):
                 try:
-                    await self.bot.stats_manager.update_user_activity(
-                        update.effective_user.id,
-                        func.__name__,
-                        update.effective_chat.type
-                    )
+                    with span("stats.update"):
+                        await self.bot.stats_manager.update_user_activity(
+                            update.effective_user.id,
+                            func.__name__,
+                            update.effective_chat.type,
+                            update.effective_chat.id
+                        )
                 except Exception as e:
                     logger.error(f"更新统计失败: {e}")
 
@@ -0,0 +1,101 @@
+"""
+自定义消息过滤器
+"""
+
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from telegram import Message, MessageEntity
+from telegram.ext import filters
+
+logger = logging.getLogger(__name__)
+
+
+class AddressedToBotFilter(filters.MessageFilter):
+    """群组消息预过滤器：只放行@机器人或回复机器人的消息
+
+    在过滤器层面完成判断，无关的群聊消息不会进入处理器和装饰器，
+    也不会消耗发送者的速率限制额度。
+    """
+
+    def __init__(self):
+        super().__init__(name="AddressedToBot")
+        self.bot_id: Optional[int] = None
+        self.mention: Optional[str] = None  # 预先计算的小写 @username
+
+        # 过滤统计
+        self.checked_count = 0
+        self.passed_count = 0
+        self.filtered_count = 0
+
+        # 放行消息的过滤耗时 (chat_id, message_id) -> (开始, 结束) 纳秒，由链路追踪取走
+        self._timings: "OrderedDict[Tuple[int, int], Tuple[int, int]]" = OrderedDict()
+        self.max_timings = 1000
+
+    def set_bot(self, bot_user):
+        """设置机器人身份（获取 bot_info 后调用）"""
+        self.bot_id = bot_user.id
+        self.mention = f"@{bot_user.username}".lower() if bot_user.username else None
+        logger.info(f"🎯 群组过滤器已就绪: {self.mention}")
+
+    def filter(self, message: Message) -> bool:
+        """过滤器入口"""
+        started = time.time_ns()
+        self.checked_count += 1
+
+        if self.is_addressed(message):
+            self.passed_count += 1
+            self._timings[(message.chat_id, message.message_id)] = (started, time.time_ns())
+            if len(self._timings) > self.max_timings:
+                self._timings.popitem(last=False)
+            return True
+
+        self.filtered_count += 1
+        return False
+
+    def is_addressed(self, message: Optional[Message]) -> bool:
+        """判断消息是否@了机器人或回复了机器人"""
+        if message is None or self.bot_id is None:
+            return False
+
+        # 检查是否回复了机器人
+        reply = message.reply_to_message
+        if reply is not None and reply.from_user is not None and reply.from_user.id == self.bot_id:
+            return True
+
+        if self.mention is None:
+            return False
+
+        if message.text is not None:
+            text, entities, parse = message.text, message.entities, message.parse_entity
+        elif message.caption is not None:
+            text, entities, parse = message.caption, message.caption_entities, message.parse_caption_entity
+        else:
+            return False
+
+        # 快速路径：没有 @ 符号就不可能提及机器人
+        if not entities or '@' not in text:
+            return False
+
+        # 检查@机器人（实体偏移为UTF-16单位，交给 parse_entity 处理）
+        for entity in entities:
+            if entity.type == MessageEntity.MENTION and parse(entity).lower() == self.mention:
+                return True
+
+        return False
+
+    def pop_timing(self, message: Optional[Message]) -> Optional[Tuple[int, int]]:
+        """取走消息的过滤耗时（私聊消息不经过本过滤器，返回 None）"""
+        if message is None or not self._timings:
+            return None
+        return self._timings.pop((message.chat_id, message.message_id), None)
+
+    def get_stats(self) -> Dict:
+        """获取过滤统计"""
+        return {
+            'checked': self.checked_count,
+            'passed': self.passed_count,
+            'filtered': self.filtered_count,
+            'filter_rate': (self.filtered_count / max(self.checked_count, 1)) * 100
+        }
\ No newline at end of file
@@ -116,4 +116,13 @@ def truncate_text(text: str, max_length: int = 100, suffix: str = "...") -> str:
     if len(text) <= max_length:
         return text
 
-    return text[:max_length - len(suffix)] + suffix
\ No newline at end of file
+    return text[:max_length - len(suffix)] + suffix
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算文本的 token 数（中日韩字符约 1 token/字，其他约 4 字符/token）"""
+    if not text:
+        return 0
+
+    cjk = len(re.findall(r'[\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af]', text))
+    return cjk + (len(text) - cjk + 3) // 4
\ No newline at end of file
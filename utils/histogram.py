@@ -0,0 +1,188 @@
+"""
+延迟直方图
+"""
+
+import time
+from array import array
+from typing import Dict, List, Optional, Sequence
+
+
+class LatencyHistogram:
+    """HDR 风格的对数分桶直方图
+
+    以微秒为单位，小于 2^sub_bucket_bits 的值逐一分桶，更大的值按 2 的幂分段、
+    每段再线性细分，相对误差不超过 1/2^(sub_bucket_bits-1)（默认约 3%）。
+    默认覆盖 1 微秒到约 18 分钟，共 833 个桶，计数存放在定长数组中，
+    记录一次只是一次下标计算和一次自增，不分配内存。
+    """
+
+    def __init__(self, sub_bucket_bits: int = 6, highest_us: int = 1 << 30):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.sub_bucket_count = 1 << sub_bucket_bits
+        self.half_count = self.sub_bucket_count >> 1
+        self.highest_us = highest_us
+
+        self.counts = array('I', bytes(4 * (self._index(highest_us) + 1)))
+        self.total = 0
+        self.sum = 0.0
+        self.top = 0  # 出现过的最大桶下标，合并/清空时只处理到这里
+
+    def _index(self, value: int) -> int:
+        """微秒值所在的桶下标"""
+        if value < self.sub_bucket_count:
+            return value
+        exponent = value.bit_length() - self.sub_bucket_bits
+        return exponent * self.half_count + (value >> exponent)
+
+    def _upper(self, index: int) -> int:
+        """桶内的最大值（微秒）"""
+        if index < self.sub_bucket_count:
+            return index
+        exponent = index // self.half_count - 1
+        mantissa = index - exponent * self.half_count
+        return ((mantissa + 1) << exponent) - 1
+
+    def index_of(self, seconds: float) -> int:
+        """延迟（秒）所在的桶下标，超出范围的值归入两端的桶"""
+        value = int(seconds * 1_000_000)
+        if value < self.sub_bucket_count:
+            return value if value > 0 else 0
+        if value > self.highest_us:
+            value = self.highest_us
+        exponent = value.bit_length() - self.sub_bucket_bits
+        return exponent * self.half_count + (value >> exponent)
+
+    def record_index(self, index: int, seconds: float):
+        """按已计算好的桶下标记录（多个直方图共用一次下标计算）"""
+        self.counts[index] += 1
+        self.total += 1
+        self.sum += seconds
+        if index > self.top:
+            self.top = index
+
+    def record(self, seconds: float):
+        """记录一个延迟（秒）"""
+        self.record_index(self.index_of(seconds), seconds)
+
+    def add(self, other: "LatencyHistogram"):
+        """合并另一个直方图"""
+        counts = self.counts
+        for index in range(other.top + 1):
+            if other.counts[index]:
+                counts[index] += other.counts[index]
+        self.total += other.total
+        self.sum += other.sum
+        self.top = max(self.top, other.top)
+
+    def subtract(self, other: "LatencyHistogram"):
+        """减去一个已合并进来的直方图（滑动窗口移出旧时间片）"""
+        counts = self.counts
+        for index in range(other.top + 1):
+            if other.counts[index]:
+                counts[index] -= other.counts[index]
+        self.total -= other.total
+        self.sum -= other.sum
+
+    def clear(self):
+        counts = self.counts
+        for index in range(self.top + 1):
+            counts[index] = 0
+        self.total = 0
+        self.sum = 0.0
+        self.top = 0
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.total if self.total else 0.0
+
+    def percentiles(self, quantiles: Sequence[float]) -> Dict[float, float]:
+        """一次遍历计算多个分位数（秒，取桶上界）"""
+        result = {}
+        if not self.total:
+            return {q: 0.0 for q in quantiles}
+
+        targets = sorted(quantiles)
+        position = 0
+        seen = 0
+        for index in range(self.top + 1):
+            seen += self.counts[index]
+            while position < len(targets) and seen >= targets[position] * self.total:
+                result[targets[position]] = self._upper(index) / 1_000_000
+                position += 1
+            if position == len(targets):
+                break
+        return result
+
+    def percentile(self, quantile: float) -> float:
+        return self.percentiles([quantile])[quantile]
+
+    def cumulative(self, bounds: Sequence[float]) -> List[int]:
+        """小于等于每个上界（秒，升序）的累计计数，用于导出 Prometheus 直方图"""
+        result = []
+        seen = 0
+        index = 0
+        for bound in bounds:
+            limit = bound * 1_000_000
+            while index <= self.top and self._upper(index) <= limit:
+                seen += self.counts[index]
+                index += 1
+            result.append(seen)
+        return result
+
+    def max(self) -> float:
+        """最大值（秒，取桶上界）"""
+        for index in range(self.top, -1, -1):
+            if self.counts[index]:
+                return self._upper(index) / 1_000_000
+        return 0.0
+
+
+class RollingHistogram:
+    """滑动窗口直方图
+
+    窗口切成 slots 个时间片，每片一个直方图，另外维护整个窗口的合计直方图。
+    记录时写入当前时间片和合计；进入新时间片时从合计中减去移出窗口的那一片。
+    查询直接读取合计，窗口精度为一个时间片。
+    """
+
+    def __init__(self, window_seconds: float, slots: int = 10, **histogram_options):
+        self.window_seconds = window_seconds
+        self.slot_seconds = window_seconds / slots
+        self.ring = [LatencyHistogram(**histogram_options) for _ in range(slots)]
+        self.window = LatencyHistogram(**histogram_options)
+        self.slot = 0  # 当前时间片编号
+        self.next_slot_at = 0.0  # 下一个时间片的开始时间
+
+    def _advance(self, now: float):
+        slot = int(now // self.slot_seconds)
+        if slot <= self.slot:
+            return
+
+        # 空闲超过一个窗口时整体清空，否则逐片移出
+        if slot - self.slot >= len(self.ring):
+            for histogram in self.ring:
+                histogram.clear()
+            self.window.clear()
+        else:
+            for expired in range(self.slot + 1, slot + 1):
+                histogram = self.ring[expired % len(self.ring)]
+                self.window.subtract(histogram)
+                histogram.clear()
+        self.slot = slot
+        self.next_slot_at = (slot + 1) * self.slot_seconds
+
+    def record(self, seconds: float, now: Optional[float] = None, index: Optional[int] = None):
+        """记录一个延迟（秒），index 为预先算好的桶下标"""
+        if now is None:
+            now = time.time()
+        if now >= self.next_slot_at:
+            self._advance(now)
+        if index is None:
+            index = self.window.index_of(seconds)
+        self.ring[self.slot % len(self.ring)].record_index(index, seconds)
+        self.window.record_index(index, seconds)
+
+    def snapshot(self, now: Optional[float] = None) -> LatencyHistogram:
+        """窗口内的直方图（只读，不要修改）"""
+        self._advance(now if now is not None else time.time())
+        return self.window
\ No newline at end of file
@@ -0,0 +1,63 @@
+"""
+HyperLogLog 基数估计
+"""
+
+import math
+from collections import Counter
+from hashlib import blake2b
+from typing import Hashable
+
+
+class HyperLogLog:
+    """HyperLogLog 去重计数器
+
+    无论加入多少元素，内存固定为 2^precision 字节。默认 precision=14 与 Redis
+    的 HLL 相同：16384 个寄存器（16KB），标准误差 1.04/√16384 ≈ 0.81%，
+    约 99% 的估计值误差在 ±2.5% 以内。小基数时使用线性计数修正，几乎精确。
+    """
+
+    def __init__(self, precision: int = 14):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(self.size)
+        self.alpha = 0.7213 / (1 + 1.079 / self.size)
+
+    def add(self, item: Hashable) -> bool:
+        """加入一个元素，返回寄存器是否发生变化"""
+        x = int.from_bytes(blake2b(str(item).encode(), digest_size=8).digest(), 'big')
+        index = x >> (64 - self.precision)
+        rest = x & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+            return True
+        return False
+
+    def count(self) -> int:
+        """估计不同元素的数量"""
+        histogram = Counter(self.registers)
+        estimate = self.alpha * self.size * self.size / sum(
+            n * 2.0 ** -rank for rank, n in histogram.items()
+        )
+
+        # 小基数时使用线性计数
+        zeros = histogram.get(0, 0)
+        if estimate <= 2.5 * self.size and zeros:
+            estimate = self.size * math.log(self.size / zeros)
+
+        return int(round(estimate))
+
+    def merge(self, other: "HyperLogLog"):
+        """合并另一个计数器（结果为两者并集的估计）"""
+        if other.precision != self.precision:
+            raise ValueError("只能合并精度相同的 HyperLogLog")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    @classmethod
+    def union(cls, *counters: "HyperLogLog") -> "HyperLogLog":
+        """返回多个计数器的并集"""
+        result = cls(counters[0].precision if counters else 14)
+        for counter in counters:
+            result.merge(counter)
+        return result
\ No newline at end of file
@@ -1,5 +1,18 @@
 """工具模块"""
 from .decorators import rate_limit, log_user_action
 from .helpers import split_long_message, format_datetime, escape_markdown
+from .filters import AddressedToBotFilter
+from .callback_router import CallbackRouter
+from .rate_limiter import GCRARateLimiter, RedisRateLimiter
+from .hyperloglog import HyperLogLog
+from .presence import PresenceIndex
+from .bitmap import ActivityBitmap
+from .histogram import LatencyHistogram, RollingHistogram
+from .tracing import Tracer, span
+from .bucket_ring import TimeBucketRing
+from .log_pipeline import LogPipeline
 
-__all__ = ['rate_limit', 'log_user_action', 'split_long_message', 'format_datetime', 'escape_markdown']
\ No newline at end of file
+__all__ = ['rate_limit', 'log_user_action', 'split_long_message', 'format_datetime', 'escape_markdown',
+           'AddressedToBotFilter', 'CallbackRouter', 'GCRARateLimiter', 'RedisRateLimiter', 'HyperLogLog', 'PresenceIndex',
+           'ActivityBitmap', 'LatencyHistogram', 'RollingHistogram', 'Tracer', 'span',
+           'TimeBucketRing', 'LogPipeline']
\ No newline at end of file
@@ -0,0 +1,38 @@
+"""
+延迟导入工具
+"""
+
+import importlib
+import logging
+from types import ModuleType
+
+logger = logging.getLogger(__name__)
+
+
+class LazyModule(ModuleType):
+    """延迟导入的模块代理，首次访问属性时才真正导入"""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__['_lazy_module'] = None
+
+    def _load(self) -> ModuleType:
+        module = self.__dict__['_lazy_module']
+        if module is None:
+            module = importlib.import_module(self.__name__)
+            self.__dict__['_lazy_module'] = module
+            logger.debug(f"📦 延迟导入模块: {self.__name__}")
+        return module
+
+    def __getattr__(self, item):
+        return getattr(self._load(), item)
+
+    @property
+    def is_loaded(self) -> bool:
+        """模块是否已经导入"""
+        return self.__dict__['_lazy_module'] is not None
+
+
+def lazy_import(name: str) -> LazyModule:
+    """返回延迟导入的模块代理"""
+    return LazyModule(name)
\ No newline at end of file
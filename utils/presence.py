@@ -0,0 +1,64 @@
+"""
+在线用户索引
+"""
+
+import time
+from typing import Dict, Hashable, Optional, Set
+
+
+class PresenceIndex:
+    """按时间分桶的在线用户索引（Redis 有序集合的内存等价实现）
+
+    每个用户只出现在其最后活跃时间所在的桶里，统计任意窗口内的在线人数
+    只需累加窗口覆盖的桶大小，与用户总数无关；超过保留时长的桶整体丢弃。
+    """
+
+    def __init__(self, bucket_seconds: int = 60, retention_seconds: int = 3600):
+        self.bucket_seconds = bucket_seconds
+        self.retention_seconds = retention_seconds
+
+        self.last_seen: Dict[Hashable, float] = {}
+        self.buckets: Dict[int, Set[Hashable]] = {}
+
+    def touch(self, user_id: Hashable, now: Optional[float] = None):
+        """记录用户活跃"""
+        now = now if now is not None else time.time()
+        bucket = int(now // self.bucket_seconds)
+
+        previous = self.last_seen.get(user_id)
+        if previous is not None:
+            old_bucket = int(previous // self.bucket_seconds)
+            if old_bucket == bucket:
+                self.last_seen[user_id] = now
+                return
+            members = self.buckets.get(old_bucket)
+            if members is not None:
+                members.discard(user_id)
+
+        self.last_seen[user_id] = now
+        if bucket not in self.buckets:
+            # 进入新桶时顺便丢弃过期的桶
+            self.buckets[bucket] = set()
+            self.prune(now)
+        self.buckets[bucket].add(user_id)
+
+    def count(self, window_seconds: float, now: Optional[float] = None) -> int:
+        """统计最近 window_seconds 秒内活跃的用户数（精度为一个桶）"""
+        now = now if now is not None else time.time()
+        first_bucket = int((now - window_seconds) // self.bucket_seconds)
+        return sum(len(members) for bucket, members in self.buckets.items() if bucket >= first_bucket)
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """丢弃超过保留时长的桶，返回移除的用户数"""
+        now = now if now is not None else time.time()
+        cutoff = int((now - self.retention_seconds) // self.bucket_seconds)
+
+        removed = 0
+        for bucket in [bucket for bucket in self.buckets if bucket < cutoff]:
+            for user_id in self.buckets.pop(bucket):
+                del self.last_seen[user_id]
+                removed += 1
+        return removed
+
+    def __len__(self) -> int:
+        return len(self.last_seen)
\ No newline at end of file
@@ -0,0 +1,369 @@
+"""
+GCRA 速率限制器
+"""
+
+import math
+import time
+import asyncio
+import logging
+from typing import Dict, Hashable, List, Optional, Set, Tuple
+from utils.lazy import lazy_import
+
+# 只有启用 Redis 限流后端时才会导入
+aioredis = lazy_import("aioredis")
+
+logger = logging.getLogger(__name__)
+
+# 原子 GCRA 检查：先记入其他副本本地放行的 pending 次数，再检查本次请求。
+# 使用 Redis 服务器时间，避免副本之间的时钟偏差；返回 TAT 相对当前时间的积压秒数。
+GCRA_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local interval = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local pending = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then tat = now end
+tat = tat + interval * pending
+
+local allowed = 0
+if cost > 0 and tat + interval * cost - now <= window then
+    tat = tat + interval * cost
+    allowed = 1
+end
+
+if tat > now then
+    redis.call('SET', KEYS[1], tostring(tat), 'PX', math.ceil((tat - now) * 1000))
+end
+return {allowed, tostring(tat - now)}
+"""
+
+
+class GCRARateLimiter:
+    """GCRA（通用信元速率算法）速率限制器
+
+    每个键只保存一个浮点数：理论到达时间 TAT。允许窗口内最多
+    max_requests 次突发请求，之后按 window/max_requests 的间隔匀速放行。
+    TAT 早于当前时间的键等价于全新用户，由时间轮在到期后自动淘汰，
+    内存只与最近活跃的用户数相关。
+    """
+
+    def __init__(self, max_requests: int, window_seconds: float, tick: float = 1.0):
+        self.max_requests = max_requests
+        self.window = float(window_seconds)
+        self.emission_interval = self.window / max_requests
+
+        self.tat: Dict[Hashable, float] = {}
+
+        # 时间轮：每个槽位保存 TAT 落在该 tick 内的键，覆盖一个完整窗口
+        self.tick = tick
+        self.wheel_size = int(math.ceil(self.window / tick)) + 2
+        self.wheel: List[Set[Hashable]] = [set() for _ in range(self.wheel_size)]
+        self._swept_tick = 0  # 已淘汰到的 tick（首次调用时追到当前时间）
+
+        # 统计
+        self.allowed_count = 0
+        self.limited_count = 0
+        self.evicted_count = 0
+
+    def allow(self, key: Hashable, cost: float = 1.0, now: Optional[float] = None) -> Tuple[bool, float]:
+        """检查并记录一次请求，返回 (是否允许, 需等待秒数)"""
+        if now is None:
+            now = time.time()
+
+        current_tick = int(now // self.tick)
+        if current_tick > self._swept_tick + 1:
+            self._sweep(current_tick)
+
+        old_tat = self.tat.get(key)
+        base = old_tat if old_tat is not None and old_tat > now else now
+        new_tat = base + self.emission_interval * cost
+
+        if new_tat - now > self.window:
+            self.limited_count += 1
+            return False, new_tat - self.window - now
+
+        self.tat[key] = new_tat
+        self.allowed_count += 1
+
+        # 更新时间轮槽位（只在跨 tick 时移动）
+        new_slot = int(new_tat // self.tick)
+        if old_tat is None:
+            self.wheel[new_slot % self.wheel_size].add(key)
+        else:
+            old_slot = int(old_tat // self.tick)
+            if old_slot != new_slot:
+                self.wheel[old_slot % self.wheel_size].discard(key)
+                self.wheel[new_slot % self.wheel_size].add(key)
+
+        return True, 0.0
+
+    async def acquire(self, key: Hashable, cost: float = 1.0) -> Tuple[bool, float]:
+        """异步接口，与 RedisRateLimiter 保持一致"""
+        return self.allow(key, cost)
+
+    def _sweep(self, current_tick: int):
+        """淘汰 TAT 已过期的键（处理 current_tick 之前的所有完整 tick）"""
+        first = max(self._swept_tick + 1, current_tick - self.wheel_size)
+        for absolute_tick in range(first, current_tick):
+            slot = self.wheel[absolute_tick % self.wheel_size]
+            if not slot:
+                continue
+
+            # 同一槽位可能混有下一圈的键，按 TAT 再确认一次
+            limit = (absolute_tick + 1) * self.tick
+            expired = [key for key in slot if self.tat.get(key, 0.0) < limit]
+            for key in expired:
+                self.tat.pop(key, None)
+                slot.discard(key)
+            self.evicted_count += len(expired)
+
+        self._swept_tick = current_tick - 1
+
+    def sweep(self, now: Optional[float] = None):
+        """主动触发一次淘汰（空闲时由后台任务调用）"""
+        self._sweep(int((now if now is not None else time.time()) // self.tick))
+
+    def __len__(self) -> int:
+        return len(self.tat)
+
+    def memory_structures(self) -> tuple:
+        """进程内状态（内存诊断统计用）"""
+        return self.tat, self.wheel
+
+    def dump(self, now: Optional[float] = None) -> Dict[str, float]:
+        """导出仍在生效的 TAT（用于关闭时持久化）"""
+        now = now if now is not None else time.time()
+        return {str(key): tat for key, tat in self.tat.items() if tat > now}
+
+    def load(self, data: Dict[str, float], now: Optional[float] = None):
+        """导入 TAT（用于重启后恢复）"""
+        now = now if now is not None else time.time()
+        horizon = now + self.window
+        for key, tat in data.items():
+            if now < tat <= horizon:
+                key = int(key) if key.lstrip('-').isdigit() else key
+                self.tat[key] = tat
+                self.wheel[int(tat // self.tick) % self.wheel_size].add(key)
+
+    def get_stats(self) -> Dict:
+        """获取限流统计"""
+        return {
+            'tracked_keys': len(self.tat),
+            'allowed': self.allowed_count,
+            'limited': self.limited_count,
+            'evicted': self.evicted_count
+        }
+
+class RedisRateLimiter:
+    """基于 Redis 的分布式 GCRA 速率限制器
+
+    多副本部署时所有副本共享同一份用户额度，每次检查是一次 Lua 脚本调用。
+    刚从 Redis 同步过、且离上限还很远的用户直接在本地放行，放行次数在下一次
+    同步时批量写回 Redis；因此每个副本在一个同步周期内最多多放行
+    local_headroom 比例的突发额度。Redis 不可用时回退到进程内限制器，
+    并每隔 retry_interval 秒尝试重连；断开前尚未写回的放行次数保留到重连后补写。
+    """
+
+    def __init__(self, max_requests: int, window_seconds: float, redis_url: str,
+                 prefix: str = "ratelimit", sync_interval: float = 0.5,
+                 local_headroom: float = 0.5, retry_interval: float = 30.0):
+        self.fallback = GCRARateLimiter(max_requests, window_seconds)
+        self.max_requests = max_requests
+        self.emission_interval = self.fallback.emission_interval
+        self.window = self.fallback.window
+
+        self.redis_url = redis_url
+        self.key_prefix = f"{prefix}:{max_requests}/{window_seconds}:"
+        self.sync_interval = sync_interval
+        self.local_headroom = local_headroom
+        self.retry_interval = retry_interval
+
+        self.redis: Optional["aioredis.Redis"] = None
+        self.script = None
+        self.redis_available = False
+        self._next_connect = 0.0
+        self._connect_lock = asyncio.Lock()
+        self._sync_task: Optional[asyncio.Task] = None
+
+        # 本地快速路径：键 -> (本地估算的 TAT, 同步时间)，均为 monotonic 时间
+        self.cache: Dict[Hashable, Tuple[float, float]] = {}
+        # 本地放行但尚未写回 Redis 的次数
+        self.pending: Dict[Hashable, float] = {}
+
+        # 统计（放行/拒绝次数不含回退限制器，回退部分由其自身统计）
+        self.allowed_count = 0
+        self.limited_count = 0
+        self.local_hits = 0
+        self.remote_calls = 0
+        self.fallback_calls = 0
+
+    async def acquire(self, key: Hashable, cost: float = 1.0) -> Tuple[bool, float]:
+        """检查并记录一次请求，返回 (是否允许, 需等待秒数)"""
+        now = time.monotonic()
+
+        # 快速路径：缓存未过期，且本地估算离上限还有足够余量
+        cached = self.cache.get(key)
+        if cached is not None and now - cached[1] < self.sync_interval:
+            tat = max(cached[0], now) + self.emission_interval * cost
+            if tat - now <= self.window * self.local_headroom:
+                self.cache[key] = (tat, cached[1])
+                self.pending[key] = self.pending.get(key, 0.0) + cost
+                self.local_hits += 1
+                self.allowed_count += 1
+                return True, 0.0
+
+        if not await self._ensure_connected():
+            self.fallback_calls += 1
+            return self.fallback.allow(key, cost)
+
+        pending = self.pending.pop(key, 0.0)
+        try:
+            allowed, backlog = await self.script(
+                keys=[f"{self.key_prefix}{key}"],
+                args=[self.emission_interval, self.window, pending, cost]
+            )
+        except Exception as e:
+            self._restore_pending({key: pending})
+            self._mark_down(e)
+            self.fallback_calls += 1
+            return self.fallback.allow(key, cost)
+
+        self.remote_calls += 1
+        backlog = float(backlog)
+        now = time.monotonic()
+        self.cache[key] = (now + backlog, now)
+
+        if int(allowed):
+            self.allowed_count += 1
+            return True, 0.0
+        self.limited_count += 1
+        return False, backlog + self.emission_interval * cost - self.window
+
+    async def _ensure_connected(self) -> bool:
+        """确保 Redis 已连接（失败后在 retry_interval 内不再重试）"""
+        if self.redis_available:
+            return True
+        if time.monotonic() < self._next_connect:
+            return False
+
+        async with self._connect_lock:
+            if self.redis_available or time.monotonic() < self._next_connect:
+                return self.redis_available
+
+            try:
+                self.redis = await aioredis.from_url(
+                    self.redis_url,
+                    decode_responses=True,
+                    socket_timeout=1,
+                    socket_connect_timeout=1
+                )
+                await self.redis.ping()
+                self.script = self.redis.register_script(GCRA_LUA)
+                self.redis_available = True
+
+                if self._sync_task is None or self._sync_task.done():
+                    self._sync_task = asyncio.create_task(self._sync_loop())
+                logger.info(f"✅ 分布式限流已连接 Redis ({self.key_prefix.rstrip(':')})")
+
+            except Exception as e:
+                self._mark_down(e)
+
+        return self.redis_available
+
+    def _mark_down(self, error: Exception):
+        """标记 Redis 不可用，回退到进程内限制器（pending 保留到重连后写回）"""
+        if self.redis_available or self._next_connect == 0.0:
+            logger.warning(f"⚠️ Redis 限流不可用，回退到进程内限流: {error}")
+        self.redis_available = False
+        self._next_connect = time.monotonic() + self.retry_interval
+        self.cache.clear()
+
+    def _restore_pending(self, pending: Dict[Hashable, float]):
+        """把写回失败的放行次数合并回 pending"""
+        for key, count in pending.items():
+            if count:
+                self.pending[key] = self.pending.get(key, 0.0) + count
+
+    async def _sync_loop(self):
+        """定期把本地放行的次数写回 Redis（断开期间有未写回的次数时按 retry_interval 重连）"""
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                if self.pending and not self.redis_available:
+                    await self._ensure_connected()
+                await self.sync()
+            except Exception as e:
+                self._mark_down(e)
+
+    async def sync(self):
+        """写回 pending 次数并清理过期的本地缓存"""
+        now = time.monotonic()
+        expired = [key for key, (_, synced_at) in self.cache.items() if now - synced_at >= self.sync_interval]
+        for key in expired:
+            del self.cache[key]
+
+        if not self.pending or not self.redis_available:
+            return
+
+        pending, self.pending = self.pending, {}
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key, count in pending.items():
+                    await self.script(
+                        keys=[f"{self.key_prefix}{key}"],
+                        args=[self.emission_interval, self.window, count, 0],
+                        client=pipe
+                    )
+                await pipe.execute()
+        except Exception:
+            self._restore_pending(pending)
+            raise
+
+    async def close(self):
+        """写回剩余的 pending 次数并关闭连接"""
+        if self._sync_task and not self._sync_task.done():
+            self._sync_task.cancel()
+            try:
+                await self._sync_task
+            except asyncio.CancelledError:
+                pass
+
+        if self.redis:
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.error(f"同步限流数据失败: {e}")
+            await self.redis.close()
+            self.redis_available = False
+
+    # 进程内回退状态的持久化与淘汰，接口与 GCRARateLimiter 一致
+    def sweep(self, now: Optional[float] = None):
+        self.fallback.sweep(now)
+
+    def __len__(self) -> int:
+        return len(self.fallback)
+
+    def memory_structures(self) -> tuple:
+        return self.fallback.memory_structures() + (self.cache, self.pending)
+
+    def dump(self, now: Optional[float] = None) -> Dict[str, float]:
+        return self.fallback.dump(now)
+
+    def load(self, data: Dict[str, float], now: Optional[float] = None):
+        self.fallback.load(data, now)
+
+    def get_stats(self) -> Dict:
+        """获取限流统计"""
+        stats = self.fallback.get_stats()
+        return {
+            **stats,
+            'allowed': stats['allowed'] + self.allowed_count,
+            'limited': stats['limited'] + self.limited_count,
+            'backend': 'redis' if self.redis_available else 'memory',
+            'local_hits': self.local_hits,
+            'remote_calls': self.remote_calls,
+            'fallback_calls': self.fallback_calls
+        }
\ No newline at end of file
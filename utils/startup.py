@@ -0,0 +1,44 @@
+"""
+启动阶段计时
+"""
+
+import time
+import logging
+from contextlib import contextmanager
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    """记录启动过程中每个阶段的耗时"""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.started_at = time.time()  # 进程启动的墙钟时间，用于计算运行时间
+        self.phases: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def phase(self, name: str):
+        """计时一个启动阶段"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.phases.append((name, elapsed))
+            logger.info(f"⏱️ 启动阶段 [{name}] 耗时 {elapsed * 1000:.1f}ms")
+
+    @property
+    def total(self) -> float:
+        """从计时器创建到现在的总耗时（秒）"""
+        return time.perf_counter() - self.origin
+
+    def report(self):
+        """输出启动耗时汇总"""
+        lines = [f"  • {name}: {elapsed * 1000:.1f}ms" for name, elapsed in self.phases]
+        logger.info(f"🚦 启动完成，总耗时 {self.total * 1000:.1f}ms\n" + "\n".join(lines))
+
+
+# 进程级启动计时器（尽早导入以覆盖整个启动过程）
+startup_timer = StartupTimer()
\ No newline at end of file
@@ -0,0 +1,198 @@
+"""
+请求链路追踪
+"""
+
+import time
+import random
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+# 当前协程所在的 span，子 span 自动挂到它下面
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class _NoopSpan:
+    """未采样时使用的空 span，所有操作都不做任何事"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, key: str, value):
+        pass
+
+    def add_child(self, name: str, start_ns: int, end_ns: int):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """一个计时阶段，用 with 语句包住被测代码"""
+
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start_ns", "end_ns",
+                 "attributes", "error", "_token")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str] = None,
+                 attributes: Optional[Dict] = None):
+        self.trace = trace
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = 0
+        self.end_ns = 0
+        self.attributes = attributes or {}
+        self.error: Optional[str] = None
+        self._token = None
+        trace.spans.append(self)
+
+    def __enter__(self):
+        self.start_ns = time.time_ns()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.time_ns()
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.error = str(exc) or exc_type.__name__
+        if self.parent_id is None:
+            self.trace.tracer.finish(self.trace)
+        return False
+
+    def set(self, key: str, value):
+        """设置属性"""
+        self.attributes[key] = value
+
+    def add_child(self, name: str, start_ns: int, end_ns: int):
+        """补记一个已经结束的子阶段（如在处理器之前运行的过滤器）"""
+        child = Span(self.trace, name, self.span_id)
+        child.start_ns, child.end_ns = start_ns, end_ns
+        if start_ns < self.start_ns:
+            self.start_ns = start_ns
+
+    @property
+    def duration(self) -> float:
+        """耗时（秒）"""
+        return (self.end_ns - self.start_ns) / 1e9
+
+
+class Trace:
+    """一次请求的全部 span，第一个 span 为根"""
+
+    __slots__ = ("tracer", "trace_id", "spans")
+
+    def __init__(self, tracer: "Tracer"):
+        self.tracer = tracer
+        self.trace_id = f"{random.getrandbits(128):032x}"
+        self.spans: List[Span] = []
+
+    @property
+    def root(self) -> Span:
+        return self.spans[0]
+
+    @property
+    def duration(self) -> float:
+        return self.root.duration
+
+    @property
+    def error(self) -> Optional[str]:
+        return next((span.error for span in self.spans if span.error), None)
+
+    def stages(self) -> List[Span]:
+        """根 span 以外的阶段，按开始时间排序"""
+        return sorted(self.spans[1:], key=lambda span: span.start_ns)
+
+
+def span(name: str, **attributes):
+    """在当前追踪中开始一个子阶段；当前请求未被采样时返回空 span"""
+    parent = _current_span.get()
+    if parent is None:
+        return NOOP_SPAN
+    return Span(parent.trace, name, parent.span_id, attributes)
+
+
+def current_span() -> Optional[Span]:
+    """当前协程所在的 span（请求未被采样时为 None），用于日志关联追踪"""
+    return _current_span.get()
+
+
+class Tracer:
+    """轻量级请求追踪器
+
+    按 sample_rate 对请求做头部采样，被采样的请求创建根 span，之后各阶段调用
+    span() 通过 contextvars 找到所在的追踪，不需要层层传递参数；未采样的请求
+    span() 只做一次 ContextVar 读取。结束的追踪保存在固定长度的环形缓冲中，
+    并交给导出器（如 OTLP 文件导出）。
+    """
+
+    def __init__(self, sample_rate: float = 0.1, capacity: int = 200, exporter=None):
+        self.sample_rate = sample_rate
+        self.traces = deque(maxlen=capacity)
+        self.exporter = exporter
+
+        self.started = 0
+        self.sampled = 0
+
+    def start_trace(self, name: str, **attributes):
+        """为一个请求开始追踪（返回根 span，未采样时返回空 span）"""
+        self.started += 1
+        if _current_span.get() is not None:
+            # 已经处于追踪中（嵌套的处理器），作为子阶段记录
+            return span(name, **attributes)
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return NOOP_SPAN
+        return Span(Trace(self), name, None, attributes)
+
+    def finish(self, trace: Trace):
+        """根 span 结束时调用"""
+        self.sampled += 1
+        self.traces.append(trace)
+        if self.exporter is not None:
+            self.exporter.export(trace)
+
+    def recent(self, limit: int = 20) -> List[Trace]:
+        """最近结束的追踪（新的在前）"""
+        return list(self.traces)[-limit:][::-1]
+
+    def slowest(self, limit: int = 5) -> List[Trace]:
+        """缓冲中最慢的追踪"""
+        return sorted(self.traces, key=lambda trace: trace.duration, reverse=True)[:limit]
+
+    def stage_summary(self) -> List[Dict]:
+        """缓冲中各阶段的耗时分布，按总耗时从高到低排序"""
+        durations = defaultdict(list)
+        total = 0.0
+        for trace in self.traces:
+            total += trace.duration
+            for stage in trace.spans[1:]:
+                durations[stage.name].append(stage.duration)
+
+        summary = []
+        for name, values in durations.items():
+            values.sort()
+            summary.append({
+                'name': name,
+                'count': len(values),
+                'p50': values[len(values) // 2],
+                'p95': values[min(int(len(values) * 0.95), len(values) - 1)],
+                'share': sum(values) / total if total else 0.0
+            })
+        summary.sort(key=lambda item: item['share'], reverse=True)
+        return summary
+
+    def get_stats(self) -> Dict:
+        """追踪统计"""
+        return {
+            'sample_rate': self.sample_rate,
+            'started': self.started,
+            'sampled': self.sampled,
+            'buffered': len(self.traces),
+            'capacity': self.traces.maxlen
+        }
\ No newline at end of file